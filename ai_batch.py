@@ -0,0 +1,131 @@
+# 多位病患病理報告的 AI 批次判讀
+#
+# 上傳檔案依檔名分組為病例 (例如 case01_p1.jpg、case01_p2.jpg → case01)，
+# 以有上限的執行緒池並行呼叫 Gemini，並以每分鐘請求數 (RPM) 限制送出速度；
+# 快取命中的病例不佔 RPM 配額。結果可匯出為 CSV。
+
+import csv
+import io
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import ai_cache
+import gemini
+import metrics
+
+BatchJob = namedtuple('BatchJob', ['case_id', 'names', 'images'])
+BatchResult = namedtuple('BatchResult', ['case_id', 'status', 'text', 'latency', 'retries', 'cached', 'error'])
+
+RESULT_COLUMNS = ('case_id', 'status', 'latency', 'retries', 'cached', 'error', 'text')
+
+
+class Cancelled(Exception):
+    """analyze 丟出此例外 (例如 ai_jobs.JobCancelled) 時整批停止，不記為錯誤列。"""
+
+
+def case_id(filename, sep='_'):
+    """檔名 (不含副檔名) 中第一個 sep 之前的部分；sep 為空字串時每個檔案各自一案。"""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return stem.split(sep, 1)[0] if sep else stem
+
+
+def group_jobs(files, sep='_'):
+    """files 為 (filename, mime_type, bytes 或檔案物件)；依 case_id 分組，保留首次出現的順序。"""
+    groups = {}
+    for name, mime_type, data in files:
+        groups.setdefault(case_id(name, sep), []).append((name, mime_type, data))
+    return [BatchJob(cid, [n for n, _, _ in items], [(m, d) for _, m, d in items])
+            for cid, items in groups.items()]
+
+
+class RateLimiter:
+    """每分鐘最多 rpm 次：將請求平均分散，每次呼叫 wait() 取得下一個時段。"""
+
+    def __init__(self, rpm):
+        if rpm <= 0:
+            raise ValueError(f"rpm 必須為正數: {rpm!r}")
+        self.interval = 60.0 / rpm
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def analyze_case(client, api_key, prompt_text, images, cache=None, limiter=None):
+    """單一病例判讀，回傳 (text, CallInfo 或 None)；None 表示來自快取。
+
+    API 回傳非 200 或無法解析時丟出 RuntimeError。
+    """
+    key = None
+    if cache is not None:
+        key = ai_cache.cache_key(gemini.PROMPT_VERSION, client.model, prompt_text, images)
+        text = cache.get(key)
+        if text is not None:
+            return text, None
+    if limiter is not None:
+        with metrics.timer('rate_limit_wait_seconds'):
+            limiter.wait()
+    response, call = client.generate(api_key, gemini.PayloadStream(prompt_text, images))
+    if response.status_code != 200:
+        # 先關閉回應，把連線還給 Session 的連線池
+        detail = response.text[:500]
+        response.close()
+        raise RuntimeError(f"API 呼叫失敗 (Status Code: {response.status_code}) {detail}")
+    try:
+        with metrics.timer('response_parse_seconds', kind='json'):
+            text = gemini.extract_text(response.json())
+    except (KeyError, ValueError):
+        raise RuntimeError("無法解析 AI 回傳的資料，可能內容被阻擋或格式錯誤。") from None
+    if cache is not None:
+        cache.put(key, text)
+    return text, call
+
+
+def run_batch(jobs, analyze, workers=4):
+    """並行執行 analyze(job) -> (text, CallInfo 或 None)，依完成順序產生 (index, BatchResult)。
+
+    單一病例失敗不影響其他病例，錯誤記錄在 BatchResult.error；
+    analyze 丟出 Cancelled 時由產生器重新丟出，尚未開始的病例不再執行。
+    """
+    if workers <= 0:
+        raise ValueError(f"workers 必須為正數: {workers!r}")
+
+    def task(job):
+        start = time.perf_counter()
+        try:
+            text, call = analyze(job)
+        except Cancelled:
+            raise
+        except Exception as e:
+            return BatchResult(job.case_id, 'error', '', time.perf_counter() - start, 0, False, str(e))
+        return BatchResult(job.case_id, 'ok', text, time.perf_counter() - start,
+                           call.retries if call else 0, call is None, '')
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {executor.submit(task, job): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        # 呼叫端提前結束 (例如取消) 時，尚未開始的病例直接取消，不等待執行中的請求
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def results_csv(results):
+    """回傳 CSV 文字 (含 BOM，Excel 可直接開啟中文)。"""
+    buf = io.StringIO()
+    buf.write('\ufeff')
+    writer = csv.writer(buf)
+    writer.writerow(RESULT_COLUMNS)
+    for r in results:
+        writer.writerow([r.case_id, r.status, f"{r.latency:.2f}", r.retries, int(r.cached), r.error, r.text])
+    return buf.getvalue()
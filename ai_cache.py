@@ -0,0 +1,141 @@
+# AI 判讀結果的本機快取 (SQLite)
+#
+# 以「提示版本 + 模型 + 提示文字 + 每張圖片 (mime, bytes) 的 SHA-256」為 key，
+# 同一份報告在相同癌症上下文下重新分析時直接回傳先前結果。
+# 檔案可由多個 session / worker 程序共用；超過容量上限時依最後使用時間 (LRU) 淘汰。
+#
+#   python ai_cache.py            # 顯示快取統計
+#   python ai_cache.py --clear    # 清空快取
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+
+DEFAULT_PATH = os.environ.get('AI_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                            '.ai_cache.sqlite3'))
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+"""
+
+
+def _digest(data):
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(data).digest()
+    # 檔案物件逐段計算，不一次讀入整個檔案
+    h = hashlib.sha256()
+    data.seek(0)
+    for chunk in iter(lambda: data.read(1 << 20), b''):
+        h.update(chunk)
+    return h.digest()
+
+
+def cache_key(prompt_version, model, prompt_text, images):
+    """images 為送出的 (mime_type, bytes 或檔案物件)；圖片順序會影響 key。"""
+    h = hashlib.sha256()
+    for part in (str(prompt_version), model, prompt_text):
+        h.update(part.encode('utf-8'))
+        h.update(b'\0')
+    for mime_type, data in images:
+        h.update(mime_type.encode('utf-8'))
+        h.update(b'\0')
+        h.update(_digest(data))
+    return h.hexdigest()
+
+
+class AICache:
+    """SQLite 快取；get/put 可在多執行緒中呼叫，hits/misses 為本程序的計數。"""
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        if max_bytes <= 0:
+            raise ValueError(f"max_bytes 必須為正數: {max_bytes!r}")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                metrics.inc('ai_cache_lookups_total', result='miss')
+                return None
+            self.hits += 1
+            metrics.inc('ai_cache_lookups_total', result='hit')
+            self._conn.execute('UPDATE entries SET last_used = ? WHERE key = ?', (time.time(), key))
+            return row[0]
+
+    def put(self, key, value):
+        size = len(value.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                                   (key, value, size, now, now))
+                self._evict()
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def _evict(self):
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # 由最久未使用的開始刪，直到總大小回到上限內
+        drop = []
+        for key, size in self._conn.execute('SELECT key, size FROM entries ORDER BY last_used'):
+            if total <= self.max_bytes:
+                break
+            drop.append((key,))
+            total -= size
+        self._conn.executemany('DELETE FROM entries WHERE key = ?', drop)
+
+    def stats(self):
+        with self._lock:
+            entries, total = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': total}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM entries')
+
+    def close(self):
+        self._conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AI 判讀快取統計與清除")
+    parser.add_argument('--path', default=DEFAULT_PATH)
+    parser.add_argument('--clear', action='store_true')
+    args = parser.parse_args(argv)
+
+    cache = AICache(args.path)
+    if args.clear:
+        cache.clear()
+    s = cache.stats()
+    print(f"{args.path}: {s['entries']} 筆，{s['bytes'] / 1024:.1f} KB")
+    cache.close()
+
+
+if __name__ == '__main__':
+    main()
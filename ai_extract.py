@@ -0,0 +1,160 @@
+# AI 結構化抽取：只請模型從病理報告抽出分期所需欄位 (JSON)，再交給 staging 規則分期
+#
+# 以 generationConfig.responseSchema 限制輸出格式，欄位與可用值直接取自各癌別
+# 的輸入選項 (options.py)，與手動分期頁面使用完全相同的代碼。
+
+import json
+from collections import namedtuple
+
+import options
+import staging
+
+CONTEXT_CANCERS = {
+    "子宮內膜癌": 'endometrial', "卵巢癌": 'ovarian', "子宮頸癌": 'cervical',
+    "子宮惡性肉瘤": 'sarcoma', "外陰癌": 'vulvar', "陰道癌": 'vaginal', "GTN": 'gtn',
+    "自動判斷": None,
+}
+CANCER_CONTEXTS = {cancer: context for context, cancer in CONTEXT_CANCERS.items() if cancer}
+
+
+def _sarcoma_t_labels():
+    labels = {}
+    for by_label in options.SARCOMA_T.values():
+        for label, code in by_label.items():
+            labels.setdefault(label, code)
+    return labels
+
+
+# 各癌別的抽取欄位：名稱 -> {說明文字: 代碼} (列舉) 或說明文字 (布林)
+FIELDS = {
+    'endometrial': dict(
+        {'histology': options.ENDOMETRIAL_HISTOLOGY,
+         'myometrial_invasion': options.ENDOMETRIAL_MYOMETRIAL,
+         'lvsi': options.ENDOMETRIAL_LVSI,
+         'lymph_node_size': options.ENDOMETRIAL_LN_SIZE},
+        **dict(options.ENDOMETRIAL_EXTENT_FLAGS + options.ENDOMETRIAL_NODE_MOLECULAR_FLAGS)),
+    'ovarian': {'t': options.OVARIAN_T, 'n': options.OVARIAN_N, 'm': options.OVARIAN_M},
+    'cervical': {'t': options.CERVICAL_T, 'n': options.CERVICAL_N, 'm': options.CERVICAL_M},
+    'sarcoma': {'sarcoma_type': options.SARCOMA_TYPES, 't': _sarcoma_t_labels(),
+                'n': options.SARCOMA_N, 'm': options.SARCOMA_M},
+    'vulvar': {'t': options.VULVAR_T, 'n': options.VULVAR_N, 'm': options.VULVAR_M},
+    'vaginal': {'t': options.VAGINAL_T, 'n': options.VAGINAL_N, 'm': options.VAGINAL_M},
+    'gtn': {'t': options.GTN_T, 'm': options.GTN_M},
+}
+
+EXTRACT_PROMPT_TEMPLATE = """你是婦科腫瘤病理報告的資料抽取器。癌症類型上下文：{cancer_context}。
+只根據病理報告內容填寫 JSON 欄位，不要推論分期。
+報告未提及或無法確定的欄位填 null，並把欄位名稱列入 missing。
+"""
+REPORT_TEXT_TEMPLATE = "\n病理報告文字：\n{report_text}\n"
+
+# 手動分期頁面的表單元件 key，供抽取結果帶入表單
+FORM_KEY = 'form.{cancer}.{name}'
+
+# error 為無法分期的原因 (必要欄位缺漏或欄位組合不一致)
+Extraction = namedtuple('Extraction', ['cancer', 'inputs', 'missing', 'result', 'error'], defaults=(None,))
+
+
+def _field_schema(spec):
+    if isinstance(spec, str):
+        return {'type': 'BOOLEAN', 'nullable': True, 'description': spec}
+    codes = list(dict.fromkeys(spec.values()))
+    return {'type': 'STRING', 'nullable': True, 'enum': codes,
+            'description': '；'.join(f"{code}: {label}" for label, code in spec.items())}
+
+
+def _cancer_schema(cancer, names=None):
+    fields = FIELDS[cancer]
+    names = list(fields) if names is None else [name for name in fields if name in names]
+    return {
+        'type': 'OBJECT',
+        'properties': dict({name: _field_schema(fields[name]) for name in names},
+                           missing={'type': 'ARRAY', 'items': {'type': 'STRING', 'enum': names}}),
+        'required': names + ['missing'],
+    }
+
+
+def response_schema(cancer, names=None):
+    """cancer 為 None 時 (自動判斷) 由模型先選癌別，再填該癌別的欄位；names 限定只抽取部分欄位。"""
+    if cancer is not None:
+        return _cancer_schema(cancer, names)
+    properties = {'cancer': {'type': 'STRING', 'enum': list(FIELDS)}}
+    for name in FIELDS:
+        properties[name] = dict(_cancer_schema(name), nullable=True)
+    return {'type': 'OBJECT', 'properties': properties, 'required': ['cancer']}
+
+
+def build_prompt(cancer_context, report_text=None):
+    """report_text 為報告文字 (文字輸入模式)；None 表示報告在附加的圖片中。"""
+    prompt = EXTRACT_PROMPT_TEMPLATE.format(cancer_context=cancer_context)
+    if report_text is not None:
+        prompt += REPORT_TEXT_TEMPLATE.format(report_text=report_text)
+    return prompt
+
+
+def generation_config(cancer_context, names=None):
+    if cancer_context not in CONTEXT_CANCERS:
+        raise ValueError(f"不支援的癌症類型上下文: {cancer_context!r}")
+    return {'responseMimeType': 'application/json',
+            'responseSchema': response_schema(CONTEXT_CANCERS[cancer_context], names),
+            'temperature': 0}
+
+
+def parse_extraction(cancer_context, text, known=None):
+    """解析模型回傳的 JSON 文字並以本機規則分期，回傳 Extraction。
+
+    known 為已在本機確定的欄位，優先於模型回傳的值。
+    result 為 StageResult；必要欄位缺漏或組合不一致時為 None (見 stage_inputs)。
+    JSON 格式錯誤或欄位值不合法時丟出 ValueError。
+    """
+    data = json.loads(text)
+    cancer = CONTEXT_CANCERS[cancer_context]
+    if cancer is None:
+        cancer = data.get('cancer')
+        if cancer not in FIELDS:
+            raise ValueError(f"無法判斷癌別: {cancer!r}")
+        data = data.get(cancer) or {}
+    inputs = {name: data[name] for name in FIELDS[cancer] if data.get(name) is not None}
+    reported = set(data.get('missing') or ()) - set(known or ())
+    inputs.update(known or {})
+    return stage_inputs(cancer, inputs, [name for name in inputs if name in reported])
+
+
+def stage_inputs(cancer, inputs, missing=()):
+    """驗證欄位代碼後以本機規則分期，回傳 Extraction；未提供的欄位併入 missing。
+
+    staging.REQUIRED_FIELDS 中的欄位缺漏，或欄位組合不一致 (例如平滑肌肉瘤的 T1c) 時
+    result 為 None，error 說明原因；其他未提供的欄位使用分期函式的預設值。
+    """
+    fields = FIELDS[cancer]
+    inputs = {name: inputs[name] for name in fields if name in inputs and name not in missing}
+    missing = [name for name in fields if name not in inputs]
+    for name, value in inputs.items():
+        spec = fields[name]
+        if isinstance(spec, str):
+            valid = isinstance(value, bool)
+        else:
+            valid = isinstance(value, str) and value in spec.values()
+        if not valid:
+            raise ValueError(f"{name} 不合法: {value!r}")
+    absent = staging.missing_fields(cancer, inputs)
+    if absent:
+        return Extraction(cancer, inputs, missing, None, f"缺少必要欄位：{', '.join(absent)}")
+    try:
+        result = staging.get_stager(cancer)(**inputs)
+    except ValueError as e:
+        return Extraction(cancer, inputs, missing, None, f"欄位組合不一致：{e}")
+    return Extraction(cancer, inputs, missing, result)
+
+
+def form_values(cancer, inputs):
+    """把欄位代碼換回手動分期頁面的選項文字，回傳 {元件 key: 值}。"""
+    values = {}
+    for name, value in inputs.items():
+        spec = FIELDS[cancer][name]
+        if cancer == 'sarcoma' and name == 't' and 'sarcoma_type' in inputs:
+            spec = options.SARCOMA_T[inputs['sarcoma_type']]
+        if not isinstance(spec, str):
+            value = next(label for label, code in spec.items() if code == value)
+        values[FORM_KEY.format(cancer=cancer, name=name)] = value
+    return values
@@ -0,0 +1,240 @@
+# AI 分析的背景工作
+#
+# Streamlit 每次互動都會重新執行腳本，在腳本執行緒中等待 API 會讓整個 session 卡住，
+# 而且 rerun 時結果會遺失。這裡以程序共用的執行緒池執行 AI 分析，session_state
+# 只保存工作 id；畫面定期輪詢工作狀態，使用者可隨時取消。
+#
+# 取消為合作式：尚未開始的工作直接取消；執行中的工作在串流的每一段之間、
+# 批次的每個病例之前檢查取消旗標，一次性 (非串流) 的請求會在回應回來後丟棄結果。
+
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import ai_batch
+import ai_cache
+import gemini
+import metrics
+
+QUEUED, RUNNING, DONE, ERROR, CANCELLED = 'queued', 'running', 'done', 'error', 'cancelled'
+FINISHED = frozenset({DONE, ERROR, CANCELLED})
+
+_ids = itertools.count(1)
+
+
+class JobCancelled(ai_batch.Cancelled):
+    pass
+
+
+class Job:
+    """單一背景工作；fn 可透過 append() 回報部分文字、progress 回報進度 (0~1)。"""
+
+    def __init__(self, kind, label, meta=None):
+        self.id = next(_ids)
+        self.kind = kind
+        self.label = label
+        self.meta = dict(meta or {})
+        self.status = QUEUED
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.progress = 0.0
+        self.parts = []
+        self.partial = None
+        self.result = None
+        self.error = None
+        self._cancel = threading.Event()
+        self._future = None
+
+    @property
+    def done(self):
+        return self.status in FINISHED
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    @property
+    def text(self):
+        return ''.join(self.parts)
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def cancel(self):
+        self._cancel.set()
+        if self._future is not None and self._future.cancel():
+            self.status = CANCELLED
+            self.finished = time.time()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def append(self, text):
+        self.parts.append(text)
+
+
+class JobManager:
+    """程序共用的背景工作池；完成超過 keep_seconds 的工作會被清除。"""
+
+    def __init__(self, max_workers=4, keep_seconds=3600):
+        if max_workers <= 0:
+            raise ValueError(f"max_workers 必須為正數: {max_workers!r}")
+        self.keep_seconds = keep_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ai-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, label, fn, *args, meta=None, **kwargs):
+        """以 fn(job, *args, **kwargs) 建立背景工作，回傳 Job；回傳值存入 job.result。"""
+        job = Job(kind, label, meta)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        job._future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancel_requested:
+            job.status, job.finished = CANCELLED, time.time()
+            return
+        job.status, job.started = RUNNING, time.time()
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = str(e)
+            job.status = ERROR
+        finally:
+            job.progress = 1.0 if job.status == DONE else job.progress
+            job.finished = time.time()
+
+    def _prune(self):
+        cutoff = time.time() - self.keep_seconds
+        for job_id in [i for i, job in self._jobs.items() if job.done and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, job_ids):
+        """依 id 取得仍存在的工作 (已清除的 id 會略過)。"""
+        with self._lock:
+            return [self._jobs[i] for i in job_ids if i in self._jobs]
+
+    def active_count(self):
+        with self._lock:
+            return sum(not job.done for job in self._jobs.values())
+
+    def shutdown(self):
+        for job in list(self._jobs.values()):
+            job.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _parsed(parse, text):
+    if parse is None:
+        return None
+    try:
+        with metrics.timer('response_parse_seconds', kind='extraction'):
+            return parse(text)
+    except ValueError as e:  # 含 json.JSONDecodeError
+        raise RuntimeError(f"AI 回傳的內容無法解析：{e}") from None
+
+
+def analyze_report(job, client, api_key, prompt_text, images, generation_config=None, stream=False, cache=None,
+                   parse=None):
+    """背景工作：分析一份報告，回傳結果 dict。
+
+    串流時文字即時累積在 job.parts，每段之間檢查取消並在取消時關閉連線。
+    parse 不為 None 時以 parse(text) 解析回答 (例如結構化抽取)，結果存於 'parsed'；
+    只有解析成功的回答才寫入快取。
+    回傳 {'text', 'parsed', 'cached', 'latency', 'ttft', 'retries', 'usage'}；
+    API 回傳非 200、沒有可用文字或 parse 丟出 ValueError 時丟出 RuntimeError。
+    """
+    key_text = prompt_text + (gemini.encode_payload(generation_config) if generation_config else '')
+    key = None
+    if cache is not None:
+        key = ai_cache.cache_key(gemini.PROMPT_VERSION, client.model, key_text, images)
+        text = cache.get(key)
+        if text is not None:
+            try:
+                parsed = _parsed(parse, text)
+            except RuntimeError:
+                # 舊版未經解析就存入的回答：當作未命中，重新呼叫模型
+                text = None
+        if text is not None:
+            job.append(text)
+            return {'text': text, 'parsed': parsed, 'cached': True, 'latency': 0.0, 'ttft': None, 'retries': 0,
+                    'usage': gemini.Usage(0, 0, 0)}
+    job.check_cancelled()
+
+    payload = gemini.PayloadStream(prompt_text, images, generation_config)
+    if stream:
+        response, call = client.stream_generate(api_key, payload)
+    else:
+        response, call = client.generate(api_key, payload)
+    if response.status_code != 200:
+        detail = response.text[:500]
+        response.close()
+        raise RuntimeError(f"API 呼叫失敗 (Status Code: {response.status_code}) {detail}")
+
+    if stream:
+        text_stream = gemini.TextStream(response, call)
+        pieces = iter(text_stream)
+        try:
+            for piece in pieces:
+                job.append(piece)
+                job.check_cancelled()
+        finally:
+            pieces.close()  # 取消時立即關閉連線
+        info = text_stream.info
+        if not info.chunks:
+            raise RuntimeError("無法解析 AI 回傳的資料，可能內容被阻擋或格式錯誤。")
+        text, latency, ttft = text_stream.text, info.total, info.ttft
+        usage = gemini.extract_usage(text_stream.last_event)
+    else:
+        job.check_cancelled()
+        with metrics.timer('response_parse_seconds', kind='json'):
+            result = response.json()
+            try:
+                text = gemini.extract_text(result)
+            except KeyError:
+                raise RuntimeError("無法解析 AI 回傳的資料，可能內容被阻擋或格式錯誤。") from None
+        job.append(text)
+        latency, ttft = call.latency, None
+        usage = gemini.extract_usage(result)
+    parsed = _parsed(parse, text)
+    if cache is not None:
+        cache.put(key, text)
+    return {'text': text, 'parsed': parsed, 'cached': False, 'latency': latency, 'ttft': ttft,
+            'retries': call.retries, 'usage': usage}
+
+
+def batch_report(job, cases, analyze, workers):
+    """背景工作：批次分析多位病例，job.partial 為即時的 BatchResult 清單 (未完成為 None)。"""
+    results = [None] * len(cases)
+    job.partial = results
+
+    def checked(case):
+        job.check_cancelled()
+        return analyze(case)
+
+    batch = ai_batch.run_batch(cases, checked, workers)
+    try:
+        for done, (i, r) in enumerate(batch, 1):
+            results[i] = r
+            job.progress = done / len(cases)
+            job.check_cancelled()
+    finally:
+        # 取消時關閉產生器，尚未開始的病例不再送出
+        batch.close()
+    return results
@@ -1,9 +1,15 @@
+import functools
+import time
+
 import streamlit as st
-import requests
-import json
-import base64
-from PIL import Image
-import io
+
+import metrics
+import options
+import staging
+import what_if
+
+# AI 相關模組 (ai_batch、ai_cache、ai_extract、ai_jobs、gemini、image_prep、text_extract)
+# 在 AI 頁面或下列函式中才匯入，只使用分期頁面的 rerun 不需載入
 
 # 設定頁面配置
 st.set_page_config(
@@ -13,22 +19,253 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# 整頁重新執行的耗時 (在最後依頁面記錄)
+rerun_start = time.perf_counter()
+
 # 標題樣式
-st.markdown("""
-    <style>
-    .main {
-        background-color: #f5f5f5;
-    }
-    h1 {
-        color: #2c3e50;
-    }
-    .stButton>button {
-        width: 100%;
-        background-color: #008080;
-        color: white;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+st.markdown(options.CSS, unsafe_allow_html=True)
+
+@st.cache_resource
+def get_gemini_client():
+    # 每個程序一個 client，所有 session 共用連線池
+    import gemini
+
+    return gemini.GeminiClient()
+
+
+@st.cache_resource
+def get_ai_cache():
+    # 快取檔可由多個 worker 程序共用；計數器為本程序累計
+    import ai_cache
+
+    return ai_cache.AICache()
+
+
+@st.cache_resource
+def get_job_manager():
+    # AI 分析在程序共用的執行緒池中執行，session_state 只保存工作 id
+    import ai_jobs
+
+    return ai_jobs.JobManager()
+
+
+def prefill_form(cancer, inputs):
+    # 按鈕 callback：在下一次執行前寫入表單元件的值並切換到該癌別頁面
+    import ai_extract
+
+    st.session_state.update(ai_extract.form_values(cancer, inputs))
+    st.session_state["app_mode"] = options.CANCER_APP_MODES[cancer]
+
+
+def show_extraction(extraction, sources=None, evidence=None):
+    """顯示抽取欄位與本機規則分期；sources/evidence 為各欄位的來源與原文依據。"""
+    st.dataframe([{"欄位": name, "值": str(value), "來源": (sources or {}).get(name, "AI"),
+                   "依據": (evidence or {}).get(name, "")}
+                  for name, value in extraction.inputs.items()])
+    if extraction.missing:
+        st.warning("報告未提及 (使用預設值或無法分期)：" + ", ".join(extraction.missing))
+    if extraction.result is None:
+        st.error(f"無法判定分期：{extraction.error or '缺少必要欄位'}")
+    else:
+        st.success(f"分期 ({extraction.cancer}): {extraction.result.stage or '無法判定'}")
+        st.info(f"TNM: {' '.join(extraction.result.tnm)}")
+        st.button("📝 帶入分期表單", key=f"prefill.{extraction.cancer}", on_click=prefill_form,
+                  args=(extraction.cancer, extraction.inputs))
+
+
+def record_usage(mode, usage, latency):
+    # 依輸出方式累計 token 與耗時，側邊欄顯示平均值以比較各種方式
+    st.session_state.setdefault('ai_usage', {}).setdefault(mode, []).append(
+        (usage.prompt_tokens, usage.output_tokens, latency))
+    st.caption(f"🔢 Token：輸入 {usage.prompt_tokens}，輸出 {usage.output_tokens}")
+
+
+def _result_text(result):
+    if isinstance(result, staging.GTNScore):
+        return f"{result.score} 分 ({result.risk})"
+    return f"{result.stage or '無法判定'} ({' '.join(result.tnm)})"
+
+
+def stage_now(cancer, *args, **kwargs):
+    # 「計算分期」按鈕的分期呼叫，耗時計入 staging_seconds
+    with metrics.timer('staging_seconds', cancer=cancer, kind='button'):
+        return staging.get_stager(cancer)(*args, **kwargs)
+
+
+def show_what_if(cancer, inputs, fields, target="分期"):
+    """單一欄位變化面板：列出會改變結果的單一改變。
+
+    inputs 為分期函式的欄位代碼；fields 為 {欄位: (顯示名稱, {選項文字: 代碼})}，勾選欄位的選項為 None。
+    """
+    with metrics.timer('staging_seconds', cancer=cancer, kind='what_if'):
+        base, found = what_if.sensitivity(cancer, inputs)
+    changed = [v for v in found if v.changed]
+    with st.expander(f"🔀 What-if：{len(changed)} 種單一欄位變化會改變{target}"):
+        st.caption(f"目前：{_result_text(base)}；共檢查 {len(found)} 種單一欄位變化")
+        rows = []
+        for v in changed:
+            title, labels = fields[v.field]
+            if labels is None:
+                value = "勾選" if v.value else "取消勾選"
+            else:
+                value = next(label for label, code in labels.items() if code == v.value)
+            rows.append({"欄位": title, "改為": value, "結果": _result_text(v.result)})
+        if rows:
+            st.dataframe(rows, hide_index=True)
+
+
+# app_rerun_seconds 的 page 標籤
+PAGE_NAMES = {mode: cancer for cancer, mode in options.CANCER_APP_MODES.items()}
+
+
+def show_metrics():
+    """側邊欄除錯面板：目前程序累計的耗時分佈與計數器。"""
+    snap = metrics.snapshot()
+    st.caption(f"自 {time.strftime('%H:%M:%S', time.localtime(snap['started']))} 起累計"
+               + (f"，定期寫入 {metrics.METRICS_PATH}" if metrics.METRICS_PATH else ""))
+    if snap['timers']:
+        st.dataframe([{"指標": t['name'], "標籤": ", ".join(f"{k}={v}" for k, v in t['labels'].items()),
+                       "次數": t['count'], "平均 ms": t['sum'] / t['count'] * 1000, "最大 ms": t['max'] * 1000}
+                      for t in snap['timers']], hide_index=True)
+    if snap['counters']:
+        st.dataframe([{"計數器": c['name'], "標籤": ", ".join(f"{k}={v}" for k, v in c['labels'].items()),
+                       "值": c['value']} for c in snap['counters']], hide_index=True)
+
+
+def prepare_images(images, names, prep, dedupe=False, threshold=None):
+    """依前處理設定 prep (preprocess 的參數 dict) 壓縮 (mime_type, 上傳檔案) 清單。
+
+    dedupe 為 True 時先略過完全相同的檔案；threshold 不為 None 時另略過經逐像素確認的近似頁面
+    (見 image_prep.find_duplicates)。
+    prep 為 None (未啟用前處理) 時直接送出上傳檔案物件，由 PayloadStream 逐段讀取編碼。
+    回傳 (送出的圖片, 送出的檔名, PrepResult 清單, 略過的 (檔名, 保留的檔名, 相似度) 清單)。
+    """
+    skipped = []
+    if dedupe:
+        duplicates = image_prep.find_duplicates(images, threshold)
+        skipped = [(names[d.index], names[d.original], d.similarity) for d in duplicates]
+        drop = {d.index for d in duplicates}
+        images = [image for i, image in enumerate(images) if i not in drop]
+        names = [name for i, name in enumerate(names) if i not in drop]
+    if prep is None:
+        return images, names, [], skipped
+    prepped = [image_prep.preprocess(data.getvalue(), mime, name=name, **prep)
+               for name, (mime, data) in zip(names, images)]
+    return [(r.mime_type, r.data) for r in prepped], names, prepped, skipped
+
+
+def analyze_images(job, client, api_key, prompt_text, images, names, prep, dedupe, threshold, gen_config, stream,
+                   cache):
+    # 背景工作：略過重複頁面、圖片前處理後送出分析；前處理的大小等資訊附在回傳值中供顯示
+    images, names, prepped, skipped = prepare_images(images, names, prep, dedupe, threshold)
+    job.check_cancelled()
+    # 結構化抽取在背景工作中解析，解析失敗的回答不會寫入快取
+    parse = None
+    if job.meta['structured']:
+        parse = functools.partial(ai_extract.parse_extraction, job.meta['cancer_context'])
+    result = ai_jobs.analyze_report(job, client, api_key, prompt_text, images, gen_config, stream, cache, parse)
+    # 工作保留在程序共用的 JobManager 中，只留下顯示用的資訊，不保留壓縮後的圖片
+    result['prepped'] = [(name, r.original_bytes, len(r.data), r.mime_type, r.size, r.elapsed)
+                         for name, r in zip(names, prepped)]
+    result['skipped'] = skipped
+    return result
+
+
+def show_answer(text, structured, cancer_context, extraction=None):
+    if not structured:
+        st.markdown("### 📋 AI 分析結果 (Model: Gemini 2.5 Flash)")
+        st.markdown(text)
+        return
+    st.markdown("### 📋 AI 抽取欄位 → 本機規則分期")
+    if extraction is None:
+        try:
+            with metrics.timer('response_parse_seconds', kind='extraction'):
+                extraction = ai_extract.parse_extraction(cancer_context, text)
+        except ValueError as e:  # 含 json.JSONDecodeError
+            st.error(f"AI 回傳的內容無法解析：{e}")
+            return
+    show_extraction(extraction)
+
+
+def remove_job(job):
+    # 按鈕 callback：從本 session 的工作清單移除 (進行中的工作一併取消)
+    job.cancel()
+    st.session_state['ai_jobs'].remove(job.id)
+
+
+def show_job(job):
+    """顯示單一背景工作的狀態、部分結果或最終結果。"""
+    icon = {ai_jobs.QUEUED: "🕒", ai_jobs.RUNNING: "⏳", ai_jobs.DONE: "✅",
+            ai_jobs.ERROR: "❌", ai_jobs.CANCELLED: "⛔"}[job.status]
+    with st.container(border=True):
+        cols = st.columns([6, 1, 1])
+        cols[0].markdown(f"**{icon} {job.label}** · {job.elapsed:.1f} 秒")
+        if not job.done:
+            cols[1].button("取消", key=f"job.cancel.{job.id}", on_click=job.cancel,
+                           disabled=job.cancel_requested)
+        cols[2].button("移除", key=f"job.remove.{job.id}", on_click=remove_job, args=(job,))
+
+        if job.kind == 'batch':
+            results = job.result or job.partial or []
+            finished = [r for r in results if r is not None]
+            if not job.done:
+                st.progress(job.progress, text=f"{len(finished)}/{len(results)} 完成")
+            if job.status == ai_jobs.ERROR:
+                st.error(f"發生錯誤：{job.error}")
+            if finished:
+                st.dataframe([{"病例": r.case_id, "狀態": (f"❌ {r.error}" if r.status == 'error' else
+                                                          "⚡ 快取" if r.cached else f"✅ {r.latency:.1f} 秒")}
+                              for r in finished])
+            if job.done and finished:
+                st.download_button("⬇️ 下載結果 (CSV)", ai_batch.results_csv(finished),
+                                   file_name="ai_batch_results.csv", mime="text/csv", key=f"job.csv.{job.id}")
+                for r in finished:
+                    with st.expander(f"{'✅' if r.status == 'ok' else '❌'} {r.case_id}"):
+                        if r.status == 'ok':
+                            st.markdown(r.text)
+                        else:
+                            st.error(r.error)
+            return
+
+        structured, cancer_context = job.meta['structured'], job.meta['cancer_context']
+        if job.status == ai_jobs.DONE:
+            result = job.result
+            for name, original, score in result['skipped']:
+                st.caption(f"♻️ 略過 {name}：與 {original} "
+                           f"{'內容相同' if score == 1 else f'相似度 {score:.2f}'}，不重複送出")
+            for name, original_bytes, output_bytes, _, size, _ in result['prepped']:
+                if size is None:
+                    st.caption(f"🖼️ {name}: 無法解碼，已送出原檔 ({original_bytes / 1024:.0f} KB)")
+                    continue
+                st.caption(f"🖼️ {name}: {original_bytes / 1024:.0f} KB → {output_bytes / 1024:.0f} KB "
+                           f"({size[0]}×{size[1]}, 節省 {1 - output_bytes / original_bytes:.0%})")
+            if result['cached']:
+                st.caption("⚡ 相同報告已分析過，直接使用快取結果")
+            elif result['ttft'] is not None:
+                st.caption(f"⏱️ 首字 {result['ttft']:.1f} 秒，總耗時 {result['latency']:.1f} 秒，"
+                           f"重試 {result['retries']} 次")
+            else:
+                st.caption(f"⏱️ API 耗時 {result['latency']:.1f} 秒，重試 {result['retries']} 次")
+            # 每個工作只計入一次用量 (面板會重複顯示)
+            usage = result['usage']
+            if not result['cached']:
+                if job.meta.get('recorded'):
+                    st.caption(f"🔢 Token：輸入 {usage.prompt_tokens}，輸出 {usage.output_tokens}")
+                else:
+                    job.meta['recorded'] = True
+                    record_usage(job.meta['mode'], usage, result['latency'])
+            show_answer(result['text'], structured, cancer_context, result['parsed'])
+        elif job.status == ai_jobs.ERROR:
+            st.error(f"發生錯誤：{job.error}")
+            st.info("💡 建議：請確認 API Key 是否正確。")
+        elif job.status == ai_jobs.CANCELLED:
+            st.warning("已取消")
+        elif job.parts and not structured:
+            # 串流中：顯示目前已生成的部分
+            st.markdown(job.text)
+        else:
+            st.caption("AI 正在仔細閱讀病理報告並進行分期運算...")
+
 
 st.title("🏥 婦癌臨床分期輔助系統")
 st.markdown("### Integrated Gynecologic Oncology Staging Tool")
@@ -36,17 +273,7 @@ st.markdown("### Integrated Gynecologic Oncology Staging Tool")
 # 側邊欄導航
 with st.sidebar:
     st.title("導航選單")
-    app_mode = st.radio("請選擇功能：",
-        ["子宮內膜癌 (Endometrial)", 
-         "卵巢癌 (Ovarian)", 
-         "子宮頸癌 (Cervical)", 
-         "子宮惡性肉瘤 (Sarcoma)", 
-         "外陰黑色素瘤 (Vulvar Melanoma)", 
-         "陰道癌 (Vaginal)", 
-         "妊娠滋養層細胞腫瘤 (GTN)",
-         "外陰癌 (Vulvar)",
-         "🤖 AI 智慧判讀 (Beta)"]
-    )
+    app_mode = st.radio("請選擇功能：", options.APP_MODES, key="app_mode")
     
     st.markdown("---")
     st.subheader("🤖 AI 設定")
@@ -56,8 +283,7 @@ with st.sidebar:
     if api_key:
         if st.button("🔍 測試 API Key"):
             try:
-                test_url = f"https://generativelanguage.googleapis.com/v1beta/models?key={api_key}"
-                test_res = requests.get(test_url)
+                test_res, _ = get_gemini_client().list_models(api_key)
                 if test_res.status_code == 200:
                     models = test_res.json().get('models', [])
                     model_names = [m['name'].replace('models/', '') for m in models if 'gemini' in m['name']]
@@ -77,413 +303,265 @@ if app_mode == "子宮內膜癌 (Endometrial)":
     col1, col2 = st.columns(2)
     
     with col1:
-        histology_type = st.radio("組織學型態", 
-            ['非兇險 (non-aggressive): Low grade (G1/G2) endometrioid',
-             '兇險 (aggressive): Serous, Clear cell, Undifferentiated, Carcinosarcoma, High-grade endometrioid (G3)'])
-        
-        myometrial_invasion = st.radio("子宮肌層侵犯深度", ['無侵犯', '<50%', '≥50%'])
-        
-        lvsi = st.radio("血管或淋巴管侵犯 (LVSI)", 
-            ['無侵犯', '輕微侵犯(focal)', '大量侵犯(extensive, ≥5 vessels)'])
-        
-        lymph_node_size = st.radio("淋巴結轉移大小", 
-            ['無', '微轉移 (micrometastasis): 0.2-2 mm', '巨轉移 (macrometastasis): >2 mm'])
+        histology_type = st.radio("組織學型態", list(options.ENDOMETRIAL_HISTOLOGY), key="form.endometrial.histology")
+        myometrial_invasion = st.radio("子宮肌層侵犯深度", list(options.ENDOMETRIAL_MYOMETRIAL),
+                                       key="form.endometrial.myometrial_invasion")
+        lvsi = st.radio("血管或淋巴管侵犯 (LVSI)", list(options.ENDOMETRIAL_LVSI), key="form.endometrial.lvsi")
+        lymph_node_size = st.radio("淋巴結轉移大小", list(options.ENDOMETRIAL_LN_SIZE),
+                                   key="form.endometrial.lymph_node_size")
 
     with col2:
         st.subheader("侵犯範圍勾選")
-        cervical_stroma = st.checkbox('宮頸間質侵犯')
-        ovarian_tubal = st.checkbox('卵巢或輸卵管侵犯')
-        ovarian_limited = st.checkbox('卵巢腫瘤單側侷限無破裂')
-        serosa = st.checkbox('漿膜侵犯')
-        vaginal_parametrial = st.checkbox('陰道或子宮旁侵犯')
-        pelvic_peritoneum = st.checkbox('骨盆腹膜侵犯')
-        upper_abd_peritoneum = st.checkbox('骨盆以上腹腔腹膜侵犯')
-        bladder_intestinal = st.checkbox('膀胱或腸黏膜侵犯')
-        distant_meta = st.checkbox('遠處轉移 (含腹腔外淋巴結、肺、肝、腦、骨等)')
+        flags = {name: st.checkbox(label, key=f"form.endometrial.{name}")
+                 for name, label in options.ENDOMETRIAL_EXTENT_FLAGS}
         
         st.subheader("淋巴結與分子特徵")
-        pelvic_ln = st.checkbox('骨盆淋巴結轉移')
-        pa_ln = st.checkbox('主動脈旁淋巴結轉移')
-        pole_mut = st.checkbox('POLE mutation')
-        p53_abn = st.checkbox('p53 abnormal')
-
+        flags.update({name: st.checkbox(label, key=f"form.endometrial.{name}")
+                      for name, label in options.ENDOMETRIAL_NODE_MOLECULAR_FLAGS})
+
+    inputs = dict(histology=options.ENDOMETRIAL_HISTOLOGY[histology_type],
+                  myometrial_invasion=options.ENDOMETRIAL_MYOMETRIAL[myometrial_invasion],
+                  lvsi=options.ENDOMETRIAL_LVSI[lvsi],
+                  lymph_node_size=options.ENDOMETRIAL_LN_SIZE[lymph_node_size],
+                  **flags)
     if st.button("計算分期"):
-        T_stage = 'T1a' if myometrial_invasion in ['無侵犯', '<50%'] else 'T1b'
-        N_stage = 'N0'
-        M_stage = 'M0'
-
-        if cervical_stroma: T_stage = 'T2'
-        if serosa or ovarian_tubal or ovarian_limited: T_stage = 'T3a'
-        if vaginal_parametrial or pelvic_peritoneum: T_stage = 'T3b'
-        if bladder_intestinal: T_stage = 'T4'
+        res = stage_now('endometrial', **inputs)
 
-        if pelvic_ln: N_stage = 'N1mi' if '微轉移' in lymph_node_size else 'N1a'
-        if pa_ln: N_stage = 'N2mi' if '微轉移' in lymph_node_size else 'N2a'
-        
-        if distant_meta: M_stage = 'M1'
-
-        result = ""
-        if pole_mut and T_stage in ['T1a', 'T1b', 'T2'] and N_stage == 'N0' and M_stage == 'M0':
-            result = f'FIGO stage IAmPOLEmut, AJCC TNM stage {T_stage} {N_stage} {M_stage}'
-        elif p53_abn and T_stage in ['T1a', 'T1b', 'T2'] and N_stage == 'N0' and M_stage == 'M0':
-            result = f'FIGO stage IICmp53abn, AJCC TNM stage {T_stage} {N_stage} {M_stage}'
-        elif distant_meta:
-            result = f'FIGO stage 4C, AJCC TNM stage {T_stage} {N_stage} {M_stage}'
-        elif upper_abd_peritoneum:
-            result = f'FIGO stage 4B, AJCC TNM stage {T_stage} {N_stage} {M_stage}'
-        elif T_stage == 'T4':
-            result = f'FIGO stage 4A, AJCC TNM stage {T_stage} {N_stage} {M_stage}'
-        elif N_stage == 'N2mi':
-            result = f'FIGO stage 3C2i, AJCC TNM stage {T_stage} {N_stage} {M_stage}'
-        elif N_stage == 'N2a':
-            result = f'FIGO stage 3C2ii, AJCC TNM stage {T_stage} {N_stage} {M_stage}'
-        elif N_stage == 'N1mi':
-            result = f'FIGO stage 3C1i, AJCC TNM stage {T_stage} {N_stage} {M_stage}'
-        elif N_stage == 'N1a':
-            result = f'FIGO stage 3C1ii, AJCC TNM stage {T_stage} {N_stage} {M_stage}'
-        elif serosa:
-            result = f'FIGO stage 3A2, AJCC TNM stage {T_stage} {N_stage} {M_stage}'
-        elif ovarian_tubal or ovarian_limited:
-            if ovarian_limited and myometrial_invasion in ['無侵犯', '<50%'] and lvsi in ['無侵犯', '輕微侵犯(focal)'] and not any([serosa, vaginal_parametrial, pelvic_peritoneum, pelvic_ln, pa_ln, bladder_intestinal, distant_meta, upper_abd_peritoneum]):
-                result = f'FIGO stage 1A3, AJCC TNM stage {T_stage} {N_stage} {M_stage}'
-            else:
-                result = f'FIGO stage 3A1, AJCC TNM stage {T_stage} {N_stage} {M_stage}'
-        elif vaginal_parametrial and not any([pelvic_peritoneum, pelvic_ln, pa_ln, upper_abd_peritoneum, bladder_intestinal, distant_meta]):
-            result = f'FIGO stage 3B1, AJCC TNM stage T3b {N_stage} {M_stage}'
-        elif pelvic_peritoneum and not any([pelvic_ln, pa_ln, upper_abd_peritoneum, bladder_intestinal, distant_meta]):
-            result = f'FIGO stage 3B2, AJCC TNM stage T3b {N_stage} {M_stage}'
-        elif histology_type.startswith('兇險') and myometrial_invasion != '無侵犯':
-            result = f'FIGO stage 2C, AJCC TNM stage {T_stage} {N_stage} {M_stage}'
-        elif cervical_stroma:
-             if histology_type.startswith('非兇險'):
-                result = f'FIGO stage 2A, AJCC TNM stage {T_stage} {N_stage} {M_stage}'
-        elif lvsi.startswith('大量侵犯') and histology_type.startswith('非兇險'):
-            result = f'FIGO stage 2B, AJCC TNM stage {T_stage} {N_stage} {M_stage}'
-        elif histology_type.startswith('非兇險'):
-            if myometrial_invasion == '≥50%':
-                result = f'FIGO stage 1B, AJCC TNM stage {T_stage} {N_stage} {M_stage}'
-            elif myometrial_invasion == '<50%' and '大量侵犯' not in lvsi:
-                result = f'FIGO stage 1A2, AJCC TNM stage {T_stage} {N_stage} {M_stage}'
-            elif myometrial_invasion == '無侵犯' and '大量侵犯' not in lvsi:
-                result = f'FIGO stage 1A1, AJCC TNM stage {T_stage} {N_stage} {M_stage}'
-        elif histology_type.startswith('兇險') and myometrial_invasion == '無侵犯':
-            result = f'FIGO stage 1C, AJCC TNM stage {T_stage} {N_stage} {M_stage}'
-        else:
-            result = '需進一步評估 (資料組合未涵蓋於標準路徑)'
+        result = res.stage
+        if result and result != staging.ENDOMETRIAL_UNCLASSIFIED:
+            result = f"FIGO stage {result}, AJCC TNM stage {' '.join(res.tnm)}"
 
         st.success(f"判定結果：{result}")
 
+    show_what_if('endometrial', inputs, dict(
+        {'histology': ("組織學型態", options.ENDOMETRIAL_HISTOLOGY),
+         'myometrial_invasion': ("子宮肌層侵犯深度", options.ENDOMETRIAL_MYOMETRIAL),
+         'lvsi': ("LVSI", options.ENDOMETRIAL_LVSI),
+         'lymph_node_size': ("淋巴結轉移大小", options.ENDOMETRIAL_LN_SIZE)},
+        **{name: (label, None) for name, label in
+           options.ENDOMETRIAL_EXTENT_FLAGS + options.ENDOMETRIAL_NODE_MOLECULAR_FLAGS}))
+
 # --- 2. 卵巢癌 ---
 elif app_mode == "卵巢癌 (Ovarian)":
     st.header("卵巢癌分期 (Ovarian Cancer)")
-    
-    TNM_dict = {
-        "單側卵巢、輸卵管未破裂 (T1a)": "T1a", "雙側卵巢、輸卵管未破裂 (T1b)": "T1b",
-        "手術時腫瘤溢出 (T1c1)": "T1c1", "術前破裂或腫瘤於卵巢、輸卵管表面 (T1c2)": "T1c2",
-        "腹水或腹膜沖洗細胞學陽性 (T1c3)": "T1c3", "子宮或輸卵管轉移 (T2a)": "T2a",
-        "其他骨盆組織轉移 (T2b)": "T2b", "腹腔顯微轉移 (T3a)": "T3a",
-        "腹腔轉移 ≤ 2 cm (T3b)": "T3b", "腹腔轉移 > 2 cm (T3c)": "T3c",
-        "無淋巴結轉移 (N0)": "N0", "腹膜後淋巴結轉移 ≤ 10 mm (N1a)": "N1a",
-        "腹膜後淋巴結轉移 > 10 mm (N1b)": "N1b", "無遠端轉移 (M0)": "M0",
-        "胸水細胞學陽性 (M1a)": "M1a", "肝脾實質或腹外器官轉移 (M1b)": "M1b"
-    }
-
-    t_input = st.selectbox("原發腫瘤 (Primary Tumor)", list(TNM_dict.keys())[:10])
-    n_input = st.selectbox("淋巴結轉移 (Lymph Nodes)", list(TNM_dict.keys())[10:13])
-    m_input = st.selectbox("遠端轉移 (Metastasis)", list(TNM_dict.keys())[13:])
+
+    t_input = st.selectbox("原發腫瘤 (Primary Tumor)", list(options.OVARIAN_T), key="form.ovarian.t")
+    n_input = st.selectbox("淋巴結轉移 (Lymph Nodes)", list(options.OVARIAN_N), key="form.ovarian.n")
+    m_input = st.selectbox("遠端轉移 (Metastasis)", list(options.OVARIAN_M), key="form.ovarian.m")
 
     if st.button("計算分期"):
-        stage = "請確認輸入資料是否完整或正確"
-        if m_input == "胸水細胞學陽性 (M1a)": stage = "Stage IVA"
-        elif m_input == "肝脾實質或腹外器官轉移 (M1b)": stage = "Stage IVB"
-        elif n_input == "腹膜後淋巴結轉移 ≤ 10 mm (N1a)": stage = "Stage IIIA1i"
-        elif n_input == "腹膜後淋巴結轉移 > 10 mm (N1b)": stage = "Stage IIIA1ii"
-        elif t_input == "腹腔顯微轉移 (T3a)": stage = "Stage IIIA2"
-        elif t_input == "腹腔轉移 ≤ 2 cm (T3b)": stage = "Stage IIIB"
-        elif t_input == "腹腔轉移 > 2 cm (T3c)": stage = "Stage IIIC"
-        elif t_input == "子宮或輸卵管轉移 (T2a)": stage = "Stage IIA"
-        elif t_input == "其他骨盆組織轉移 (T2b)": stage = "Stage IIB"
-        elif t_input == "單側卵巢、輸卵管未破裂 (T1a)": stage = "Stage IA"
-        elif t_input == "雙側卵巢、輸卵管未破裂 (T1b)": stage = "Stage IB"
-        elif t_input == "手術時腫瘤溢出 (T1c1)": stage = "Stage IC1"
-        elif t_input == "術前破裂或腫瘤於卵巢、輸卵管表面 (T1c2)": stage = "Stage IC2"
-        elif t_input == "腹水或腹膜沖洗細胞學陽性 (T1c3)": stage = "Stage IC3"
-        
-        tnm_res = f"{TNM_dict[t_input]} {TNM_dict[n_input]} {TNM_dict[m_input]}"
-        st.success(f"{stage}")
-        st.info(f"AJCC TNM: {tnm_res}")
+        res = stage_now('ovarian', options.OVARIAN_T[t_input], options.OVARIAN_N[n_input],
+                        options.OVARIAN_M[m_input])
+        st.success(f"{res.stage}")
+        st.info(f"AJCC TNM: {' '.join(res.tnm)}")
+
+    show_what_if('ovarian', {'t': options.OVARIAN_T[t_input], 'n': options.OVARIAN_N[n_input],
+                             'm': options.OVARIAN_M[m_input]},
+                            {'t': ("T", options.OVARIAN_T), 'n': ("N", options.OVARIAN_N), 'm': ("M", options.OVARIAN_M)})
 
 # --- 3. 子宮頸癌 ---
 elif app_mode == "子宮頸癌 (Cervical)":
     st.header("子宮頸癌分期 (Cervical Cancer)")
-    
-    t_ops = [
-        "T1a1: Stromal invasion <3 mm", "T1a2: Stromal invasion 3-5 mm",
-        "T1b1: Invasion ≥5 mm depth, <2 cm dimension", "T1b2: Dimension 2-4 cm",
-        "T1b3: Dimension ≥4 cm", "T2a1: Vaginal involvement <4 cm",
-        "T2a2: Vaginal involvement ≥4 cm", "T2b: Parametrial invasion",
-        "T3a: Lower third vagina", "T3b: Pelvic wall/hydronephrosis",
-        "T3c1: Pelvic LN metastasis", "T3c2: Paraaortic LN metastasis",
-        "T4: Beyond true pelvis or biopsy-proven bladder/rectum mucosal involvement"
-    ]
-    n_ops = ["N0: No regional LN metastasis", "N0(i+): Isolated tumor cells ≤0.2 mm", "N1: Regional LN metastasis"]
-    m_ops = ["M0: No distant metastasis", "M1: Distant metastasis"]
-
-    t_val = st.selectbox("T Stage", t_ops)
-    n_val = st.selectbox("N Stage", n_ops)
-    m_val = st.selectbox("M Stage", m_ops)
+
+    t_val = st.selectbox("T Stage", list(options.CERVICAL_T), key="form.cervical.t")
+    n_val = st.selectbox("N Stage", list(options.CERVICAL_N), key="form.cervical.n")
+    m_val = st.selectbox("M Stage", list(options.CERVICAL_M), key="form.cervical.m")
 
     if st.button("計算分期"):
-        T_code = t_val.split(':')[0]
-        N_code = n_val.split(':')[0]
-        M_code = m_val.split(':')[0]
-        
-        ajcc_stage = f"{T_code} {N_code} {M_code}"
-        figo_stage = 'Cannot classify'
-
-        if t_val.startswith('T4'):
-            figo_stage = 'Stage IVA' if m_val.startswith('M0') else 'Stage IVB'
-        elif m_val.startswith('M1'):
-            figo_stage = 'Stage IVB'
-        elif n_val.startswith(('N1', 'N0(i+)')):
-            figo_stage = 'Stage IIIC'
-        else:
-            figo_dict = {
-                'T1a1': 'Stage IA1', 'T1a2': 'Stage IA2', 'T1b1': 'Stage IB1',
-                'T1b2': 'Stage IB2', 'T1b3': 'Stage IB3', 'T2a1': 'Stage IIA1',
-                'T2a2': 'Stage IIA2', 'T2b': 'Stage IIB', 'T3a': 'Stage IIIA',
-                'T3b': 'Stage IIIB', 'T3c1': 'Stage IIIC1', 'T3c2': 'Stage IIIC2'
-            }
-            figo_stage = figo_dict.get(T_code, 'Cannot classify')
-        
-        st.success(f"FIGO Stage: {figo_stage}")
-        st.info(f"AJCC Stage: {ajcc_stage}")
+        res = stage_now('cervical', options.CERVICAL_T[t_val], options.CERVICAL_N[n_val],
+                        options.CERVICAL_M[m_val])
+        st.success(f"FIGO Stage: {res.stage}")
+        st.info(f"AJCC Stage: {' '.join(res.tnm)}")
+
+    show_what_if('cervical', {'t': options.CERVICAL_T[t_val], 'n': options.CERVICAL_N[n_val],
+                              'm': options.CERVICAL_M[m_val]},
+                             {'t': ("T", options.CERVICAL_T), 'n': ("N", options.CERVICAL_N), 'm': ("M", options.CERVICAL_M)})
 
 # --- 4. 子宮惡性肉瘤 ---
 elif app_mode == "子宮惡性肉瘤 (Sarcoma)":
     st.header("子宮惡性肉瘤分期 (Uterine Sarcoma)")
     
-    sarcoma_type = st.radio("Sarcoma Type", 
-                            ['Leiomyosarcoma', 'Endometrial Stromal Sarcoma', 'Mullerian Adenosarcoma'])
-
-    t_choices = []
-    if sarcoma_type in ['Leiomyosarcoma', 'Endometrial Stromal Sarcoma']:
-        t_choices = ['T1a (≤5 cm)', 'T1b (>5 cm)', 'T2a (adnexa)', 'T2b (pelvic tissues)',
-                     'T3a (one abdominal site)', 'T3b (>one abdominal site)', 'T4 (bladder/rectum)']
-    else:
-        t_choices = ['T1a (endometrium/endocervix)', 'T1b (≤half myometrial invasion)',
-                     'T1c (>half myometrial invasion)', 'T2a (adnexa)', 'T2b (pelvic tissues)',
-                     'T3a (one abdominal site)', 'T3b (>one abdominal site)', 'T4 (bladder/rectum)']
+    sarcoma_type = st.radio("Sarcoma Type", list(options.SARCOMA_TYPES), key="form.sarcoma.sarcoma_type")
+    sarcoma_code = options.SARCOMA_TYPES[sarcoma_type]
+    t_choices = options.SARCOMA_T[sarcoma_code]
     
     col1, col2 = st.columns(2)
     with col1:
-        t_stage = st.selectbox("T Stage", t_choices)
+        t_stage = st.selectbox("T Stage", list(t_choices), key="form.sarcoma.t")
     with col2:
-        n_stage = st.selectbox("N Stage", ['N0 (No regional lymph node metastasis)', 'N1 (Regional lymph node metastasis)'])
-        m_stage = st.selectbox("M Stage", ['M0 (No distant metastasis)', 'M1 (Distant metastasis)'])
+        n_stage = st.selectbox("N Stage", list(options.SARCOMA_N), key="form.sarcoma.n")
+        m_stage = st.selectbox("M Stage", list(options.SARCOMA_M), key="form.sarcoma.m")
 
     if st.button("計算分期"):
-        tnm = f"AJCC TNM: {t_stage.split()[0]} {n_stage.split()[0]} {m_stage.split()[0]}"
-        result_stage = ""
+        res = stage_now('sarcoma', sarcoma_code, t_choices[t_stage], options.SARCOMA_N[n_stage],
+                        options.SARCOMA_M[m_stage])
+        st.success(f"FIGO Stage: {res.stage}")
+        st.info(f"AJCC TNM: {' '.join(res.tnm)}")
 
-        if m_stage.startswith("M1"):
-            result_stage = "FIGO Stage: IVB"
-        elif n_stage.startswith("N1"):
-            result_stage = "FIGO Stage: IIIC"
-        else:
-            stages_map = {
-                'Leiomyosarcoma': {
-                    'T1a (≤5 cm)': "IA", 'T1b (>5 cm)': "IB", 'T2a (adnexa)': "IIA",
-                    'T2b (pelvic tissues)': "IIB", 'T3a (one abdominal site)': "IIIA",
-                    'T3b (>one abdominal site)': "IIIB", 'T4 (bladder/rectum)': "IVA"
-                },
-                'Endometrial Stromal Sarcoma': {
-                    'T1a (≤5 cm)': "IA", 'T1b (>5 cm)': "IB", 'T2a (adnexa)': "IIA",
-                    'T2b (pelvic tissues)': "IIB", 'T3a (one abdominal site)': "IIIA",
-                    'T3b (>one abdominal site)': "IIIB", 'T4 (bladder/rectum)': "IVA"
-                },
-                'Mullerian Adenosarcoma': {
-                    'T1a (endometrium/endocervix)': "IA", 'T1b (≤half myometrial invasion)': "IB",
-                    'T1c (>half myometrial invasion)': "IC", 'T2a (adnexa)': "IIA",
-                    'T2b (pelvic tissues)': "IIB", 'T3a (one abdominal site)': "IIIA",
-                    'T3b (>one abdominal site)': "IIIB", 'T4 (bladder/rectum)': "IVA"
-                }
-            }
-            result_stage = f"FIGO Stage: {stages_map[sarcoma_type].get(t_stage, 'Stage Not Defined')}"
-        
-        st.success(result_stage)
-        st.info(tnm)
+    show_what_if('sarcoma', {'sarcoma_type': sarcoma_code, 't': t_choices[t_stage],
+                             'n': options.SARCOMA_N[n_stage], 'm': options.SARCOMA_M[m_stage]},
+                 {'sarcoma_type': ("Sarcoma Type", options.SARCOMA_TYPES), 't': ("T", t_choices),
+                  'n': ("N", options.SARCOMA_N), 'm': ("M", options.SARCOMA_M)})
 
 # --- 5. 外陰黑色素瘤 ---
 elif app_mode == "外陰黑色素瘤 (Vulvar Melanoma)":
     st.header("外陰黑色素瘤分期 (Vulvar Melanoma)")
-    
-    t_ops = ["Tis (原位癌)", "T1a (腫瘤<0.8mm，無潰瘍)", "T1b (腫瘤<0.8mm，有潰瘍或0.8-1.0mm無論有無潰瘍)",
-             "T2a (腫瘤>1.0-2.0mm，無潰瘍)", "T2b (腫瘤>1.0-2.0mm，有潰瘍)", "T3a (腫瘤>2.0-4.0mm，無潰瘍)",
-             "T3b (腫瘤>2.0-4.0mm，有潰瘍)", "T4a (腫瘤>4.0mm，無潰瘍)", "T4b (腫瘤>4.0mm，有潰瘍)"]
-    n_ops = ["N0 (無區域淋巴結轉移)", "N1a (單一隱匿性轉移淋巴結)", "N1b (單一臨床偵測淋巴結)",
-             "N1c (無淋巴結轉移但有衛星或微衛星轉移)", "N2a (2-3個隱匿性轉移淋巴結)", "N2b (2-3個淋巴結中至少一個臨床偵測)",
-             "N2c (一個臨床或隱匿性淋巴結且有衛星或微衛星轉移)", "N3a (≥4個隱匿性轉移淋巴結)",
-             "N3b (≥4個淋巴結中至少一個臨床偵測)", "N3c (≥2個臨床或隱匿性淋巴結或有融合淋巴結或衛星轉移)"]
-    m_ops = ["M0 (無遠處轉移)", "M1a(0) (皮膚、軟組織或非區域淋巴結轉移，LDH不升高)", "M1a(1) (皮膚、軟組織或非區域淋巴結轉移，LDH升高)",
-             "M1b(0) (肺轉移，LDH不升高)", "M1b(1) (肺轉移，LDH升高)", "M1c(0) (非中樞內臟器官轉移，LDH不升高)",
-             "M1c(1) (非中樞內臟器官轉移，LDH升高)", "M1d(0) (中樞神經系統轉移，LDH正常)", "M1d(1) (中樞神經系統轉移，LDH升高)"]
-
-    t_in = st.selectbox("T分類", t_ops)
-    n_in = st.selectbox("N分類", n_ops)
-    m_in = st.selectbox("M分類", m_ops)
+
+    t_in = st.selectbox("T分類", list(options.MELANOMA_T))
+    n_in = st.selectbox("N分類", list(options.MELANOMA_N))
+    m_in = st.selectbox("M分類", list(options.MELANOMA_M))
 
     if st.button("計算分期"):
-        T_code = t_in.split(" ")[0]
-        N_code = n_in.split(" ")[0]
-        M_code = m_in.split(" ")[0]
-
-        stage = "未分類"
-        if T_code == "Tis" and N_code == "N0" and M_code == "M0": stage = "Stage 0"
-        elif T_code == "T1a" and N_code == "N0" and M_code == "M0": stage = "Stage IA"
-        elif T_code in ["T1b", "T2a"] and N_code == "N0" and M_code == "M0": stage = "Stage IB"
-        elif T_code in ["T2b", "T3a"] and N_code == "N0" and M_code == "M0": stage = "Stage IIA"
-        elif T_code in ["T3b", "T4a"] and N_code == "N0" and M_code == "M0": stage = "Stage IIB"
-        elif T_code == "T4b" and N_code == "N0" and M_code == "M0": stage = "Stage IIC"
-        elif N_code != "N0" and M_code == "M0": stage = "Stage III"
-        elif M_code.startswith("M1"): stage = "Stage IV"
-
-        st.success(f"AJCC 分期: {stage}")
-        st.info(f"Code: {T_code} {N_code} {M_code}")
+        res = stage_now('melanoma', options.MELANOMA_T[t_in], options.MELANOMA_N[n_in],
+                        options.MELANOMA_M[m_in])
+        st.success(f"AJCC 分期: {res.stage}")
+        st.info(f"Code: {' '.join(res.tnm)}")
+
+    show_what_if('melanoma', {'t': options.MELANOMA_T[t_in], 'n': options.MELANOMA_N[n_in],
+                              'm': options.MELANOMA_M[m_in]},
+                             {'t': ("T", options.MELANOMA_T), 'n': ("N", options.MELANOMA_N), 'm': ("M", options.MELANOMA_M)})
 
 # --- 6. 陰道癌 ---
 elif app_mode == "陰道癌 (Vaginal)":
     st.header("陰道癌分期 (Vaginal Cancer)")
-    
-    t_map = {
-        "T1a": "腫瘤侷限於陰道，且最大直徑 ≤ 2.0 cm", "T1b": "腫瘤侷限於陰道，且最大直徑 > 2.0 cm",
-        "T2a": "腫瘤穿透陰道壁，但未達骨盆壁，且最大直徑 ≤ 2.0 cm", "T2b": "腫瘤穿透陰道壁，但未達骨盆壁，且最大直徑 > 2.0 cm",
-        "T3": "腫瘤已達骨盆壁或引起腎積水或腎功能異常", "T4": "腫瘤侵犯膀胱或直腸，或超出骨盆腔"
-    }
-    n_map = {
-        "N0": "無區域淋巴結轉移", "N1": "有區域淋巴結轉移，骨盆或鼠蹊區"
-    }
-    m_map = {
-        "M0": "無遠處轉移", "M1": "有遠處轉移，如肺、肝或骨骼"
-    }
-
-    T = st.selectbox("腫瘤大小與侵犯範圍 (T)", [f"{k} ({v})" for k, v in t_map.items()])
-    N = st.selectbox("鄰近淋巴結轉移情形 (N)", [f"{k} ({v})" for k, v in n_map.items()])
-    M = st.selectbox("遠處轉移情形 (M)", [f"{k} ({v})" for k, v in m_map.items()])
+
+    T = st.selectbox("腫瘤大小與侵犯範圍 (T)", list(options.VAGINAL_T), key="form.vaginal.t")
+    N = st.selectbox("鄰近淋巴結轉移情形 (N)", list(options.VAGINAL_N), key="form.vaginal.n")
+    M = st.selectbox("遠處轉移情形 (M)", list(options.VAGINAL_M), key="form.vaginal.m")
 
     if st.button("計算分期"):
-        T_val = T.split()[0]
-        N_val = N.split()[0]
-        M_val = M.split()[0]
-        
-        res = "資料不足或不符合分期標準"
-        if M_val == "M1": res = "FIGO Stage IVB"
-        elif T_val == "T4" and M_val == "M0": res = "FIGO Stage IVA"
-        elif ((T_val in ["T1a", "T1b", "T2a", "T2b", "T3"] and N_val == "N1" and M_val == "M0") or
-              (T_val == "T3" and N_val == "N0" and M_val == "M0")):
-            res = "FIGO Stage III"
-        elif T_val in ["T2a", "T2b"] and N_val == "N0" and M_val == "M0":
-            res = "FIGO Stage II"
-        elif T_val in ["T1a", "T1b"] and N_val == "N0" and M_val == "M0":
-            res = "FIGO Stage I"
-        
-        st.success(res)
-        st.info(f"AJCC TNM: {T_val} {N_val} {M_val}")
+        res = stage_now('vaginal', options.VAGINAL_T[T], options.VAGINAL_N[N], options.VAGINAL_M[M])
+        st.success(res.stage)
+        st.info(f"AJCC TNM: {' '.join(res.tnm)}")
+
+    show_what_if('vaginal', {'t': options.VAGINAL_T[T], 'n': options.VAGINAL_N[N],
+                             'm': options.VAGINAL_M[M]},
+                            {'t': ("T", options.VAGINAL_T), 'n': ("N", options.VAGINAL_N), 'm': ("M", options.VAGINAL_M)})
 
 # --- 7. GTN ---
 elif app_mode == "妊娠滋養層細胞腫瘤 (GTN)":
     st.header("GTN 分期及風險評估")
 
+    score_items = list(options.GTN_SCORE_ITEMS.items())
+    scores = {}
     col1, col2 = st.columns(2)
     with col1:
-        T = st.radio("T分類", ['T1 (腫瘤侷限於子宮)', 'T2 (腫瘤延伸至其他生殖器官)'])
-        M = st.radio("M分類", ['M0 (無遠處轉移)', 'M1a (肺轉移)', 'M1b (其他遠處轉移)'])
-        age = st.selectbox("年齡", ["0(無)", "1(≥40歲)"])
-        ant_preg = st.selectbox("前次懷孕", ["0(葡萄胎)", "1(流產)", "2(足月妊娠)"])
+        T = st.radio("T分類", list(options.GTN_T), key="form.gtn.t")
+        M = st.radio("M分類", list(options.GTN_M), key="form.gtn.m")
+        for item, (title, choices) in score_items[:2]:
+            scores[item] = choices[st.selectbox(title, list(choices))]
         
     with col2:
-        interval = st.selectbox("距前次妊娠時間", ["0(<4個月)", "1(4-6個月)", "2(7-12個月)", "4(>12個月)"])
-        hcg = st.selectbox("治療前hCG數值(IU/mL)", ["0(<10^3)", "1(10^3-10^4)", "2(10^4-10^5)", "4(≥10^5)"])
-        size = st.selectbox("腫瘤最大直徑", ["0(<3cm)", "1(3-5cm)", "2(>5cm)"])
-        site = st.selectbox("轉移位置", ["0(無轉移或僅肺)", "1(脾臟/腎臟)", "2(腸胃道)", "4(腦/肝臟)"])
-        number = st.selectbox("轉移病灶數量", ["0(無)", "1(1-4處)", "2(5-8處)", "4(>8處)"])
-        chemo = st.selectbox("化療失敗次數", ["0(無)", "2(單一藥物)", "4(兩種以上藥物)"])
+        for item, (title, choices) in score_items[2:]:
+            scores[item] = choices[st.selectbox(title, list(choices))]
 
     if st.button("計算風險與分期"):
-        stage = "Unknown"
-        if M.startswith('M0'):
-            if T.startswith('T1'): stage = "FIGO stage I"
-            elif T.startswith('T2'): stage = "FIGO stage II"
-        elif M.startswith('M1a'): stage = "FIGO stage III"
-        elif M.startswith('M1b'): stage = "FIGO stage IV"
-
-        items = [age, ant_preg, interval, hcg, size, site, number, chemo]
-        score = sum([int(i.split('(')[0]) for i in items])
-        category = "低風險" if score < 7 else "高風險"
+        stage = stage_now('gtn', options.GTN_T[T], options.GTN_M[M]).stage
+        score, category = stage_now('gtn_risk', **scores)
         
         st.success(f"{stage}")
         st.warning(f"風險分數: {score} ({category})")
 
+    show_what_if('gtn', {'t': options.GTN_T[T], 'm': options.GTN_M[M]},
+                 {'t': ("T", options.GTN_T), 'm': ("M", options.GTN_M)})
+    show_what_if('gtn_risk', scores, options.GTN_SCORE_ITEMS, target="風險分類")
+
 # --- 8. 外陰癌 ---
 elif app_mode == "外陰癌 (Vulvar)":
     st.header("外陰癌分期 (Vulvar Cancer)")
 
-    t_det = {
-        'Tis': '原位癌', 'T1a': '病灶 ≤ 2公分，浸潤深度 ≤ 1.0毫米',
-        'T1b': '病灶 > 2公分或浸潤深度 > 1.0毫米',
-        'T2': '腫瘤延伸至鄰近會陰結構 (下1/3尿道、下1/3陰道或肛門)',
-        'T3': '腫瘤侵犯上2/3尿道、上2/3陰道、膀胱黏膜、直腸黏膜或固定於骨盆骨'
-    }
-    n_det = {
-        'N0': '無區域淋巴結轉移', 'N1a': '1或2個淋巴結轉移，各<5毫米',
-        'N1b': '1個淋巴結轉移 ≥5毫米', 'N2a': '3個或以上淋巴結轉移，各<5毫米',
-        'N2b': '2個或以上淋巴結轉移 ≥5毫米', 'N2c': '淋巴結轉移伴隨外囊侵犯',
-        'N3': '固定或潰瘍性淋巴結轉移'
-    }
-    m_det = {'M0': '無遠處轉移', 'M1': '有遠處轉移(包含骨盆淋巴結轉移)'}
-
-    t_sel = st.selectbox("T分期", [f"{k}: {v}" for k, v in t_det.items()])
-    n_sel = st.selectbox("N分期", [f"{k}: {v}" for k, v in n_det.items()])
-    m_sel = st.selectbox("M分期", [f"{k}: {v}" for k, v in m_det.items()])
+    t_sel = st.selectbox("T分期", list(options.VULVAR_T), key="form.vulvar.t")
+    n_sel = st.selectbox("N分期", list(options.VULVAR_N), key="form.vulvar.n")
+    m_sel = st.selectbox("M分期", list(options.VULVAR_M), key="form.vulvar.m")
 
     if st.button("計算分期"):
-        T = t_sel.split(':')[0]
-        N = n_sel.split(':')[0]
-        M = m_sel.split(':')[0]
-        
-        figo_staging = {
-            ('Tis', 'N0', 'M0'): 'Stage 0', ('T1a', 'N0', 'M0'): 'Stage IA',
-            ('T1b', 'N0', 'M0'): 'Stage IB', ('T2', 'N0', 'M0'): 'Stage II',
-            ('T1a', 'N1a', 'M0'): 'Stage IIIA', ('T1b', 'N1a', 'M0'): 'Stage IIIA',
-            ('T2', 'N1a', 'M0'): 'Stage IIIA', ('T1a', 'N1b', 'M0'): 'Stage IIIA',
-            ('T1b', 'N1b', 'M0'): 'Stage IIIA', ('T2', 'N1b', 'M0'): 'Stage IIIA',
-            ('T1a', 'N2a', 'M0'): 'Stage IIIB', ('T1b', 'N2a', 'M0'): 'Stage IIIB',
-            ('T2', 'N2a', 'M0'): 'Stage IIIB', ('T1a', 'N2b', 'M0'): 'Stage IIIB',
-            ('T1b', 'N2b', 'M0'): 'Stage IIIB', ('T2', 'N2b', 'M0'): 'Stage IIIB',
-            ('T1a', 'N2c', 'M0'): 'Stage IIIC', ('T1b', 'N2c', 'M0'): 'Stage IIIC',
-            ('T2', 'N2c', 'M0'): 'Stage IIIC', ('T1a', 'N3', 'M0'): 'Stage IVA',
-            ('T1b', 'N3', 'M0'): 'Stage IVA', ('T2', 'N3', 'M0'): 'Stage IVA',
-            ('T3', 'any', 'M0'): 'Stage IVA', ('any', 'any', 'M1'): 'Stage IVB'
-        }
-
-        figo_result = '未知分期'
-        for special_key in figo_staging.keys():
-            T_match = (special_key[0] == T or special_key[0] == 'any')
-            N_match = (special_key[1] == N or special_key[1] == 'any')
-            M_match = (special_key[2] == M or special_key[2] == 'any')
-            if T_match and N_match and M_match:
-                figo_result = figo_staging[special_key]
-                break
-        
-        st.success(f"FIGO分期: {figo_result}")
-        st.info(f"AJCC TNM: {T}{N}{M}")
+        res = stage_now('vulvar', options.VULVAR_T[t_sel], options.VULVAR_N[n_sel], options.VULVAR_M[m_sel])
+        st.success(f"FIGO分期: {res.stage}")
+        st.info(f"AJCC TNM: {''.join(res.tnm)}")
+
+    show_what_if('vulvar', {'t': options.VULVAR_T[t_sel], 'n': options.VULVAR_N[n_sel],
+                            'm': options.VULVAR_M[m_sel]},
+                           {'t': ("T", options.VULVAR_T), 'n': ("N", options.VULVAR_N), 'm': ("M", options.VULVAR_M)})
 
 # --- 9. AI 智慧判讀 (REST API Mode) ---
 elif app_mode == "🤖 AI 智慧判讀 (Beta)":
     st.header("🤖 AI 智慧病理報告判讀 (Direct API Mode)")
     st.warning("⚠️ 注意：此功能僅供輔助，請勿上傳包含真實病患姓名、身分證號等隱私個資的圖片。")
 
-    if not api_key:
+    # 本頁與上方 AI 相關函式 (含背景工作與 fragment) 使用的模組
+    import ai_batch
+    import ai_cache
+    import ai_extract
+    import ai_jobs
+    import gemini
+    import image_prep
+    import text_extract
+
+    input_source = st.radio("報告來源", options.AI_INPUT_SOURCES, horizontal=True)
+
+    if input_source == options.AI_INPUT_SOURCES[1]:
+        # 文字報告：先以本機規則抽取，只有無法解析的欄位才呼叫模型
+        report_text = st.text_area("貼上病理報告文字 (LIS 匯出)", height=240)
+        text_context = st.selectbox("癌症類型上下文", options.AI_CANCER_CONTEXTS, key="text_context")
+        use_model = st.checkbox("本機無法解析的欄位交給 AI 補齊", value=bool(api_key), disabled=not api_key)
+
+        if st.button("解析報告文字") and report_text.strip():
+            local = text_extract.extract(report_text, ai_extract.CONTEXT_CANCERS[text_context])
+            metrics.observe('text_extract_seconds', local.elapsed)
+            st.caption(f"⚡ 本機解析 {local.elapsed * 1000:.1f} ms，取得 {len(local.inputs)} 個欄位")
+            sources = dict.fromkeys(local.inputs, "本機")
+            extraction = None
+            try:
+                if (local.cancer is None or local.unresolved) and use_model:
+                    # 只請模型抽取本機未解析的欄位；癌別不明時由模型判斷
+                    context = text_context if local.cancer is None else ai_extract.CANCER_CONTEXTS[local.cancer]
+                    names = None if local.cancer is None else local.unresolved
+                    prompt_text = ai_extract.build_prompt(context, report_text)
+                    gen_config = ai_extract.generation_config(context, names)
+                    client = get_gemini_client()
+                    cache = get_ai_cache()
+                    key = ai_cache.cache_key(gemini.PROMPT_VERSION, client.model,
+                                             prompt_text + gemini.encode_payload(gen_config), [])
+                    answer = cache.get(key)
+                    if answer is None:
+                        with st.spinner(f"AI 補齊 {len(names) if names else '全部'} 個欄位..."):
+                            response, call = client.generate(
+                                api_key, gemini.build_payload(prompt_text, [], gen_config))
+                        if response.status_code != 200:
+                            raise RuntimeError(f"API 呼叫失敗 (Status Code: {response.status_code})")
+                        with metrics.timer('response_parse_seconds', kind='json'):
+                            result = response.json()
+                            answer = gemini.extract_text(result)
+                        st.caption(f"⏱️ API 耗時 {call.latency:.1f} 秒，重試 {call.retries} 次")
+                        record_usage(options.AI_INPUT_SOURCES[1], gemini.extract_usage(result), call.latency)
+                        cached = False
+                    else:
+                        st.caption("⚡ 相同報告已分析過，直接使用快取結果")
+                        cached = True
+                    with metrics.timer('response_parse_seconds', kind='extraction'):
+                        extraction = ai_extract.parse_extraction(context, answer,
+                                                                 local.inputs if local.cancer else None)
+                    # 只快取解析成功的回答
+                    if not cached:
+                        cache.put(key, answer)
+                elif local.cancer is None:
+                    st.error("無法從文字判斷癌別，請選擇癌症類型上下文。")
+                else:
+                    extraction = ai_extract.stage_inputs(local.cancer, local.inputs)
+            except Exception as e:
+                st.error(f"發生錯誤：{str(e)}")
+            # 保存結果，按「帶入分期表單」觸發重新執行後仍可顯示
+            st.session_state['text_extraction'] = (extraction, sources, local.evidence, local.info)
+
+        saved = st.session_state.get('text_extraction')
+        if saved and saved[0] is not None:
+            extraction, sources, evidence, info = saved
+            st.markdown("### 📋 報告欄位 → 本機規則分期")
+            if 'tumor_size_cm' in info:
+                st.caption(f"腫瘤大小：{info['tumor_size_cm']:g} cm")
+            show_extraction(extraction, sources, evidence)
+
+    elif not api_key:
         st.error("請先在側邊欄輸入 Google Gemini API Key 才能使用此功能。")
     else:
         # 檔案上傳
@@ -493,67 +571,115 @@ elif app_mode == "🤖 AI 智慧判讀 (Beta)":
             type=['png', 'jpg', 'jpeg']
         )
         
-        cancer_context = st.selectbox("癌症類型上下文", 
-            ["子宮內膜癌", "卵巢癌", "子宮頸癌", "子宮惡性肉瘤", "外陰癌", "陰道癌", "GTN", "自動判斷"])
-
-        analyze_btn = st.button("開始 AI 分析")
-
-        if analyze_btn and uploaded_files:
-            with st.spinner('AI 正在仔細閱讀病理報告並進行分期運算...'):
-                try:
-                    # 1. 準備 Prompt
-                    prompt_text = f"""
-                    你是一位專業的婦科腫瘤科醫師。目前的癌症類型上下文為：{cancer_context}。
-                    請分析圖片中的病理報告，執行以下任務：
-                    1. 摘要關鍵發現：提取腫瘤大小(Tumor size)、侵犯深度(Invasion depth)、淋巴結狀態(Lymph node status)、遠端轉移(Metastasis)、組織學型態(Histology)等關鍵資訊。
-                    2. 判定分期：根據 FIGO (最新版) 與 AJCC TNM 系統進行分期判定。請詳細解釋判定的理由。
-                    3. 表格整理：請以 Markdown 表格列出 T, N, M 的判定結果。
-                    如果報告資訊不足以判定完整分期，請指出缺少哪些關鍵資訊。
-                    請用繁體中文回答。
-                    """
-
-                    # 2. 構建 Request Body (多模態輸入)
-                    contents_parts = [{"text": prompt_text}]
-                    
-                    for uploaded_file in uploaded_files:
-                        # 將圖片轉為 base64
-                        bytes_data = uploaded_file.getvalue()
-                        base64_image = base64.b64encode(bytes_data).decode('utf-8')
-                        
-                        contents_parts.append({
-                            "inline_data": {
-                                "mime_type": uploaded_file.type,
-                                "data": base64_image
-                            }
-                        })
-
-                    payload = {
-                        "contents": [{"parts": contents_parts}]
-                    }
-
-                    # 3. 直接呼叫 API (更新為 gemini-2.5-flash)
-                    # 您的 API Key 權限非常高，可以使用最新的 2.5 版！
-                    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={api_key}"
-                    headers = {'Content-Type': 'application/json'}
-                    
-                    response = requests.post(url, headers=headers, data=json.dumps(payload))
-                    
-                    # 4. 處理回應
-                    if response.status_code == 200:
-                        result = response.json()
-                        try:
-                            # 解析 Gemini 的 JSON 結構
-                            answer = result['candidates'][0]['content']['parts'][0]['text']
-                            st.markdown("### 📋 AI 分析結果 (Model: Gemini 2.5 Flash)")
-                            st.markdown(answer)
-                        except KeyError:
-                            st.error("無法解析 AI 回傳的資料，可能內容被阻擋或格式錯誤。")
-                            st.json(result)
-                    else:
-                        st.error(f"API 呼叫失敗 (Status Code: {response.status_code})")
-                        st.text("錯誤訊息如下：")
-                        st.json(response.json())
-                        st.info("💡 建議：請確認 API Key 是否正確。")
-
-                except Exception as e:
-                    st.error(f"發生錯誤：{str(e)}")
+        cancer_context = st.selectbox("癌症類型上下文", options.AI_CANCER_CONTEXTS)
+
+        with st.expander("🖼️ 圖片前處理 (縮小上傳大小)"):
+            prep_enabled = st.checkbox("送出前先壓縮圖片", value=True)
+            prep_max_edge = st.slider("長邊上限 (px)", 800, 4096, 2048, step=128)
+            prep_grayscale = st.checkbox("轉為灰階", value=False)
+            prep_format = st.selectbox("輸出格式", list(image_prep.FORMATS))
+            prep_quality = st.slider("壓縮品質", 50, 95, 85)
+            dedupe_enabled = st.checkbox("略過完全相同的檔案", value=True)
+            dedupe_near = st.checkbox("也略過近似頁面 (同一頁重新存檔、縮放或調亮)", value=False,
+                                      disabled=not dedupe_enabled,
+                                      help="先以圖片雜湊篩選，再逐像素確認內容相同才略過；"
+                                           "請確認結果中列出的略過頁面確實重複")
+            dedupe_threshold = st.slider("近似頁面相似度門檻", 0.90, 1.00, image_prep.DEFAULT_SIMILARITY, step=0.01,
+                                         disabled=not (dedupe_enabled and dedupe_near),
+                                         help="同一頁重新存檔或縮放通常在 0.95 以上；共用範本的不同頁面也可達 0.9，"
+                                              "門檻只決定哪些頁面要再逐像素比對")
+
+        batch_mode = st.radio("分析方式", options.AI_ANALYSIS_MODES, horizontal=True) == options.AI_ANALYSIS_MODES[1]
+
+        prep = dict(max_edge=prep_max_edge, grayscale=prep_grayscale, fmt=prep_format,
+                    quality=prep_quality) if prep_enabled else None
+        threshold = dedupe_threshold if dedupe_enabled and dedupe_near else None
+        manager = get_job_manager()
+
+        if batch_mode:
+            with st.expander("⚙️ 批次設定", expanded=True):
+                group_sep = st.text_input("病例分組分隔符號", value="_",
+                                          help="檔名中第一個分隔符號之前為病例編號，例如 case01_p1.jpg → case01；留空則每個檔案各為一案")
+                batch_workers = st.slider("同時進行的請求數", 1, 8, 4)
+                batch_rpm = st.number_input("每分鐘請求上限 (RPM)", min_value=1, max_value=1000, value=10)
+
+            jobs = ai_batch.group_jobs([(f.name, f.type, f) for f in uploaded_files or []], group_sep)
+            if jobs:
+                st.caption(f"共 {len(jobs)} 位病例：" + "、".join(f"{j.case_id} ({len(j.names)} 張)" for j in jobs))
+
+            if st.button("開始批次分析") and jobs:
+                # 背景工作只使用此處取得的值，不碰 st.* (不在腳本執行緒中)
+                prompt_text = gemini.build_prompt(cancer_context)
+                client = get_gemini_client()
+                cache = get_ai_cache()
+                limiter = ai_batch.RateLimiter(batch_rpm)
+
+                def analyze(job):
+                    images, _, _, _ = prepare_images(job.images, job.names, prep, dedupe_enabled, threshold)
+                    return ai_batch.analyze_case(client, api_key, prompt_text, images, cache, limiter)
+
+                job = manager.submit('batch', f"批次 {len(jobs)} 位病例 ({cancer_context})", ai_jobs.batch_report,
+                                     jobs, analyze, batch_workers)
+                st.session_state.setdefault('ai_jobs', []).append(job.id)
+        else:
+            output_mode = st.radio("輸出方式", options.AI_OUTPUT_MODES, horizontal=True,
+                                   help="結構化抽取只請模型回傳分期所需欄位 (JSON)，再由本系統的分期規則判定，輸出較短、較快")
+            structured = output_mode == options.AI_OUTPUT_MODES[1]
+            stream_mode = not structured and st.checkbox("串流顯示 (邊生成邊顯示)", value=True)
+
+            if st.button("開始 AI 分析") and uploaded_files:
+                # 準備 Prompt (結構化抽取時附上 responseSchema)；圖片前處理與 API 呼叫在背景執行
+                if structured:
+                    prompt_text = ai_extract.build_prompt(cancer_context)
+                    gen_config = ai_extract.generation_config(cancer_context)
+                else:
+                    prompt_text = gemini.build_prompt(cancer_context)
+                    gen_config = None
+                job = manager.submit('single', f"{len(uploaded_files)} 張圖片 ({cancer_context})", analyze_images,
+                                     get_gemini_client(), api_key, prompt_text,
+                                     [(f.type, f) for f in uploaded_files], [f.name for f in uploaded_files],
+                                     prep, dedupe_enabled, threshold, gen_config, stream_mode, get_ai_cache(),
+                                     meta={'mode': output_mode, 'structured': structured,
+                                           'cancer_context': cancer_context})
+                st.session_state.setdefault('ai_jobs', []).append(job.id)
+
+        # 背景工作面板：有進行中的工作時每秒更新一次，全部結束後整頁重新執行一次
+        session_jobs = manager.jobs(st.session_state.get('ai_jobs', []))
+        if session_jobs:
+            active = any(not job.done for job in session_jobs)
+
+            @st.fragment(run_every=1.0 if active else None)
+            def jobs_panel():
+                jobs = manager.jobs(st.session_state.get('ai_jobs', []))
+                for job in reversed(jobs):
+                    show_job(job)
+                if active and all(job.done for job in jobs):
+                    st.rerun()
+
+            jobs_panel()
+
+# 側邊欄底部：AI 快取統計 (放在最後，才會包含本次執行的命中/未命中)
+with st.sidebar:
+    # 只有送出過 AI 分析的 session 才需要查詢背景工作 (其他 session 不載入 ai_jobs)
+    if st.session_state.get('ai_jobs'):
+        active_jobs = sum(not job.done for job in get_job_manager().jobs(st.session_state['ai_jobs']))
+        if active_jobs:
+            st.caption(f"⏳ 背景 AI 分析進行中：{active_jobs} 項 (可切換到其他頁面繼續使用)")
+    # 快取統計需查詢 SQLite (第一次還會建立快取檔)，只在 AI 頁面顯示
+    if app_mode == options.AI_APP_MODE:
+        cache_stats = get_ai_cache().stats()
+        st.caption(f"🗄️ AI 快取：命中 {cache_stats['hits']} / 未命中 {cache_stats['misses']}，"
+                   f"{cache_stats['entries']} 筆 ({cache_stats['bytes'] / 1024:.0f} KB)")
+    # 各輸出方式的平均 token 與耗時 (本 session)
+    for mode, samples in st.session_state.get('ai_usage', {}).items():
+        n = len(samples)
+        st.caption(f"🔢 {mode.split(' ')[0]}：{n} 次，平均輸入 {sum(s[0] for s in samples) / n:.0f}、"
+                   f"輸出 {sum(s[1] for s in samples) / n:.0f} token，{sum(s[2] for s in samples) / n:.1f} 秒")
+
+    # 效能指標 (本程序所有 session 累計)
+    if st.checkbox("🔧 顯示效能指標", key="debug_metrics"):
+        show_metrics()
+
+metrics.observe('app_rerun_seconds', time.perf_counter() - rerun_start,
+                page=PAGE_NAMES.get(app_mode, 'ai'))
+metrics.flush_if_due()
@@ -0,0 +1,108 @@
+# 重複頁面偵測的效益量測
+#
+# 模擬一次上傳：數頁不同的報告、數頁共用同一份範本 (只有部分欄位內容不同) 的報告，
+# 加上同一頁的重複檔案、重新存檔 (品質較低)、縮小與調亮的版本。
+# 比較不略過與略過重複頁面時的請求大小與偵測耗時，並列出被誤判為重複的不同頁面。
+#
+#   python -m benchmarks.bench_dedupe
+#   python -m benchmarks.bench_dedupe --pages 4 --threshold 0.9
+
+import argparse
+import io
+import random
+import time
+
+import gemini
+import image_prep
+from benchmarks.bench_images import sample_report_image
+
+
+def _variants(data):
+    """同一頁的幾種近似版本 (名稱, JPEG bytes)。"""
+    from PIL import Image
+
+    def save(image, quality=90):
+        buf = io.BytesIO()
+        image.save(buf, 'JPEG', quality=quality)
+        return buf.getvalue()
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+    return [('copy', data), ('requality', save(image, 60)),
+            ('resized', save(image.resize((image.width * 3 // 4, image.height * 3 // 4)))),
+            ('brighter', save(image.point(lambda v: min(255, v + 25))))]
+
+
+def template_page(seed, width=1600, height=2200, vary=0.3):
+    """同一份範本的報告頁：標題列、欄位名稱與格線相同，約 vary 比例的欄位內容依 seed 不同。"""
+    from PIL import Image, ImageDraw
+
+    image = Image.new('L', (width, height), 235)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([80, 60, width - 80, 200], fill=60)
+    line_height = 36
+    for line, y in enumerate(range(260, height - 120, line_height)):
+        layout = random.Random(line)
+        words = random.Random(seed * 1000 + line) if layout.random() < vary else layout
+        draw.rectangle([100, y, 100 + layout.randint(150, 320), y + 20], fill=40)
+        x = 520
+        while x < width - 120:
+            word = words.randint(30, 160)
+            draw.rectangle([x, y, min(x + word, width - 120), y + 20], fill=40)
+            x += word + 18
+        draw.line([80, y + line_height - 6, width - 80, y + line_height - 6], fill=150)
+    buf = io.BytesIO()
+    image.convert('RGB').save(buf, 'JPEG', quality=85)
+    return buf.getvalue()
+
+
+def run(pages=3, threshold=image_prep.DEFAULT_SIMILARITY, repeat=3):
+    originals = [sample_report_image(seed=i) for i in range(pages)]
+    uploads = [(f'page{i}', d) for i, d in enumerate(originals)]
+    uploads += [(f'form{i}', template_page(i)) for i in range(pages)]
+    uploads += [(f'page0-{name}', d) for name, d in _variants(originals[0])]
+    uploads += [(f'form0-{name}', d) for name, d in _variants(uploads[pages][1])]
+    images = [('image/jpeg', d) for _, d in uploads]
+    prompt = gemini.build_prompt('子宮內膜癌')
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        duplicates = image_prep.find_duplicates(images, threshold)
+        times.append(time.perf_counter() - start)
+    drop = {d.index for d in duplicates}
+    kept = [image for i, image in enumerate(images) if i not in drop]
+    # 不同的頁面 (名稱不含 '-') 被略過即為誤判
+    false_positives = [uploads[d.index][0] for d in duplicates if '-' not in uploads[d.index][0]]
+    template_hashes = [image_prep.image_hash(d) for name, d in uploads if name.startswith('form') and '-' not in name]
+    return {
+        'uploads': len(images),
+        'skipped': [(uploads[d.index][0], uploads[d.original][0], d.similarity) for d in duplicates],
+        'false_positives': false_positives,
+        'template_similarity': max(image_prep.similarity(a, b) for i, a in enumerate(template_hashes)
+                                   for b in template_hashes[i + 1:]),
+        'detect_seconds': min(times),
+        'payload_all': len(gemini.PayloadStream(prompt, images)),
+        'payload_deduped': len(gemini.PayloadStream(prompt, kept)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="重複頁面偵測的請求大小與耗時")
+    parser.add_argument('--pages', type=int, default=3)
+    parser.add_argument('--threshold', type=float, default=image_prep.DEFAULT_SIMILARITY)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    r = run(args.pages, args.threshold, args.repeat)
+    print(f"上傳 {r['uploads']} 張，略過 {len(r['skipped'])} 張，偵測耗時 {r['detect_seconds'] * 1000:.1f} ms")
+    for name, original, score in r['skipped']:
+        print(f"  {name:<20} ≈ {original:<8} 相似度 {score:.3f}")
+    print(f"同範本不同頁面的 dHash 相似度最高 {r['template_similarity']:.3f}，"
+          f"誤判為重複 {len(r['false_positives'])} 張{'：' + ', '.join(r['false_positives']) if r['false_positives'] else ''}")
+    print(f"請求大小 {r['payload_all'] / 1e6:.2f} MB → {r['payload_deduped'] / 1e6:.2f} MB "
+          f"(減少 {1 - r['payload_deduped'] / r['payload_all']:.0%})")
+
+
+if __name__ == '__main__':
+    main()
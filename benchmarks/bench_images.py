@@ -0,0 +1,85 @@
+# 圖片前處理效益量測
+#
+# 產生模擬手機拍攝的病理報告照片 (高解析度 JPEG)，比較「原圖直接 base64」與
+# 「前處理後再 base64」的請求大小與端到端組裝時間 (含前處理)。
+#
+#   python -m benchmarks.bench_images
+#   python -m benchmarks.bench_images --count 4 --max-edge 1600 --grayscale --format WEBP
+
+import argparse
+import io
+import random
+import time
+
+import gemini
+import image_prep
+
+
+def sample_report_image(width=4032, height=3024, seed=0, quality=95):
+    """白底黑字的模擬報告照片，加上雜訊與光線漸層，存成 JPEG bytes。"""
+    from PIL import Image, ImageDraw, ImageFilter
+
+    rng = random.Random(seed)
+    image = Image.linear_gradient('L').resize((width, height)).point(lambda v: 200 + v // 8)
+    image = Image.merge('RGB', (image, image, image.point(lambda v: v - 10)))
+    draw = ImageDraw.Draw(image)
+    margin = width // 12
+    y = height // 10
+    line_height = max(12, height // 60)
+    while y < height - height // 10:
+        x = margin
+        while x < width - margin:
+            word = rng.randint(line_height, line_height * 5)
+            draw.rectangle([x, y, min(x + word, width - margin), y + line_height * 2 // 3], fill=(30, 30, 40))
+            x += word + line_height // 2
+        y += line_height * 2
+    noise = Image.effect_noise((width, height), 12).convert('RGB')
+    image = Image.blend(image, noise, 0.08).filter(ImageFilter.GaussianBlur(0.6))
+    buf = io.BytesIO()
+    image.save(buf, 'JPEG', quality=quality)
+    return buf.getvalue()
+
+
+def run(count=3, max_edge=2048, grayscale=False, fmt='JPEG', quality=85, repeat=3):
+    images = [sample_report_image(seed=i) for i in range(count)]
+    prompt = gemini.build_prompt('子宮內膜癌')
+
+    def raw():
+        return gemini.encode_payload(gemini.build_payload(prompt, [('image/jpeg', d) for d in images]))
+
+    def prepped():
+        results = [image_prep.preprocess(d, 'image/jpeg', max_edge, grayscale, fmt, quality) for d in images]
+        return gemini.encode_payload(gemini.build_payload(prompt, [(r.mime_type, r.data) for r in results]))
+
+    out = {}
+    for name, fn in (('raw', raw), ('preprocessed', prepped)):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            body = fn()
+            times.append(time.perf_counter() - start)
+        out[name] = {'payload_bytes': len(body), 'seconds': min(times)}
+    out['input_bytes'] = sum(len(d) for d in images)
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="圖片前處理的請求大小與組裝時間比較")
+    parser.add_argument('--count', type=int, default=3)
+    parser.add_argument('--max-edge', type=int, default=2048)
+    parser.add_argument('--grayscale', action='store_true')
+    parser.add_argument('--format', default='JPEG', choices=sorted(image_prep.FORMATS))
+    parser.add_argument('--quality', type=int, default=85)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    r = run(args.count, args.max_edge, args.grayscale, args.format, args.quality, args.repeat)
+    print(f"輸入：{args.count} 張，共 {r['input_bytes'] / 1e6:.2f} MB")
+    for name in ('raw', 'preprocessed'):
+        print(f"{name:<13} 請求 {r[name]['payload_bytes'] / 1e6:7.2f} MB  組裝 {r[name]['seconds'] * 1000:8.1f} ms")
+    ratio = r['preprocessed']['payload_bytes'] / r['raw']['payload_bytes']
+    print(f"請求大小減少 {1 - ratio:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+# 多 session 負載測試 (AppTest)
+#
+# 以 streamlit.testing.v1.AppTest 在同一程序中模擬 N 個 session，
+# 每一輪依腳本走過每個 app_mode 頁面：分期頁隨機變更兩個表單元件後按計算；
+# AI 頁貼上文字報告解析，再上傳圖片 (含一張重複頁) 送出背景分析並輪詢到完成。
+# API 端為本程序內的 Gemini 替身服務 (--delay 模擬模型延遲)，AI 快取使用暫存檔，
+# 每個 session、每一輪的報告內容都不同，不會命中快取。
+#
+# 回報各頁面每次 rerun 的延遲 p50/p90/p99/max，以及程序 RSS：建立 session 後平均
+# 每個 session 的佔用，與之後每一輪的成長 (持續成長表示 session 狀態或快取沒有釋放)。
+# 所有 session 與 streamlit server 一樣共用一個程序，每個 session 的記憶體是 RSS 差值的平均。
+# AppTest 不能在多條執行緒中同時執行，各 session 的 rerun 於主執行緒輪流進行 (延遲不含
+# 執行緒間的 GIL 競爭)；背景 AI 工作則在 app 自己的執行緒池中真正並行，等待中的 session
+# 不佔用輪次。
+#
+#   python -m benchmarks.bench_load
+#   python -m benchmarks.bench_load --sessions 16 --rounds 5 --delay 1.0
+#   python -m benchmarks.bench_load --no-ai --json
+
+import argparse
+import gc
+import itertools
+import json
+import os
+import random
+import resource
+import tempfile
+import time
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+AI_PAGE = 'ai'
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def rss_bytes():
+    """目前的程序 RSS；沒有 /proc 時以 ru_maxrss (峰值) 代替。"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _page_names():
+    import options
+
+    names = {mode: cancer for cancer, mode in options.CANCER_APP_MODES.items()}
+    return {mode: names.get(mode, AI_PAGE) for mode in options.APP_MODES}
+
+
+class Session:
+    """一個模擬使用者：包裝 AppTest，記錄每次 rerun 的 (頁面, 動作, 秒數)。
+
+    各步驟為產生器，每次 rerun 後 yield True；等待背景工作而不需 rerun 時 yield False，
+    由 drive() 輪流推進所有 session。
+    """
+
+    def __init__(self, app, index, images, seed=0, timeout=120, poll=0.2):
+        from streamlit.testing.v1 import AppTest
+
+        self.at = AppTest.from_file(app, default_timeout=timeout)
+        self.index = index
+        self.images = images
+        self.rng = random.Random(seed * 1000 + index)
+        self.timeout = timeout
+        self.poll = poll
+        self.samples = []
+        self.job_seconds = []
+        self.errors = []
+        self.page = 'start'
+
+    def run(self, action):
+        start = time.perf_counter()
+        self.at.run()
+        self.samples.append((self.page, action, time.perf_counter() - start))
+        for e in self.at.exception:
+            self.errors.append(f"{self.page}/{action}: {e.message}")
+        return True
+
+    def start(self, api_key):
+        yield self.run('start')
+        self.at.sidebar.text_input[0].set_value(api_key)
+        yield self.run('api_key')
+
+    def round(self, pages, round_no, ai=True):
+        # 每個 session 以不同順序瀏覽頁面
+        modes = list(pages.items())
+        self.rng.shuffle(modes)
+        for mode, page in modes:
+            yield from self.visit(mode, page, round_no, ai)
+
+    def visit(self, mode, page, round_no, ai=True):
+        self.page = page
+        self.at.radio(key='app_mode').set_value(mode)
+        yield self.run('switch')
+        if page != AI_PAGE:
+            yield from self.calculator()
+        elif ai:
+            yield from self.ai_text(round_no)
+            yield from self.ai_images(round_no)
+
+    def _button(self, prefix):
+        return next(b for b in self.at.main.button if b.label.startswith(prefix))
+
+    def _source(self, value):
+        next(r for r in self.at.main.radio if r.label == '報告來源').set_value(value)
+
+    def calculator(self):
+        widgets = [w for w in list(self.at.main.radio) + list(self.at.main.selectbox) + list(self.at.main.checkbox)
+                   if not w.disabled]
+        for w in self.rng.sample(widgets, min(2, len(widgets))):
+            if hasattr(w, 'options'):
+                w.set_value(self.rng.choice(w.options))
+            else:
+                w.set_value(not w.value)
+            yield self.run('input')
+        self._button('計算').click()
+        yield self.run('stage')
+
+    def ai_text(self, round_no):
+        import options
+        from benchmarks.bench_text_extract import REPORTS
+
+        self._source(options.AI_INPUT_SOURCES[1])
+        yield self.run('switch')
+        # 加上不同的檢體編號，每次都是新的報告 (不命中快取)
+        report = REPORTS['narrative_zh'] + f"檢體編號：S{self.index}-{round_no}-{self.rng.random():.6f}\n"
+        self.at.main.text_area[0].set_value(report)
+        yield self.run('input')
+        self._button('解析報告文字').click()
+        yield self.run('text_extract')
+
+    def ai_images(self, round_no):
+        import options
+
+        self._source(options.AI_INPUT_SOURCES[0])
+        yield self.run('switch')
+        data = self.images[(self.index + round_no) % len(self.images)]
+        # 第二張與第一張相同，會被重複頁面檢查略過
+        self.at.main.file_uploader[0].set_value([(f"s{self.index}_p1.jpg", data, 'image/jpeg'),
+                                                 (f"s{self.index}_p2.jpg", data, 'image/jpeg')])
+        yield self.run('upload')
+        self._button('開始 AI 分析').click()
+        submitted = last = time.perf_counter()
+        yield self.run('submit')
+        # 與瀏覽器的 fragment 一樣每 poll 秒重新整理一次，期間讓其他 session 繼續操作
+        while self._jobs_active():
+            now = time.perf_counter()
+            if now - submitted > self.timeout:
+                self.errors.append(f"{AI_PAGE}/poll: 背景工作超過 {self.timeout} 秒未完成")
+                return
+            if now - last < self.poll:
+                yield False
+                continue
+            last = now
+            yield self.run('poll')
+        self.job_seconds.append(time.perf_counter() - submitted)
+
+    def _jobs_active(self):
+        return any('背景 AI 分析進行中' in c.value for c in self.at.sidebar.caption)
+
+
+def drive(steps, idle=0.02):
+    """輪流推進 {session: 產生器}，直到全部結束；回傳 [(session, 例外)]。"""
+    steps = dict(steps)
+    failures = []
+    while steps:
+        progressed = False
+        for user, step in list(steps.items()):
+            try:
+                progressed |= next(step)
+            except StopIteration:
+                del steps[user]
+            except Exception as e:
+                failures.append((user, e))
+                del steps[user]
+        if not progressed:
+            time.sleep(idle)
+    return failures
+
+
+def _images(count, width, height):
+    from benchmarks.bench_images import sample_report_image
+
+    # 每張內容不同，各 session 的圖片不會命中快取
+    return [sample_report_image(width, height, seed=i, quality=85) for i in range(count)]
+
+
+def run(app, sessions=8, rounds=3, ai=True, delay=0.2, chunk_delay=0.02, image_size=(1600, 1200), seed=0):
+    """回傳 {'pages': {頁面: 秒數清單}, 'jobs': [...], 'rss': {...}, 'errors': [...]}。
+
+    替身服務位址與快取路徑在 gemini、ai_cache 匯入時讀取，必須在匯入它們 (或 app.py
+    第一次執行) 之前呼叫。
+    """
+    from fake_gemini import FakeGemini
+
+    cache_dir = tempfile.mkdtemp(prefix='bench_load_')
+    server = FakeGemini(delay=delay, chunk_delay=chunk_delay)
+    server.start()
+    os.environ['GEMINI_API_BASE'] = server.base_url
+    os.environ['AI_CACHE_PATH'] = os.path.join(cache_dir, 'ai_cache.sqlite3')
+    errors = []
+
+    def check(failures):
+        errors.extend(f"session {user.index}/{user.page}: {type(e).__name__}: {e}" for user, e in failures)
+
+    def sample():
+        gc.collect()
+        return rss_bytes()
+
+    try:
+        pages = _page_names()
+        images = _images(max(2, sessions), *image_size) if ai else []
+
+        # 暖身：一個 session 走完所有頁面，讓模組匯入與程序共用資源先建立好
+        warm = Session(app, -1, images, seed)
+        check(drive({warm: itertools.chain(warm.start('bench-key'), warm.round(pages, 0, ai))}))
+        errors.extend(warm.errors)
+        del warm
+        rss = {'baseline': sample(), 'rounds': []}
+
+        start = time.perf_counter()
+        users = [Session(app, i, images, seed) for i in range(sessions)]
+        check(drive({user: user.start(f'bench-key-{user.index}') for user in users}))
+        rss['sessions'] = sample()
+        for round_no in range(rounds):
+            check(drive({user: user.round(pages, round_no, ai) for user in users}))
+            rss['rounds'].append(sample())
+        wall = time.perf_counter() - start
+    finally:
+        server.stop()
+
+    by_page = {}
+    jobs = []
+    for user in users:
+        for page, action, seconds in user.samples:
+            if page != 'start':
+                by_page.setdefault(page, []).append(seconds)
+        jobs.extend(user.job_seconds)
+        errors.extend(user.errors)
+    return {'sessions': sessions, 'rounds': rounds, 'wall_s': wall, 'pages': by_page, 'jobs': jobs,
+            'rss': rss, 'errors': errors, 'gemini_requests': server.requests}
+
+
+def _latency(samples):
+    return {'n': len(samples), 'p50_ms': _percentile(samples, 50) * 1000, 'p90_ms': _percentile(samples, 90) * 1000,
+            'p99_ms': _percentile(samples, 99) * 1000, 'max_ms': max(samples) * 1000}
+
+
+def summarize(result):
+    pages = {page: _latency(s) for page, s in sorted(result['pages'].items())}
+    everything = [s for samples in result['pages'].values() for s in samples]
+    if everything:
+        pages['全部'] = _latency(everything)
+    rss = result['rss']
+    n = result['sessions']
+    memory = {'baseline_mb': rss['baseline'] / 2 ** 20}
+    if 'sessions' in rss:
+        memory['per_session_mb'] = (rss['sessions'] - rss['baseline']) / n / 2 ** 20
+        previous = rss['sessions']
+        growth = []
+        for value in rss['rounds']:
+            growth.append((value - previous) / n / 2 ** 20)
+            previous = value
+        memory['growth_per_session_per_round_mb'] = growth
+        memory['final_mb'] = previous / 2 ** 20
+    summary = {'sessions': n, 'rounds': result['rounds'], 'wall_s': result['wall_s'], 'latency': pages,
+               'memory': memory, 'gemini_requests': result['gemini_requests'], 'errors': result['errors']}
+    if result['jobs']:
+        summary['ai_job'] = _latency(result['jobs'])
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="以 AppTest 模擬多個 session 的負載測試")
+    parser.add_argument('--app', default=APP)
+    parser.add_argument('--sessions', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=3, help="每個 session 走過所有頁面的次數")
+    parser.add_argument('--no-ai', action='store_true', help="AI 頁只切換頁面，不送出分析")
+    parser.add_argument('--delay', type=float, default=0.2, help="替身服務回應前的延遲 (秒)")
+    parser.add_argument('--chunk-delay', type=float, default=0.02, help="串流每段之間的延遲 (秒)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+    if args.sessions <= 0 or args.rounds <= 0:
+        parser.error("--sessions 與 --rounds 必須為正數")
+
+    summary = summarize(run(os.path.abspath(args.app), args.sessions, args.rounds, not args.no_ai,
+                            args.delay, args.chunk_delay, seed=args.seed))
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{summary['sessions']} 個 session × {summary['rounds']} 輪，"
+          f"總耗時 {summary['wall_s']:.1f} 秒，Gemini 請求 {summary['gemini_requests']} 次")
+    print(f"{'頁面':<12}{'n':>6}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  (ms)")
+    rows = list(summary['latency'].items())
+    if 'ai_job' in summary:
+        rows.append(('AI 背景工作', summary['ai_job']))
+    for page, s in rows:
+        print(f"{page:<12}{s['n']:>6}{s['p50_ms']:>9.1f}{s['p90_ms']:>9.1f}{s['p99_ms']:>9.1f}{s['max_ms']:>9.1f}")
+    memory = summary['memory']
+    print(f"RSS 基準 {memory['baseline_mb']:.1f} MB", end='')
+    if 'per_session_mb' in memory:
+        growth = '、'.join(f"{g:+.2f}" for g in memory['growth_per_session_per_round_mb'])
+        print(f"，每個 session 約 {memory['per_session_mb']:.2f} MB，"
+              f"各輪每個 session 成長 {growth} MB，最終 {memory['final_mb']:.1f} MB")
+    else:
+        print()
+    if summary['errors']:
+        print(f"錯誤 {len(summary['errors'])} 項：")
+        for e in summary['errors'][:20]:
+            print(f"  {e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# 多圖請求 body 組裝的記憶體峰值 (tracemalloc)
+#
+# dict：build_payload + json.dumps (原本的作法，整份 base64 與 JSON 字串同時存在)。
+# stream：gemini.PayloadStream 逐段產生 body，每張圖每次只編碼一個 chunk。
+# 輸入圖片在開始量測前就已在記憶體中 (與 Streamlit 上傳檔相同)，只計算額外配置的峰值。
+# 加上 --send 時實際以 requests 送到另一個程序中的 Gemini 替身服務。
+#
+#   python -m benchmarks.bench_payload_memory
+#   python -m benchmarks.bench_payload_memory --count 12 --size-mb 4 --send
+
+import argparse
+import io
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import gemini
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _measure(fn):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed
+
+
+def _fake_server():
+    proc = subprocess.Popen([sys.executable, '-u', os.path.join(ROOT, 'fake_gemini.py'), '--port', '0'],
+                            stdout=subprocess.PIPE, text=True)
+    base_url = proc.stdout.readline().split('：', 1)[1].strip()
+    return proc, base_url
+
+
+def run(count=10, size_mb=2.0, send=False):
+    files = [io.BytesIO(os.urandom(int(size_mb * 1024 * 1024))) for _ in range(count)]
+    prompt = gemini.build_prompt('子宮內膜癌')
+    client = proc = None
+    if send:
+        proc, base_url = _fake_server()
+        client = gemini.GeminiClient(base_url)
+        client.list_models('bench')  # 先建立連線，不列入量測
+
+    def old():
+        body = gemini.encode_payload(gemini.build_payload(prompt, [('image/jpeg', f.getvalue()) for f in files]))
+        if client:
+            client.generate('bench', body)
+        else:
+            body.encode()  # requests 送出前會轉為 bytes
+
+    def new():
+        body = gemini.PayloadStream(prompt, [('image/jpeg', f) for f in files])
+        if client:
+            client.generate('bench', body)
+        else:
+            for _ in body:
+                pass
+
+    try:
+        results = {}
+        for name, fn in (('dict', old), ('stream', new)):
+            peak, elapsed = _measure(fn)
+            results[name] = {'peak_bytes': peak, 'seconds': elapsed}
+    finally:
+        if proc:
+            client.close()
+            proc.terminate()
+            proc.wait()
+    results['input_bytes'] = sum(f.getbuffer().nbytes for f in files)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多圖請求 body 組裝的記憶體峰值比較")
+    parser.add_argument('--count', type=int, default=10)
+    parser.add_argument('--size-mb', type=float, default=2.0)
+    parser.add_argument('--send', action='store_true', help="實際送到 Gemini 替身服務")
+    args = parser.parse_args(argv)
+
+    r = run(args.count, args.size_mb, args.send)
+    mb = 1024 * 1024
+    print(f"輸入：{args.count} 張，共 {r['input_bytes'] / mb:.1f} MB{' (含送出)' if args.send else ''}")
+    for name in ('dict', 'stream'):
+        print(f"{name:<7} 峰值 {r[name]['peak_bytes'] / mb:8.2f} MB  "
+              f"({r[name]['peak_bytes'] / r['input_bytes']:.2f}× 輸入)  {r[name]['seconds'] * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# Streamlit 重新執行 (rerun) 成本量測
+#
+# 冷啟動：在新的 Python 程序中第一次執行 app.py 的時間 (含模組匯入)。
+# 重新執行：同一 session 中切換頁面、變更元件後每次 rerun 的時間。
+#
+#   python -m benchmarks.bench_rerun
+#   python -m benchmarks.bench_rerun --app /path/to/other/app.py --reruns 50
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+_COLD = """
+import time, sys
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+ready = time.perf_counter()
+AppTest.from_file(sys.argv[1], default_timeout=60).run()
+print((time.perf_counter() - ready) * 1000)
+"""
+
+
+def cold_start(app, runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', _COLD, app], capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def reruns(app, count):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(app, default_timeout=60).run()
+    modes = [m for m in at.sidebar.radio[0].options if 'AI' not in m]
+    samples = []
+    for i in range(count):
+        at.sidebar.radio[0].set_value(modes[i % len(modes)])
+        start = time.perf_counter()
+        at.run()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _summary(samples):
+    return {'median_ms': statistics.median(samples), 'min_ms': min(samples),
+            'max_ms': max(samples), 'n': len(samples)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="量測 app.py 冷啟動與 rerun 延遲")
+    parser.add_argument('--app', default=APP)
+    parser.add_argument('--cold', type=int, default=5, help="冷啟動次數")
+    parser.add_argument('--reruns', type=int, default=40)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+    app = os.path.abspath(args.app)
+
+    result = {'cold_start': _summary(cold_start(app, args.cold)),
+              'rerun': _summary(reruns(app, args.reruns))}
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for name, s in result.items():
+            print(f"{name:<10} 中位數 {s['median_ms']:.1f} ms  (min {s['min_ms']:.1f}, max {s['max_ms']:.1f}, n={s['n']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# 分期 HTTP 服務的負載測試
+#
+# 在不同並行數下以 keep-alive 連線送出請求，回報 p50/p99 延遲與每秒請求數。
+#
+#   python -m benchmarks.bench_server                       # 於本程序內啟動服務
+#   python -m benchmarks.bench_server --url http://127.0.0.1:8600 --concurrency 1 8 32
+#   python -m benchmarks.bench_server --batch 100           # 改測 batch 端點 (每請求 100 例)
+
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import staging
+import stage_server
+
+
+def _cases(n, seed=0):
+    rng = random.Random(seed)
+    return [{'t': rng.choice(staging.CERVICAL_T), 'n': rng.choice(staging.CERVICAL_N),
+             'm': rng.choice(staging.CERVICAL_M)} for _ in range(n)]
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def _worker(host, port, path, bodies, latencies, errors):
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    headers = {'Content-Type': 'application/json'}
+    for body in bodies:
+        start = time.perf_counter()
+        try:
+            conn.request('POST', path, body=body, headers=headers)
+            res = conn.getresponse()
+            res.read()
+            if res.status != 200:
+                errors.append(res.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(repr(e))
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def run_level(host, port, concurrency, requests_per_worker, batch=0):
+    cases = _cases(max(batch, 1) * requests_per_worker)
+    if batch:
+        path = '/stage/cervical/batch'
+        bodies = [json.dumps({'cases': cases[i:i + batch]}).encode()
+                  for i in range(0, len(cases), batch)]
+    else:
+        path = '/stage/cervical'
+        bodies = [json.dumps(c).encode() for c in cases]
+
+    latencies, errors = [], []
+    threads = [threading.Thread(target=_worker, args=(host, port, path, bodies, latencies, errors))
+               for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'p50_ms': _percentile(latencies, 50) * 1000,
+        'p99_ms': _percentile(latencies, 99) * 1000,
+        'rps': len(latencies) / wall,
+        'cases_per_s': len(latencies) * max(batch, 1) / wall,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="分期 HTTP 服務負載測試")
+    parser.add_argument('--url', help="既有服務位址；未指定時於本程序內啟動")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--requests', type=int, default=200, help="每個並行連線送出的請求數")
+    parser.add_argument('--batch', type=int, default=0, help="每請求病例數 (0 為單筆端點)")
+    parser.add_argument('--json', action='store_true', help="以 JSON 輸出結果")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        server = stage_server.make_server(port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = '127.0.0.1', server.server_port
+
+    results = []
+    try:
+        for level in args.concurrency:
+            results.append(run_level(host, port, level, args.requests, args.batch))
+            if not args.json:
+                r = results[-1]
+                print(f"並行 {r['concurrency']:>3}: {r['requests']} 請求 ({r['errors']} 錯誤)  "
+                      f"p50 {r['p50_ms']:.2f} ms  p99 {r['p99_ms']:.2f} ms  "
+                      f"{r['rps']:,.0f} req/s  {r['cases_per_s']:,.0f} 例/秒")
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+# 串流與一次性回應的等待時間比較 (對本機 Gemini 替身服務)
+#
+# 一次性：generateContent 回傳前使用者看不到任何內容，首字時間 = 總時間。
+# 串流：streamGenerateContent?alt=sse 收到第一段文字即可顯示。
+#
+#   python -m benchmarks.bench_stream
+#   python -m benchmarks.bench_stream --delay 0.5 --chunk-delay 0.2 --requests 5
+
+import argparse
+import statistics
+
+import gemini
+from fake_gemini import FakeGemini
+
+
+def run(requests=5, delay=0.2, chunk_delay=0.1):
+    payload = gemini.encode_payload(gemini.build_payload(gemini.build_prompt('子宮內膜癌'), []))
+    with FakeGemini(delay=delay, chunk_delay=chunk_delay) as fake:
+        client = gemini.GeminiClient(fake.base_url)
+        blocking, streaming = [], []
+        for _ in range(requests):
+            response, call = client.generate('bench', payload)
+            gemini.extract_text(response.json())
+            blocking.append((call.latency, call.latency))
+            response, call = client.stream_generate('bench', payload)
+            stream = gemini.TextStream(response, call)
+            for _ in stream:
+                pass
+            streaming.append((stream.info.ttft, stream.info.total))
+        client.close()
+    return {name: {'ttft_median': statistics.median(t for t, _ in samples),
+                   'total_median': statistics.median(t for _, t in samples)}
+            for name, samples in (('blocking', blocking), ('streaming', streaming))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="串流與一次性 AI 回應的首字/總時間比較")
+    parser.add_argument('--requests', type=int, default=5)
+    parser.add_argument('--delay', type=float, default=0.2, help="替身服務回應前的延遲秒數")
+    parser.add_argument('--chunk-delay', type=float, default=0.1, help="替身服務每段串流之間的延遲秒數")
+    args = parser.parse_args(argv)
+
+    for name, r in run(args.requests, args.delay, args.chunk_delay).items():
+        print(f"{name:<10} 首字 {r['ttft_median'] * 1000:8.1f} ms  總時間 {r['total_median'] * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+# 文字報告：本機規則抽取與 API 抽取的延遲比較
+#
+# local：text_extract.extract 的單份報告耗時 (多次取中位數)。
+# api_full：把整份報告與全部欄位交給模型 (結構化抽取)。
+# hybrid：本機先抽，只有未解析欄位才呼叫模型 (全部解析時不呼叫)。
+# API 端使用本機 Gemini 替身服務，以 --delay 模擬模型延遲；
+# 指定 --url 與 --api-key 時改打真正的 API。
+#
+#   python -m benchmarks.bench_text_extract
+#   python -m benchmarks.bench_text_extract --delay 2.5 --requests 5
+
+import argparse
+import statistics
+import time
+
+import ai_extract
+import gemini
+import text_extract
+from fake_gemini import FakeGemini
+
+REPORTS = {
+    'synoptic_en': """Endometrium, total hysterectomy and bilateral salpingo-oophorectomy
+Histologic type: Endometrioid carcinoma, FIGO grade 2
+Tumor size: 3.5 cm in greatest dimension
+Myometrial invasion: present, depth of invasion 6 mm, myometrial thickness 15 mm
+Lymphovascular space invasion (LVSI): substantial (>= 5 vessels)
+Cervical stromal involvement: Not identified
+Adnexa: Not involved
+Uterine serosa involvement: Not identified
+Vaginal / parametrial involvement: Not identified
+Pelvic peritoneum: Not identified
+Omentum: Not identified
+Bladder mucosa: Not identified
+Pelvic lymph nodes: 2/14 positive, largest metastatic deposit 4 mm
+Para-aortic lymph nodes: 0/6
+Distant metastasis: Not identified
+POLE: wild-type
+p53 immunohistochemistry: abnormal (null pattern)
+""",
+    'narrative_zh': """子宮內膜癌 病理報告
+組織型態：漿液性癌 (serous carcinoma)
+腫瘤大小：25 mm
+肌層侵犯：大於 1/2 (肌層侵犯 70%)
+淋巴血管侵犯：局部
+宮頸間質侵犯：無
+骨盆腔淋巴結 0/12，主動脈旁淋巴結 0/4
+""",
+    'ovarian_tnm': "Ovarian carcinoma, high-grade serous. Pathologic stage: pT3c pN1a M0\n",
+}
+
+
+def _model_call(client, api_key, text, cancer, names):
+    context = ai_extract.CANCER_CONTEXTS[cancer]
+    payload = gemini.build_payload(ai_extract.build_prompt(context, text), [],
+                                   ai_extract.generation_config(context, names))
+    response, call = client.generate(api_key, payload)
+    result = response.json()
+    gemini.extract_text(result)
+    return call.latency, gemini.extract_usage(result)
+
+
+def run(client, api_key, requests=3, local_repeat=2000):
+    out = {}
+    for name, text in REPORTS.items():
+        local = text_extract.extract(text)
+        samples = []
+        for _ in range(local_repeat):
+            start = time.perf_counter()
+            text_extract.extract(text)
+            samples.append(time.perf_counter() - start)
+        full, hybrid = [], []
+        for _ in range(requests):
+            full.append(_model_call(client, api_key, text, local.cancer, None))
+            start = time.perf_counter()
+            r = text_extract.extract(text)
+            if r.unresolved:
+                _, usage = _model_call(client, api_key, text, r.cancer, r.unresolved)
+                hybrid.append((time.perf_counter() - start, usage))
+            else:
+                hybrid.append((time.perf_counter() - start, gemini.Usage(0, 0, 0)))
+        out[name] = {
+            'cancer': local.cancer,
+            'resolved': len(local.inputs),
+            'unresolved': len(local.unresolved),
+            'local_ms': statistics.median(samples) * 1000,
+            'api_full_ms': statistics.median(t for t, _ in full) * 1000,
+            'api_full_output_tokens': full[0][1].output_tokens,
+            'hybrid_ms': statistics.median(t for t, _ in hybrid) * 1000,
+            'hybrid_output_tokens': hybrid[0][1].output_tokens,
+        }
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="文字報告本機抽取與 API 抽取的延遲比較")
+    parser.add_argument('--requests', type=int, default=3)
+    parser.add_argument('--delay', type=float, default=1.5, help="替身服務模擬的模型延遲秒數")
+    parser.add_argument('--url', help="改用真正的 API base URL")
+    parser.add_argument('--api-key', default='bench')
+    args = parser.parse_args(argv)
+
+    if args.url:
+        client = gemini.GeminiClient(args.url)
+        results = run(client, args.api_key, args.requests)
+    else:
+        with FakeGemini(delay=args.delay) as fake:
+            client = gemini.GeminiClient(fake.base_url)
+            results = run(client, args.api_key, args.requests)
+    client.close()
+
+    print(f"{'報告':<14}{'癌別':<12}{'本機/未解析':>12}{'local':>12}{'api_full':>12}{'hybrid':>12}"
+          f"{'輸出 token (full→hybrid)':>26}")
+    for name, r in results.items():
+        print(f"{name:<14}{r['cancer']:<12}{r['resolved']:>6}/{r['unresolved']:<5}"
+              f"{r['local_ms']:>10.3f}ms{r['api_full_ms']:>10.1f}ms{r['hybrid_ms']:>10.1f}ms"
+              f"{r['api_full_output_tokens']:>14} → {r['hybrid_output_tokens']}")
+
+
+if __name__ == '__main__':
+    main()
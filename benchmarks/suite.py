@@ -0,0 +1,176 @@
+# 效能基準測試
+#
+# 以固定亂數種子產生各癌別病例，量測每條分期路徑、GTN 評分與 AI 請求組裝在不同圖片大小與張數下
+# 的耗時 (ai_payload 為一次組成整份 JSON，ai_payload_stream 為 app 與批次實際送出的 PayloadStream)，
+# 輸出 JSON 結果；
+# 指定 --baseline 時，任何路徑比基準慢超過 --threshold 即以 exit code 1 結束。
+#
+#   python -m benchmarks.suite -o bench.json
+#   python -m benchmarks.suite --baseline bench.json --threshold 0.25
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+import gemini
+import staging
+import staging_columnar
+
+CASES_PER_RUN = 10000
+IMAGE_SIZES = (100_000, 1_000_000, 4_000_000)
+IMAGE_COUNTS = (1, 4, 10)
+
+
+def gen_cases(cancer, n, seed=0):
+    """產生固定的隨機病例 (關鍵字參數 dict)。"""
+    rng = random.Random(f"{cancer}-{seed}")
+    choice = rng.choice
+    if cancer == 'endometrial':
+        return [dict({'histology': choice(staging.ENDOMETRIAL_HISTOLOGY),
+                      'myometrial_invasion': choice(staging.ENDOMETRIAL_MYOMETRIAL),
+                      'lvsi': choice(staging.ENDOMETRIAL_LVSI),
+                      'lymph_node_size': choice(staging.ENDOMETRIAL_LN_SIZE)},
+                     **{flag: rng.random() < 0.2 for flag in staging.ENDOMETRIAL_FLAGS})
+                for _ in range(n)]
+    if cancer == 'sarcoma':
+        cases = []
+        for _ in range(n):
+            kind = choice(staging.SARCOMA_TYPES)
+            cases.append({'sarcoma_type': kind, 't': choice(staging.SARCOMA_T[kind]),
+                          'n': choice(staging.SARCOMA_N), 'm': choice(staging.SARCOMA_M)})
+        return cases
+    if cancer == 'gtn':
+        return [{'t': choice(staging.GTN_T), 'm': choice(staging.GTN_M)} for _ in range(n)]
+    if cancer == 'gtn_risk':
+        return [{item: choice(values) for item, values in staging.GTN_SCORE_ITEMS.items()}
+                for _ in range(n)]
+    axes = {
+        'ovarian': (staging.OVARIAN_T, staging.OVARIAN_N, staging.OVARIAN_M),
+        'cervical': (staging.CERVICAL_T, staging.CERVICAL_N, staging.CERVICAL_M),
+        'melanoma': (staging.MELANOMA_T, staging.MELANOMA_N, staging.MELANOMA_M),
+        'vaginal': (staging.VAGINAL_T, staging.VAGINAL_N, staging.VAGINAL_M),
+        'vulvar': (staging.VULVAR_T, staging.VULVAR_N, staging.VULVAR_M),
+    }[cancer]
+    return [{'t': choice(axes[0]), 'n': choice(axes[1]), 'm': choice(axes[2])} for _ in range(n)]
+
+
+def gen_images(size, count, seed=0):
+    rng = random.Random(f"image-{size}-{seed}")
+    return [('image/jpeg', rng.randbytes(size)) for _ in range(count)]
+
+
+def _drain(body):
+    """如同 requests 送出串流 body：先取 len() 作為 Content-Length，再逐段讀完。"""
+    total = len(body)
+    for chunk in body:
+        total -= len(chunk)
+    return total
+
+
+def _measure(fn, repeat, ops):
+    """執行 repeat 次，回傳每次操作的中位數/最小耗時 (微秒)。"""
+    fn()  # 暖機
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) / ops * 1e6)
+    return {'median_us': statistics.median(samples), 'min_us': min(samples), 'ops': ops}
+
+
+def benchmarks(quick=False):
+    """回傳 {路徑名稱: (無參數函式, 每次呼叫的操作數)}。"""
+    n = CASES_PER_RUN // 10 if quick else CASES_PER_RUN
+    suite = {}
+    for cancer in staging.STAGERS:
+        cases = gen_cases(cancer, n)
+        suite[f'stage.{cancer}'] = (lambda c=cancer, cs=cases: staging.stage_many(c, cs), n)
+
+    cases = gen_cases('endometrial', n)
+    levels = {'histology': staging.ENDOMETRIAL_HISTOLOGY,
+              'myometrial_invasion': staging.ENDOMETRIAL_MYOMETRIAL,
+              'lvsi': staging.ENDOMETRIAL_LVSI, 'lymph_node_size': staging.ENDOMETRIAL_LN_SIZE}
+    columns = {k: np.array([levels[k].index(c[k]) if k in levels else c[k] for c in cases])
+               for k in cases[0]}
+    suite['stage.endometrial_columnar'] = (lambda: staging_columnar.endometrial_columns(**columns), n)
+
+    prompt = gemini.build_prompt('子宮內膜癌')
+    sizes = IMAGE_SIZES[:2] if quick else IMAGE_SIZES
+    for size in sizes:
+        for count in IMAGE_COUNTS:
+            images = gen_images(size, count)
+            suite[f'ai_payload.{size // 1000}kb_x{count}'] = (
+                lambda im=images: gemini.encode_payload(gemini.build_payload(prompt, im)), 1)
+            suite[f'ai_payload_stream.{size // 1000}kb_x{count}'] = (
+                lambda im=images: _drain(gemini.PayloadStream(prompt, im)), 1)
+    return suite
+
+
+def run(repeat=7, quick=False, only=None):
+    results = {}
+    for name, (fn, ops) in benchmarks(quick).items():
+        if only and not any(name.startswith(p) for p in only):
+            continue
+        results[name] = _measure(fn, repeat, ops)
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repeat': repeat,
+        'quick': quick,
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """回傳退步超過門檻的路徑 [(名稱, 基準, 目前, 比例)]。"""
+    regressions = []
+    for name, base in baseline['results'].items():
+        cur = current['results'].get(name)
+        if cur is None:
+            continue
+        ratio = cur['median_us'] / base['median_us'] if base['median_us'] else float('inf')
+        if ratio > 1 + threshold:
+            regressions.append((name, base['median_us'], cur['median_us'], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="婦癌分期效能基準測試")
+    parser.add_argument('-o', '--output', help="結果 JSON 輸出路徑")
+    parser.add_argument('--baseline', help="比較用的基準結果 JSON")
+    parser.add_argument('--threshold', type=float, default=0.25, help="容許的退步比例 (預設 0.25)")
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--quick', action='store_true', help="縮小規模，供快速檢查")
+    parser.add_argument('--only', nargs='+', metavar='PREFIX', help="只執行名稱符合前綴的路徑")
+    args = parser.parse_args(argv)
+
+    current = run(args.repeat, args.quick, args.only)
+    for name, r in current['results'].items():
+        print(f"{name:<36} {r['median_us']:>12.2f} µs/op  (min {r['min_us']:.2f})")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('quick') != current['quick']:
+            print("基準與本次執行的規模 (--quick) 不同，無法比較")
+            return 2
+        regressions = compare(current, baseline, args.threshold)
+        for name, base, cur, ratio in regressions:
+            print(f"退步：{name} {base:.2f} -> {cur:.2f} µs/op ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"無路徑退步超過 {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
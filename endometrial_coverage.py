@@ -0,0 +1,118 @@
+# 子宮內膜癌規則的全輸入空間覆蓋分析
+#
+# 以 staging_columnar 向量化列舉全部 2×3×3×3×2^13 組輸入，依觸發的規則分組回報：
+#   - 落入「需進一步評估」的組合
+#   - 結果為空字串 (畫面顯示空白) 的組合
+#   - 輸入彼此矛盾或結果與輸入矛盾的組合
+#   - 從未被觸發的規則
+# 部署規則修改前執行；有未分類或空白結果時 exit code 為 1。
+#
+#   python endometrial_coverage.py --examples 3
+#   python endometrial_coverage.py --json report.json
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+import staging
+import staging_columnar
+
+# (名稱, 說明, 判定函式(columns, out) -> 布林陣列)
+CONTRADICTIONS = (
+    ('ln_positive_without_size', '勾選淋巴結轉移但大小為「無」(被當作巨轉移)',
+     lambda c, o: (c['pelvic_ln'] | c['pa_ln']) & (c['lymph_node_size'] == 0)),
+    ('ln_size_without_positive_node', '填寫淋巴結轉移大小但未勾選任何淋巴結轉移',
+     lambda c, o: ~(c['pelvic_ln'] | c['pa_ln']) & (c['lymph_node_size'] != 0)),
+    ('stage_1A3_aggressive_histology', 'FIGO 1A3 限低惡性度類內膜癌，但組織學為兇險型',
+     lambda c, o: (o['stage'] == '1A3') & (c['histology'] == 1)),
+)
+
+
+def _decode(columns, i):
+    levels = {'histology': staging.ENDOMETRIAL_HISTOLOGY,
+              'myometrial_invasion': staging.ENDOMETRIAL_MYOMETRIAL,
+              'lvsi': staging.ENDOMETRIAL_LVSI, 'lymph_node_size': staging.ENDOMETRIAL_LN_SIZE}
+    case = {}
+    for name, col in columns.items():
+        value = col[i].item()
+        if name in levels:
+            case[name] = levels[name][value]
+        elif value:
+            case[name] = True
+    return case
+
+
+def _group(mask, rule, columns, examples):
+    groups = {}
+    counts = np.bincount(rule[mask], minlength=len(staging_columnar.ENDOMETRIAL_RULES))
+    for r in np.flatnonzero(counts):
+        rows = np.flatnonzero(mask & (rule == r))[:examples]
+        groups[staging_columnar.ENDOMETRIAL_RULE_NAMES[r]] = {
+            'count': int(counts[r]),
+            'examples': [_decode(columns, i) for i in rows],
+        }
+    return groups
+
+
+def analyze(examples=3):
+    """回傳覆蓋分析報告 dict。"""
+    start = time.perf_counter()
+    columns = staging_columnar.endometrial_input_space()
+    out = staging_columnar.endometrial_columns(**columns)
+    rule = out['rule']
+    fired = np.bincount(rule, minlength=len(staging_columnar.ENDOMETRIAL_RULES))
+
+    report = {
+        'combinations': int(rule.size),
+        'rule_counts': dict(zip(staging_columnar.ENDOMETRIAL_RULE_NAMES, fired.tolist())),
+        'dead_rules': [name for name, n in zip(staging_columnar.ENDOMETRIAL_RULE_NAMES, fired) if not n],
+        'unclassified': _group(out['stage'] == staging.ENDOMETRIAL_UNCLASSIFIED, rule, columns, examples),
+        'empty': _group(out['stage'] == '', rule, columns, examples),
+        'contradictions': {},
+    }
+    for name, description, predicate in CONTRADICTIONS:
+        mask = predicate(columns, out)
+        if mask.any():
+            report['contradictions'][name] = {
+                'description': description,
+                'count': int(mask.sum()),
+                'by_rule': _group(mask, rule, columns, examples),
+            }
+    report['seconds'] = round(time.perf_counter() - start, 3)
+    return report
+
+
+def _print_groups(title, groups):
+    total = sum(g['count'] for g in groups.values())
+    print(f"\n{title}：{total} 組")
+    for name, g in groups.items():
+        print(f"  [{name}] {g['count']} 組")
+        for case in g['examples']:
+            print(f"      {case}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="子宮內膜癌分期規則覆蓋分析")
+    parser.add_argument('--examples', type=int, default=3, help="每組列出的範例數")
+    parser.add_argument('--json', metavar='PATH', help="另存 JSON 報告")
+    args = parser.parse_args(argv)
+
+    report = analyze(args.examples)
+    print(f"共 {report['combinations']} 組輸入，{report['seconds']} s")
+    print("從未觸發的規則：" + (', '.join(report['dead_rules']) or '無'))
+    _print_groups("未分類 (需進一步評估)", report['unclassified'])
+    _print_groups("空白結果", report['empty'])
+    for name, c in report['contradictions'].items():
+        _print_groups(f"矛盾 {name} - {c['description']}", c['by_rule'])
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if report['unclassified'] or report['empty'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+# 本機 Gemini API 替身服務 (開發與負載測試用)
+#
+#   python fake_gemini.py --port 8700 --fail-first 2 --delay 0.5 --chunk-delay 0.05
+#   GEMINI_API_BASE=http://127.0.0.1:8700/v1beta streamlit run app.py
+#
+# 支援 GET /v1beta/models、POST /v1beta/models/<model>:generateContent 與
+# :streamGenerateContent?alt=sse (以 chunked 編碼逐行送出 SSE 事件)，
+# 可注入前 N 次失敗 (預設 503) 與固定延遲，並記錄請求數與 TCP 連線數。
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = """### 關鍵發現
+- 腫瘤大小：3.2 cm
+- 淋巴結：0/12
+
+| 項目 | 判定 |
+|---|---|
+| T | T1b |
+| N | N0 |
+| M | M0 |
+"""
+
+
+def sample_json(schema):
+    """依 responseSchema 產生一份符合格式的回答：列舉取第一個值、布林為 False。"""
+    kind = schema.get('type')
+    if kind == 'OBJECT':
+        return {name: sample_json(sub) for name, sub in schema.get('properties', {}).items()}
+    if kind == 'ARRAY':
+        return []
+    if kind == 'BOOLEAN':
+        return False
+    if kind in ('INTEGER', 'NUMBER'):
+        return 0
+    return schema.get('enum', [''])[0]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _begin(self):
+        """記錄請求並決定是否注入失敗；回傳 True 表示已回應錯誤。"""
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.bytes_received += len(body)
+            failing = server.requests <= server.fail_first
+        self.request_body = body
+        if server.delay:
+            time.sleep(server.delay)
+        if not self.headers.get('x-goog-api-key') and 'key=' not in self.path:
+            self._send(400, {'error': {'code': 400, 'message': 'API key not valid.'}})
+            return True
+        if failing:
+            self._send(server.fail_status, {'error': {'code': server.fail_status, 'message': 'injected failure'}},
+                       {'Retry-After': '0'} if server.fail_status == 429 else None)
+            return True
+        return False
+
+    def do_GET(self):
+        if self._begin():
+            return
+        if self.path.split('?')[0].rstrip('/').endswith('/models'):
+            self._send(200, {'models': [{'name': f'models/{name}'} for name in self.server.models]})
+        else:
+            self._send(404, {'error': {'code': 404, 'message': 'not found'}})
+
+    def _usage(self, parts, reply):
+        prompt = 258 * (len(parts) - 1) + 200
+        return {'promptTokenCount': prompt, 'candidatesTokenCount': len(reply) // 2,
+                'totalTokenCount': prompt + len(reply) // 2}
+
+    def _stream(self, parts):
+        """每一行回答作為一個 SSE 事件，以 chunked transfer encoding 送出。"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        reply = self.server.reply
+        pieces = reply.splitlines(keepends=True)
+        for i, piece in enumerate(pieces):
+            if i and self.server.chunk_delay:
+                time.sleep(self.server.chunk_delay)
+            event = {'candidates': [{'content': {'parts': [{'text': piece}], 'role': 'model'}}]}
+            if i == len(pieces) - 1:
+                event['candidates'][0]['finishReason'] = 'STOP'
+                event['usageMetadata'] = self._usage(parts, reply)
+            data = f"data: {json.dumps(event, ensure_ascii=False)}\r\n\r\n".encode('utf-8')
+            try:
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # client 中途關閉連線 (例如取消分析)
+                self.close_connection = True
+                return
+        self.wfile.write(b'0\r\n\r\n')
+
+    def do_POST(self):
+        if self._begin():
+            return
+        streaming = ':streamGenerateContent' in self.path
+        if streaming or ':generateContent' in self.path:
+            try:
+                request = json.loads(self.request_body)
+                parts = request['contents'][0]['parts']
+                schema = (request.get('generationConfig') or {}).get('responseSchema')
+            except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+                self._send(400, {'error': {'code': 400, 'message': 'Invalid JSON payload received.'}})
+                return
+            if streaming:
+                self._stream(parts)
+                return
+            # 一次性回應也模擬相同的生成時間
+            if self.server.chunk_delay:
+                time.sleep(self.server.chunk_delay * (len(self.server.reply.splitlines()) - 1))
+            reply = json.dumps(sample_json(schema), ensure_ascii=False) if schema else self.server.reply
+            self._send(200, {
+                'candidates': [{'content': {'parts': [{'text': reply}], 'role': 'model'},
+                                'finishReason': 'STOP'}],
+                'usageMetadata': self._usage(parts, reply),
+            })
+        else:
+            self._send(404, {'error': {'code': 404, 'message': 'not found'}})
+
+
+class FakeGemini(ThreadingHTTPServer):
+    """以 with 使用時於背景執行緒啟動，離開時關閉；base_url 可直接交給 GeminiClient。"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, host='127.0.0.1', port=0, fail_first=0, fail_status=503, delay=0.0,
+                 reply=DEFAULT_REPLY, models=('gemini-2.5-flash', 'gemini-2.5-pro'), chunk_delay=0.0):
+        super().__init__((host, port), _Handler)
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.delay = delay
+        self.chunk_delay = chunk_delay
+        self.reply = reply
+        self.models = models
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.bytes_received = 0
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_port}/v1beta"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本機 Gemini API 替身服務")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8700)
+    parser.add_argument('--fail-first', type=int, default=0, help="前 N 個請求回傳錯誤")
+    parser.add_argument('--fail-status', type=int, default=503)
+    parser.add_argument('--delay', type=float, default=0.0, help="每個請求的延遲秒數")
+    parser.add_argument('--chunk-delay', type=float, default=0.0, help="串流回應中每個事件之間的延遲秒數")
+    args = parser.parse_args(argv)
+
+    server = FakeGemini(args.host, args.port, args.fail_first, args.fail_status, args.delay,
+                        chunk_delay=args.chunk_delay)
+    print(f"Gemini 替身服務：{server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
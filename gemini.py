@@ -0,0 +1,325 @@
+# Gemini API 請求組裝與 HTTP client
+
+import base64
+import json
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+
+import metrics
+
+MODEL = 'gemini-2.5-flash'
+# 可用環境變數指向本機替身服務 (fake_gemini.py)
+API_BASE = os.environ.get('GEMINI_API_BASE', 'https://generativelanguage.googleapis.com/v1beta')
+
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+CallInfo = namedtuple('CallInfo', ['latency', 'retries', 'status'])
+StreamInfo = namedtuple('StreamInfo', ['ttft', 'total', 'retries', 'chunks'])
+Usage = namedtuple('Usage', ['prompt_tokens', 'output_tokens', 'total_tokens'])
+
+
+class ResponseTimeout(RuntimeError):
+    """送出請求後在 read_timeout 內沒有回應；請求可能已被處理，因此不重試。"""
+
+# 修改 PROMPT_TEMPLATE 或回應解析方式時遞增，使舊的快取結果失效
+PROMPT_VERSION = 1
+
+PROMPT_TEMPLATE = """你是一位專業的婦科腫瘤科醫師。目前的癌症類型上下文為：{cancer_context}。
+請分析圖片中的病理報告，執行以下任務：
+1. 摘要關鍵發現：提取腫瘤大小(Tumor size)、侵犯深度(Invasion depth)、淋巴結狀態(Lymph node status)、遠端轉移(Metastasis)、組織學型態(Histology)等關鍵資訊。
+2. 判定分期：根據 FIGO (最新版) 與 AJCC TNM 系統進行分期判定。請詳細解釋判定的理由。
+3. 表格整理：請以 Markdown 表格列出 T, N, M 的判定結果。
+如果報告資訊不足以判定完整分期，請指出缺少哪些關鍵資訊。
+請用繁體中文回答。
+"""
+
+
+def build_prompt(cancer_context):
+    return PROMPT_TEMPLATE.format(cancer_context=cancer_context)
+
+
+def build_payload(prompt_text, images, generation_config=None):
+    """images 為 (mime_type, bytes) 的 iterable，回傳 generateContent 的 request body。"""
+    contents_parts = [{"text": prompt_text}]
+    with metrics.timer('payload_encode_seconds', kind='dict'):
+        for mime_type, data in images:
+            contents_parts.append({
+                "inline_data": {
+                    "mime_type": mime_type,
+                    "data": base64.b64encode(data).decode('utf-8')
+                }
+            })
+    payload = {"contents": [{"parts": contents_parts}]}
+    if generation_config:
+        payload["generationConfig"] = generation_config
+    return payload
+
+
+def encode_payload(payload):
+    return json.dumps(payload)
+
+
+# base64 以 3 bytes 為一組，chunk 取 3 的倍數才能逐段編碼後直接串接
+CHUNK_SIZE = 3 * 64 * 1024
+
+
+def _read_chunks(data, chunk_size):
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        view = memoryview(data)
+        for i in range(0, len(view), chunk_size):
+            yield view[i:i + chunk_size]
+        return
+    data.seek(0)
+    while True:
+        chunk = data.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _data_size(data):
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return len(data)
+    return data.seek(0, 2)
+
+
+class PayloadStream:
+    """與 encode_payload(build_payload(...)) 位元組完全相同的 request body，但逐段產生。
+
+    images 的內容可為 bytes 或可 seek 的二進位檔案物件 (例如 Streamlit 的 UploadedFile)，
+    base64 每次只編碼一個 chunk，記憶體用量約為一個 chunk 而非整份 JSON。
+    可重複迭代 (重試時重新產生)，len() 為總長度，requests 會據此送出 Content-Length。
+    """
+
+    def __init__(self, prompt_text, images, generation_config=None, chunk_size=CHUNK_SIZE):
+        if chunk_size <= 0 or chunk_size % 3:
+            raise ValueError(f"chunk_size 必須為 3 的正倍數: {chunk_size!r}")
+        self.prompt_text = prompt_text
+        self.images = list(images)
+        self.generation_config = generation_config
+        self.chunk_size = chunk_size
+
+    def _pieces(self):
+        """(固定字串, 圖片資料或 None) 的序列；固定字串已編碼為 bytes。"""
+        yield ('{"contents": [{"parts": [{"text": ' + json.dumps(self.prompt_text) + '}').encode(), None
+        for mime_type, data in self.images:
+            yield (', {"inline_data": {"mime_type": ' + json.dumps(mime_type) + ', "data": "').encode(), data
+            yield b'"}}', None
+        tail = ']}]'
+        if self.generation_config:
+            tail += ', "generationConfig": ' + json.dumps(self.generation_config)
+        yield (tail + '}').encode(), None
+
+    def __iter__(self):
+        # 只累計讀取與 base64 編碼本身的時間，不含送出 (yield 之後) 的等待
+        encoding = 0.0
+        for text, data in self._pieces():
+            yield text
+            if data is not None:
+                chunks = _read_chunks(data, self.chunk_size)
+                while True:
+                    start = time.perf_counter()
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    encoded = base64.b64encode(chunk)
+                    encoding += time.perf_counter() - start
+                    yield encoded
+        metrics.observe('payload_encode_seconds', encoding, kind='stream')
+
+    def __len__(self):
+        total = 0
+        for text, data in self._pieces():
+            total += len(text)
+            if data is not None:
+                total += (_data_size(data) + 2) // 3 * 4
+        return total
+
+
+def _encode_body(payload):
+    if isinstance(payload, (str, bytes, PayloadStream)):
+        return payload
+    return encode_payload(payload)
+
+
+def extract_text(result):
+    """取出回應中的文字；格式不符時丟出 KeyError。"""
+    try:
+        return result['candidates'][0]['content']['parts'][0]['text']
+    except (IndexError, TypeError):
+        raise KeyError('text') from None
+
+
+def extract_usage(result):
+    """由回應 JSON 的 usageMetadata 取出 token 數；沒有時為 0。"""
+    meta = (result or {}).get('usageMetadata') or {}
+    return Usage(meta.get('promptTokenCount', 0), meta.get('candidatesTokenCount', 0),
+                 meta.get('totalTokenCount', 0))
+
+
+def iter_sse_events(lines):
+    """解析 server-sent events，逐一回傳每個 data 欄位解碼後的 JSON。"""
+    data = []
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if line.startswith('data:'):
+            data.append(line[5:].lstrip(' '))
+        elif not line and data:
+            yield json.loads('\n'.join(data))
+            data = []
+    if data:
+        yield json.loads('\n'.join(data))
+
+
+class TextStream:
+    """逐段回傳 streamGenerateContent (alt=sse) 回應中的文字。
+
+    迭代結束後 text 為完整回答，info 為 StreamInfo (ttft 與 total 由送出請求起算)；
+    last_event 保留最後一個事件，供沒有任何文字 (例如被阻擋) 時顯示。
+    """
+
+    def __init__(self, response, call):
+        self.response = response
+        self.retries = call.retries
+        self._start = time.perf_counter() - call.latency
+        self.parts = []
+        self.last_event = None
+        self.ttft = None
+        self.info = None
+
+    def __iter__(self):
+        try:
+            for event in iter_sse_events(self.response.iter_lines()):
+                self.last_event = event
+                try:
+                    piece = extract_text(event)
+                except KeyError:
+                    continue
+                if self.ttft is None:
+                    self.ttft = time.perf_counter() - self._start
+                self.parts.append(piece)
+                yield piece
+        finally:
+            self.response.close()
+            self.info = StreamInfo(self.ttft, time.perf_counter() - self._start, self.retries, len(self.parts))
+            if self.ttft is not None:
+                metrics.observe('gemini_stream_ttft_seconds', self.ttft)
+            metrics.observe('gemini_stream_seconds', self.info.total)
+
+    @property
+    def text(self):
+        return ''.join(self.parts)
+
+
+class GeminiClient:
+    """共用連線池的 Gemini REST client (每個程序一個，供所有 session 共用)。
+
+    API key 由每次呼叫傳入並放在 x-goog-api-key 標頭；429 與 5xx 回應及連線錯誤
+    以 full-jitter 指數退避重試，並遵守 Retry-After。每次呼叫回傳 (response, CallInfo)。
+    讀取逾時 (請求已送出) 不重試，丟出 ResponseTimeout；距第一次送出超過 retry_deadline 秒後
+    也不再重試，單次呼叫最多約 retry_deadline + read_timeout 秒。
+    """
+
+    def __init__(self, base_url=None, model=MODEL, connect_timeout=5.0, read_timeout=120.0,
+                 max_retries=3, backoff=0.5, backoff_max=8.0, retry_deadline=30.0, pool_maxsize=10):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = (base_url or API_BASE).rstrip('/')
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.retry_deadline = retry_deadline
+        # ConnectionError 含 ConnectTimeout；ReadTimeout 不在其中
+        self._transient = requests.ConnectionError
+        self._read_timeout = requests.ReadTimeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'retries': 0, 'failures': 0, 'latency_total': 0.0}
+
+    def _sleep_before_retry(self, attempt, response):
+        delay = None
+        if response is not None:
+            try:
+                delay = float(response.headers.get('Retry-After', ''))
+            except ValueError:
+                pass
+        if delay is None:
+            delay = random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+        time.sleep(min(delay, self.backoff_max))
+
+    def request(self, method, path, api_key, **kwargs):
+        headers = {'x-goog-api-key': api_key, **kwargs.pop('headers', {})}
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        endpoint = path.rsplit(':', 1)[-1] if ':' in path else path.split('/')[0]
+        data = kwargs.get('data')
+        if isinstance(data, str):
+            # 先編碼一次，送出的與計入 gemini_request_bytes_total 的都是 bytes
+            data = kwargs['data'] = data.encode()
+        if data is not None:
+            metrics.inc('gemini_request_bytes_total', len(data), endpoint=endpoint)
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            response = None
+            give_up = attempt >= self.max_retries or time.perf_counter() - start >= self.retry_deadline
+            try:
+                response = self.session.request(method, url, headers=headers, timeout=self.timeout, **kwargs)
+                if response.status_code not in RETRY_STATUS or give_up:
+                    break
+            except self._read_timeout:
+                self._record(time.perf_counter() - start, attempt, failed=True, endpoint=endpoint,
+                             status='read_timeout')
+                raise ResponseTimeout(f"Gemini 在 {self.timeout[1]:.0f} 秒內沒有回應，請稍後再試 "
+                                      f"(請求可能已被處理，因此未自動重試)") from None
+            except self._transient:
+                if give_up:
+                    self._record(time.perf_counter() - start, attempt, failed=True, endpoint=endpoint,
+                                 status='connection_error')
+                    raise
+            if response is not None:
+                response.close()
+            self._sleep_before_retry(attempt, response)
+            attempt += 1
+        info = CallInfo(time.perf_counter() - start, attempt, response.status_code)
+        self._record(info.latency, attempt, failed=response.status_code >= 400, endpoint=endpoint,
+                     status=response.status_code)
+        return response, info
+
+    def _record(self, latency, retries, failed, endpoint, status):
+        with self._lock:
+            self.stats['calls'] += 1
+            self.stats['retries'] += retries
+            self.stats['failures'] += int(failed)
+            self.stats['latency_total'] += latency
+        # 串流呼叫的 latency 為收到回應標頭的時間，完整耗時見 gemini_stream_seconds
+        metrics.observe('gemini_request_seconds', latency, endpoint=endpoint)
+        metrics.inc('gemini_requests_total', endpoint=endpoint, status=str(status))
+        if retries:
+            metrics.inc('gemini_retries_total', retries, endpoint=endpoint)
+
+    def list_models(self, api_key):
+        return self.request('GET', 'models', api_key)
+
+    def generate(self, api_key, payload):
+        """payload 為 dict、已編碼的 JSON 字串/bytes 或 PayloadStream。"""
+        return self.request('POST', f"models/{self.model}:generateContent", api_key,
+                            data=_encode_body(payload), headers={'Content-Type': 'application/json'})
+
+    def stream_generate(self, api_key, payload):
+        """以 SSE 串流呼叫；狀態碼 200 時以 TextStream(response, info) 讀取內容。"""
+        return self.request('POST', f"models/{self.model}:streamGenerateContent", api_key,
+                            data=_encode_body(payload), params={'alt': 'sse'}, stream=True,
+                            headers={'Content-Type': 'application/json'})
+
+    def close(self):
+        self.session.close()
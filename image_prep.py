@@ -0,0 +1,209 @@
+# 病理報告圖片前處理：在組裝 AI 請求前縮小上傳圖片
+#
+# 依 EXIF 方向轉正、長邊縮到 max_edge、可選灰階，再以 JPEG/WebP 重新壓縮。
+# 若結果沒有比原檔小且未旋轉或縮圖，保留原檔。
+#
+# find_duplicates 以 SHA-256 找完全相同的檔案；指定 threshold 時另找近似重複的頁面
+# (重新存檔、縮放、亮度不同的同一張報告)，讓同一頁只送出一次。
+# 近似頁面先以差異雜湊 (dHash) 篩選，再逐像素確認：同一份範本的不同頁面 dHash
+# 相似度可達 0.9 以上，只憑雜湊會把不同的頁面當成重複。
+#
+# 無法解碼的圖片 (格式錯誤、截斷、像素數超過 PIL 的解壓縮炸彈上限) 不會讓整個請求失敗：
+# preprocess 改送原檔，find_duplicates 只做完全相同比對。
+
+import hashlib
+import io
+import logging
+import time
+from collections import namedtuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {'JPEG': 'image/jpeg', 'WEBP': 'image/webp'}
+
+PrepResult = namedtuple('PrepResult', ['data', 'mime_type', 'original_bytes', 'size', 'elapsed'])
+
+# index 與 original 為輸入清單中的位置；similarity 為 0~1 (完全相同的檔案為 1.0)
+Duplicate = namedtuple('Duplicate', ['index', 'original', 'similarity'])
+
+HASH_SIZE = 16
+DEFAULT_SIMILARITY = 0.95
+
+# 逐像素確認：兩張圖縮成長邊 PIXEL_EDGE 的灰階圖 (各自拉開對比，抵銷亮度差異) 後相減，
+# 亮度差 > PIXEL_LEVEL 的像素先以 3×3 侵蝕去掉壓縮雜訊留下的孤立點，
+# 剩下的比例超過 MAX_CHANGED 即為不同頁面 (換掉一行字約為 0.05%)
+PIXEL_EDGE = 512
+PIXEL_LEVEL = 64
+MAX_CHANGED = 0.0001
+
+
+def _decode_errors():
+    # UnidentifiedImageError 為 OSError；DecompressionBombError 不是，需另外列出
+    from PIL import Image
+
+    return OSError, ValueError, Image.DecompressionBombError
+
+
+def preprocess(data, mime_type, max_edge=2048, grayscale=False, fmt='JPEG', quality=85, name=''):
+    """回傳 PrepResult；data 為處理後 bytes，size 為輸出的 (寬, 高)。
+
+    圖片無法解碼時回傳原檔，size 為 None。
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"不支援的輸出格式: {fmt!r} (可用值: {', '.join(FORMATS)})")
+    start = time.perf_counter()
+    try:
+        out, size, changed = _reencode(data, max_edge, grayscale, fmt, quality)
+    except _decode_errors() as e:
+        elapsed = time.perf_counter() - start
+        metrics.inc('image_prep_errors_total', step='preprocess')
+        logger.warning("圖片前處理 %s: 無法解碼，改送原檔: %s", name, e)
+        return PrepResult(data, mime_type, len(data), None, elapsed)
+    if len(out) >= len(data) and not changed:
+        out, out_mime = data, mime_type
+    else:
+        out_mime = FORMATS[fmt]
+    elapsed = time.perf_counter() - start
+    metrics.observe('image_prep_seconds', elapsed, step='preprocess')
+    metrics.inc('image_prep_bytes_total', len(data), direction='in')
+    metrics.inc('image_prep_bytes_total', len(out), direction='out')
+    logger.info("圖片前處理 %s: %d -> %d bytes (節省 %d bytes, %.0f%%), %dx%d, %.1f ms",
+                name, len(data), len(out), len(data) - len(out),
+                100 * (1 - len(out) / len(data)) if data else 0, size[0], size[1], elapsed * 1000)
+    return PrepResult(out, out_mime, len(data), size, elapsed)
+
+
+def _reencode(data, max_edge, grayscale, fmt, quality):
+    """回傳 (重新壓縮的 bytes, (寬, 高), 是否旋轉/縮圖/轉灰階)。"""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as original:
+        changed = original.getexif().get(0x0112, 1) != 1  # EXIF Orientation
+        image = ImageOps.exif_transpose(original)
+        if max(image.size) > max_edge:
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+            changed = True
+        if grayscale:
+            image = image.convert('L')
+            changed = True
+        elif image.mode not in ('RGB', 'L'):
+            # JPEG 不支援透明度，貼到白底
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.convert('RGBA').getchannel('A'))
+            image = background
+        buf = io.BytesIO()
+        image.save(buf, fmt, quality=quality, optimize=True)
+        return buf.getvalue(), image.size, changed
+
+
+def _open(data):
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return io.BytesIO(data)
+    data.seek(0)
+    return data
+
+
+def image_hash(data, hash_size=HASH_SIZE):
+    """回傳 hash_size² 位元的 dHash (int)；data 為 bytes 或檔案物件。
+
+    轉正、灰階後縮成 (hash_size+1)×hash_size，每個位元為相鄰兩像素的亮度比較。
+    JPEG 以 draft 模式直接解碼為縮小的灰階圖，不需解出整張原圖。
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(_open(data)) as image:
+        image.draft('L', (hash_size * 8, hash_size * 8))
+        small = ImageOps.exif_transpose(image).convert('L').resize((hash_size + 1, hash_size), Image.BOX)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = bits << 1 | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+def similarity(a, b, hash_size=HASH_SIZE):
+    """兩個 image_hash 的相似度：相同位元的比例 (0~1)。"""
+    return 1 - bin(a ^ b).count('1') / (hash_size * hash_size)
+
+
+def _thumbnail(data, edge=PIXEL_EDGE):
+    from PIL import Image, ImageOps
+
+    with Image.open(_open(data)) as image:
+        image.draft('L', (edge * 2, edge * 2))
+        image = ImageOps.exif_transpose(image).convert('L')
+        scale = edge / max(image.size)
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        return ImageOps.autocontrast(image.resize(size, Image.BOX), cutoff=1)
+
+
+def same_page(a, b, level=PIXEL_LEVEL, max_changed=MAX_CHANGED):
+    """兩張 _thumbnail 是否為同一頁：長寬比相同且變動的像素比例 ≤ max_changed。"""
+    from PIL import Image, ImageChops, ImageFilter
+
+    if abs(a.width / a.height - b.width / b.height) > 0.02:
+        return False
+    if b.size != a.size:
+        b = b.resize(a.size, Image.BOX)
+    changed = (ImageChops.difference(a, b).point(lambda v: 255 if v > level else 0)
+               .filter(ImageFilter.MinFilter(3)).histogram()[255])
+    return changed <= max_changed * a.width * a.height
+
+
+def _sha256(data):
+    h = hashlib.sha256()
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        h.update(data)
+    else:
+        data.seek(0)
+        for chunk in iter(lambda: data.read(1 << 20), b''):
+            h.update(chunk)
+    return h.digest()
+
+
+def find_duplicates(images, threshold=None, hash_size=HASH_SIZE):
+    """images 為 (mime_type, bytes 或檔案物件) 清單，回傳重複圖片的 Duplicate 清單。
+
+    依序比對，與任一較早保留的圖片完全相同者視為重複 (保留較早的一張)。threshold 不為 None 時，
+    dHash 相似度 ≥ threshold 且 same_page 逐像素確認為同一頁者也視為重複。
+    無法解碼的圖片只做完全相同比對。
+    """
+    if threshold is not None and not 0 < threshold <= 1:
+        raise ValueError(f"threshold 必須介於 0 與 1 之間: {threshold!r}")
+    start = time.perf_counter()
+    duplicates = []
+    kept = []  # (index, sha256, dHash 或 None)
+    thumbnails = {}
+
+    def thumbnail(i):
+        if i not in thumbnails:
+            thumbnails[i] = _thumbnail(images[i][1])
+        return thumbnails[i]
+
+    for i, (_, data) in enumerate(images):
+        digest = _sha256(data)
+        match = next((Duplicate(i, j, 1.0) for j, d, _ in kept if d == digest), None)
+        h = None
+        if match is None and threshold is not None:
+            try:
+                h = image_hash(data, hash_size)
+                candidates = sorted(((similarity(h, kh, hash_size), j) for j, _, kh in kept if kh is not None),
+                                    reverse=True)
+                match = next((Duplicate(i, j, score) for score, j in candidates
+                              if score >= threshold and same_page(thumbnail(j), thumbnail(i))), None)
+            except _decode_errors() as e:
+                h = None
+                logger.warning("無法比對第 %d 張圖片的內容，只比對完全相同: %s", i, e)
+        if match is None:
+            kept.append((i, digest, h))
+        else:
+            duplicates.append(match)
+    elapsed = time.perf_counter() - start
+    metrics.observe('image_prep_seconds', elapsed, step='dedupe')
+    metrics.inc('image_duplicates_total', len(duplicates))
+    logger.info("重複圖片偵測：%d 張中 %d 張重複，%.1f ms", len(images), len(duplicates), elapsed * 1000)
+    return duplicates
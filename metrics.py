@@ -0,0 +1,206 @@
+# 輕量的計時與計數 (程序共用)
+#
+# timer()/observe() 記錄耗時分佈 (Prometheus histogram：各 bucket 次數、總和、次數與最大值)，
+# inc() 累加計數器。每次記錄只有一次加鎖與幾次字典操作 (約 2~3 µs)，可常駐開啟；
+# 環境變數 METRICS_ENABLED=0 時完全不記錄。
+#
+# 設定環境變數 METRICS_PATH 時由 flush_if_due() 定期輸出 (間隔 METRICS_FLUSH_SECONDS 秒)：
+# 副檔名 .jsonl 附加一行 JSON 快照，其他副檔名寫入 Prometheus text format
+# (可由 node_exporter 的 textfile collector 讀取)。
+#
+#   python metrics.py                  # 印出本程序目前的 Prometheus 文字
+#   python metrics.py --demo           # 記錄幾筆示範資料後印出
+
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+
+PREFIX = 'gynstage_'
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+METRICS_PATH = os.environ.get('METRICS_PATH')
+FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', '15'))
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class _Timer:
+    __slots__ = ('registry', 'name', 'labels', 'start', 'elapsed')
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self.elapsed = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self.start
+        self.registry.observe(self.name, self.elapsed, **self.labels)
+        return False
+
+
+class Registry:
+    """計數器與耗時分佈；所有方法可在多執行緒中呼叫。"""
+
+    def __init__(self, buckets=BUCKETS, enabled=True):
+        if list(buckets) != sorted(buckets):
+            raise ValueError(f"buckets 必須遞增: {buckets!r}")
+        self.buckets = tuple(buckets)
+        self.enabled = enabled
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._counters = {}
+        # key -> [各 bucket 次數..., 總和, 次數, 最大值]
+        self._histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        i = bisect.bisect_left(self.buckets, seconds)
+        n = len(self.buckets)
+        with self._lock:
+            h = self._histograms.get(key)
+            if h is None:
+                h = self._histograms[key] = [0] * n + [0.0, 0, 0.0]
+            if i < n:
+                h[i] += 1
+            h[n] += seconds
+            h[n + 1] += 1
+            if seconds > h[n + 2]:
+                h[n + 2] = seconds
+
+    def timer(self, name, **labels):
+        """with registry.timer('x_seconds', page='ai') as t: ...；結束後 t.elapsed 為秒數。"""
+        return _Timer(self, name, labels)
+
+    def snapshot(self):
+        """回傳 {'counters': [...], 'timers': [...]}，每項為可轉成 JSON 的 dict。"""
+        n = len(self.buckets)
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            timers = [{'name': name, 'labels': dict(labels), 'count': h[n + 1], 'sum': h[n], 'max': h[n + 2],
+                       'buckets': h[:n]}
+                      for (name, labels), h in sorted(self._histograms.items())]
+        return {'time': time.time(), 'started': self.started, 'counters': counters, 'timers': timers}
+
+    def prometheus_text(self):
+        n = len(self.buckets)
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(h)) for key, h in self._histograms.items())
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+            lines.append(f"{PREFIX}{name}{_label_text(labels)} {value}")
+        for (name, labels), h in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+            cumulative = 0
+            for le, count in zip(self.buckets, h[:n]):
+                cumulative += count
+                lines.append(f"{PREFIX}{name}_bucket{_label_text(labels, [('le', le)])} {cumulative}")
+            lines.append(f"{PREFIX}{name}_bucket{_label_text(labels, [('le', '+Inf')])} {h[n + 1]}")
+            lines.append(f"{PREFIX}{name}_sum{_label_text(labels)} {h[n]}")
+            lines.append(f"{PREFIX}{name}_count{_label_text(labels)} {h[n + 1]}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """path 副檔名為 .jsonl 時附加一行快照，否則以 Prometheus 文字整檔覆寫 (先寫暫存檔再改名)。"""
+        if path.endswith('.jsonl'):
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(self.snapshot(), ensure_ascii=False) + '\n')
+            return
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+        self.started = time.time()
+
+
+REGISTRY = Registry(enabled=ENABLED)
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+timer = REGISTRY.timer
+snapshot = REGISTRY.snapshot
+prometheus_text = REGISTRY.prometheus_text
+
+_last_flush = time.monotonic()
+_flush_lock = threading.Lock()
+
+
+def flush_if_due(path=None, interval=None):
+    """距上次輸出超過 interval 秒時寫出指標；未設定 METRICS_PATH 時不做任何事。回傳是否有寫出。"""
+    global _last_flush
+    path = path or METRICS_PATH
+    if not path or not REGISTRY.enabled:
+        return False
+    now = time.monotonic()
+    with _flush_lock:
+        if now - _last_flush < (FLUSH_SECONDS if interval is None else interval):
+            return False
+        _last_flush = now
+    REGISTRY.write(path)
+    return True
+
+
+if METRICS_PATH and ENABLED:
+    atexit.register(REGISTRY.write, METRICS_PATH)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="印出本程序的指標 (Prometheus text format)")
+    parser.add_argument('--demo', action='store_true', help="先記錄幾筆示範資料")
+    parser.add_argument('--json', action='store_true', help="改印 JSON 快照")
+    args = parser.parse_args(argv)
+
+    if args.demo:
+        for seconds in (0.004, 0.02, 0.3):
+            observe('app_rerun_seconds', seconds, page='endometrial')
+        inc('gemini_requests_total', endpoint='generateContent', status='200')
+        inc('gemini_request_bytes_total', 123456, endpoint='generateContent')
+    if args.json:
+        print(json.dumps(snapshot(), ensure_ascii=False, indent=2))
+    else:
+        print(prometheus_text(), end='')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+# app.py 使用的靜態選項與對照表
+#
+# Streamlit 每次互動都會從頭重新執行 app.py，但匯入的模組只會載入一次，
+# 因此所有選項清單與「顯示文字 -> 分期代碼」對照表集中在這裡，每個程序只建立一次。
+
+CSS = """
+    <style>
+    .main {
+        background-color: #f5f5f5;
+    }
+    h1 {
+        color: #2c3e50;
+    }
+    .stButton>button {
+        width: 100%;
+        background-color: #008080;
+        color: white;
+    }
+    </style>
+    """
+
+APP_MODES = [
+    "子宮內膜癌 (Endometrial)",
+    "卵巢癌 (Ovarian)",
+    "子宮頸癌 (Cervical)",
+    "子宮惡性肉瘤 (Sarcoma)",
+    "外陰黑色素瘤 (Vulvar Melanoma)",
+    "陰道癌 (Vaginal)",
+    "妊娠滋養層細胞腫瘤 (GTN)",
+    "外陰癌 (Vulvar)",
+    "🤖 AI 智慧判讀 (Beta)",
+]
+# 抽取結果帶入表單時切換的頁面
+CANCER_APP_MODES = {
+    'endometrial': APP_MODES[0], 'ovarian': APP_MODES[1], 'cervical': APP_MODES[2], 'sarcoma': APP_MODES[3],
+    'melanoma': APP_MODES[4], 'vaginal': APP_MODES[5], 'gtn': APP_MODES[6], 'vulvar': APP_MODES[7],
+}
+AI_APP_MODE = APP_MODES[8]
+
+AI_CANCER_CONTEXTS = ["子宮內膜癌", "卵巢癌", "子宮頸癌", "子宮惡性肉瘤", "外陰癌", "陰道癌", "GTN", "自動判斷"]
+AI_INPUT_SOURCES = ["上傳圖片", "貼上報告文字"]
+AI_OUTPUT_MODES = ["完整說明 (Markdown)", "結構化抽取 + 本機規則分期"]
+AI_ANALYSIS_MODES = ["單一報告 (所有圖片一起判讀)", "批次 (依檔名分組為多位病例)"]
+
+
+def _by_prefix(labels, sep):
+    """以分隔符號前的代碼建立 {顯示文字: 代碼}。"""
+    return {label: label.split(sep)[0] for label in labels}
+
+
+# --- 1. 子宮內膜癌 ---
+ENDOMETRIAL_HISTOLOGY = {
+    '非兇險 (non-aggressive): Low grade (G1/G2) endometrioid': 'non_aggressive',
+    '兇險 (aggressive): Serous, Clear cell, Undifferentiated, Carcinosarcoma, High-grade endometrioid (G3)': 'aggressive',
+}
+ENDOMETRIAL_MYOMETRIAL = {'無侵犯': 'none', '<50%': 'lt50', '≥50%': 'ge50'}
+ENDOMETRIAL_LVSI = {'無侵犯': 'none', '輕微侵犯(focal)': 'focal', '大量侵犯(extensive, ≥5 vessels)': 'extensive'}
+ENDOMETRIAL_LN_SIZE = {
+    '無': 'none',
+    '微轉移 (micrometastasis): 0.2-2 mm': 'micro',
+    '巨轉移 (macrometastasis): >2 mm': 'macro',
+}
+ENDOMETRIAL_EXTENT_FLAGS = [
+    ('cervical_stroma', '宮頸間質侵犯'),
+    ('ovarian_tubal', '卵巢或輸卵管侵犯'),
+    ('ovarian_limited', '卵巢腫瘤單側侷限無破裂'),
+    ('serosa', '漿膜侵犯'),
+    ('vaginal_parametrial', '陰道或子宮旁侵犯'),
+    ('pelvic_peritoneum', '骨盆腹膜侵犯'),
+    ('upper_abd_peritoneum', '骨盆以上腹腔腹膜侵犯'),
+    ('bladder_intestinal', '膀胱或腸黏膜侵犯'),
+    ('distant_meta', '遠處轉移 (含腹腔外淋巴結、肺、肝、腦、骨等)'),
+]
+ENDOMETRIAL_NODE_MOLECULAR_FLAGS = [
+    ('pelvic_ln', '骨盆淋巴結轉移'),
+    ('pa_ln', '主動脈旁淋巴結轉移'),
+    ('pole_mut', 'POLE mutation'),
+    ('p53_abn', 'p53 abnormal'),
+]
+
+# --- 2. 卵巢癌 ---
+OVARIAN_T = {
+    "單側卵巢、輸卵管未破裂 (T1a)": "T1a", "雙側卵巢、輸卵管未破裂 (T1b)": "T1b",
+    "手術時腫瘤溢出 (T1c1)": "T1c1", "術前破裂或腫瘤於卵巢、輸卵管表面 (T1c2)": "T1c2",
+    "腹水或腹膜沖洗細胞學陽性 (T1c3)": "T1c3", "子宮或輸卵管轉移 (T2a)": "T2a",
+    "其他骨盆組織轉移 (T2b)": "T2b", "腹腔顯微轉移 (T3a)": "T3a",
+    "腹腔轉移 ≤ 2 cm (T3b)": "T3b", "腹腔轉移 > 2 cm (T3c)": "T3c",
+}
+OVARIAN_N = {
+    "無淋巴結轉移 (N0)": "N0", "腹膜後淋巴結轉移 ≤ 10 mm (N1a)": "N1a",
+    "腹膜後淋巴結轉移 > 10 mm (N1b)": "N1b",
+}
+OVARIAN_M = {
+    "無遠端轉移 (M0)": "M0", "胸水細胞學陽性 (M1a)": "M1a", "肝脾實質或腹外器官轉移 (M1b)": "M1b",
+}
+
+# --- 3. 子宮頸癌 ---
+CERVICAL_T = _by_prefix([
+    "T1a1: Stromal invasion <3 mm", "T1a2: Stromal invasion 3-5 mm",
+    "T1b1: Invasion ≥5 mm depth, <2 cm dimension", "T1b2: Dimension 2-4 cm",
+    "T1b3: Dimension ≥4 cm", "T2a1: Vaginal involvement <4 cm",
+    "T2a2: Vaginal involvement ≥4 cm", "T2b: Parametrial invasion",
+    "T3a: Lower third vagina", "T3b: Pelvic wall/hydronephrosis",
+    "T3c1: Pelvic LN metastasis", "T3c2: Paraaortic LN metastasis",
+    "T4: Beyond true pelvis or biopsy-proven bladder/rectum mucosal involvement",
+], ':')
+CERVICAL_N = _by_prefix(["N0: No regional LN metastasis", "N0(i+): Isolated tumor cells ≤0.2 mm",
+                         "N1: Regional LN metastasis"], ':')
+CERVICAL_M = _by_prefix(["M0: No distant metastasis", "M1: Distant metastasis"], ':')
+
+# --- 4. 子宮惡性肉瘤 ---
+SARCOMA_TYPES = {
+    'Leiomyosarcoma': 'LMS',
+    'Endometrial Stromal Sarcoma': 'ESS',
+    'Mullerian Adenosarcoma': 'MAS',
+}
+_SARCOMA_T_SIZE = _by_prefix(['T1a (≤5 cm)', 'T1b (>5 cm)', 'T2a (adnexa)', 'T2b (pelvic tissues)',
+                              'T3a (one abdominal site)', 'T3b (>one abdominal site)', 'T4 (bladder/rectum)'], ' ')
+SARCOMA_T = {
+    'LMS': _SARCOMA_T_SIZE,
+    'ESS': _SARCOMA_T_SIZE,
+    'MAS': _by_prefix(['T1a (endometrium/endocervix)', 'T1b (≤half myometrial invasion)',
+                       'T1c (>half myometrial invasion)', 'T2a (adnexa)', 'T2b (pelvic tissues)',
+                       'T3a (one abdominal site)', 'T3b (>one abdominal site)', 'T4 (bladder/rectum)'], ' '),
+}
+SARCOMA_N = _by_prefix(['N0 (No regional lymph node metastasis)', 'N1 (Regional lymph node metastasis)'], ' ')
+SARCOMA_M = _by_prefix(['M0 (No distant metastasis)', 'M1 (Distant metastasis)'], ' ')
+
+# --- 5. 外陰黑色素瘤 ---
+MELANOMA_T = _by_prefix([
+    "Tis (原位癌)", "T1a (腫瘤<0.8mm，無潰瘍)", "T1b (腫瘤<0.8mm，有潰瘍或0.8-1.0mm無論有無潰瘍)",
+    "T2a (腫瘤>1.0-2.0mm，無潰瘍)", "T2b (腫瘤>1.0-2.0mm，有潰瘍)", "T3a (腫瘤>2.0-4.0mm，無潰瘍)",
+    "T3b (腫瘤>2.0-4.0mm，有潰瘍)", "T4a (腫瘤>4.0mm，無潰瘍)", "T4b (腫瘤>4.0mm，有潰瘍)",
+], ' ')
+MELANOMA_N = _by_prefix([
+    "N0 (無區域淋巴結轉移)", "N1a (單一隱匿性轉移淋巴結)", "N1b (單一臨床偵測淋巴結)",
+    "N1c (無淋巴結轉移但有衛星或微衛星轉移)", "N2a (2-3個隱匿性轉移淋巴結)", "N2b (2-3個淋巴結中至少一個臨床偵測)",
+    "N2c (一個臨床或隱匿性淋巴結且有衛星或微衛星轉移)", "N3a (≥4個隱匿性轉移淋巴結)",
+    "N3b (≥4個淋巴結中至少一個臨床偵測)", "N3c (≥2個臨床或隱匿性淋巴結或有融合淋巴結或衛星轉移)",
+], ' ')
+MELANOMA_M = _by_prefix([
+    "M0 (無遠處轉移)", "M1a(0) (皮膚、軟組織或非區域淋巴結轉移，LDH不升高)", "M1a(1) (皮膚、軟組織或非區域淋巴結轉移，LDH升高)",
+    "M1b(0) (肺轉移，LDH不升高)", "M1b(1) (肺轉移，LDH升高)", "M1c(0) (非中樞內臟器官轉移，LDH不升高)",
+    "M1c(1) (非中樞內臟器官轉移，LDH升高)", "M1d(0) (中樞神經系統轉移，LDH正常)", "M1d(1) (中樞神經系統轉移，LDH升高)",
+], ' ')
+
+# --- 6. 陰道癌 ---
+_VAGINAL_T = {
+    "T1a": "腫瘤侷限於陰道，且最大直徑 ≤ 2.0 cm", "T1b": "腫瘤侷限於陰道，且最大直徑 > 2.0 cm",
+    "T2a": "腫瘤穿透陰道壁，但未達骨盆壁，且最大直徑 ≤ 2.0 cm", "T2b": "腫瘤穿透陰道壁，但未達骨盆壁，且最大直徑 > 2.0 cm",
+    "T3": "腫瘤已達骨盆壁或引起腎積水或腎功能異常", "T4": "腫瘤侵犯膀胱或直腸，或超出骨盆腔"
+}
+_VAGINAL_N = {"N0": "無區域淋巴結轉移", "N1": "有區域淋巴結轉移，骨盆或鼠蹊區"}
+_VAGINAL_M = {"M0": "無遠處轉移", "M1": "有遠處轉移，如肺、肝或骨骼"}
+VAGINAL_T = {f"{k} ({v})": k for k, v in _VAGINAL_T.items()}
+VAGINAL_N = {f"{k} ({v})": k for k, v in _VAGINAL_N.items()}
+VAGINAL_M = {f"{k} ({v})": k for k, v in _VAGINAL_M.items()}
+
+# --- 7. GTN ---
+GTN_T = _by_prefix(['T1 (腫瘤侷限於子宮)', 'T2 (腫瘤延伸至其他生殖器官)'], ' ')
+GTN_M = _by_prefix(['M0 (無遠處轉移)', 'M1a (肺轉移)', 'M1b (其他遠處轉移)'], ' ')
+_GTN_SCORE_LABELS = {
+    'age': ("年齡", ["0(無)", "1(≥40歲)"]),
+    'antecedent_pregnancy': ("前次懷孕", ["0(葡萄胎)", "1(流產)", "2(足月妊娠)"]),
+    'interval': ("距前次妊娠時間", ["0(<4個月)", "1(4-6個月)", "2(7-12個月)", "4(>12個月)"]),
+    'hcg': ("治療前hCG數值(IU/mL)", ["0(<10^3)", "1(10^3-10^4)", "2(10^4-10^5)", "4(≥10^5)"]),
+    'size': ("腫瘤最大直徑", ["0(<3cm)", "1(3-5cm)", "2(>5cm)"]),
+    'site': ("轉移位置", ["0(無轉移或僅肺)", "1(脾臟/腎臟)", "2(腸胃道)", "4(腦/肝臟)"]),
+    'metastases': ("轉移病灶數量", ["0(無)", "1(1-4處)", "2(5-8處)", "4(>8處)"]),
+    'chemo_failure': ("化療失敗次數", ["0(無)", "2(單一藥物)", "4(兩種以上藥物)"]),
+}
+# staging.gtn_risk_score() 參數 -> (標題, {顯示文字: 分數})
+GTN_SCORE_ITEMS = {item: (title, {label: int(label.split('(')[0]) for label in labels})
+                   for item, (title, labels) in _GTN_SCORE_LABELS.items()}
+
+# --- 8. 外陰癌 ---
+_VULVAR_T = {
+    'Tis': '原位癌', 'T1a': '病灶 ≤ 2公分，浸潤深度 ≤ 1.0毫米',
+    'T1b': '病灶 > 2公分或浸潤深度 > 1.0毫米',
+    'T2': '腫瘤延伸至鄰近會陰結構 (下1/3尿道、下1/3陰道或肛門)',
+    'T3': '腫瘤侵犯上2/3尿道、上2/3陰道、膀胱黏膜、直腸黏膜或固定於骨盆骨'
+}
+_VULVAR_N = {
+    'N0': '無區域淋巴結轉移', 'N1a': '1或2個淋巴結轉移，各<5毫米',
+    'N1b': '1個淋巴結轉移 ≥5毫米', 'N2a': '3個或以上淋巴結轉移，各<5毫米',
+    'N2b': '2個或以上淋巴結轉移 ≥5毫米', 'N2c': '淋巴結轉移伴隨外囊侵犯',
+    'N3': '固定或潰瘍性淋巴結轉移'
+}
+_VULVAR_M = {'M0': '無遠處轉移', 'M1': '有遠處轉移(包含骨盆淋巴結轉移)'}
+VULVAR_T = {f"{k}: {v}": k for k, v in _VULVAR_T.items()}
+VULVAR_N = {f"{k}: {v}": k for k, v in _VULVAR_N.items()}
+VULVAR_M = {f"{k}: {v}": k for k, v in _VULVAR_M.items()}
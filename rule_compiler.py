@@ -0,0 +1,480 @@
+# 分期規則編譯器
+#
+# 將 staging_rules 的宣告式規則表轉成可執行的程式：
+#   compile_python()  產生 Python 原始碼 (衍生欄位與規則列攤平成一串 if，第一個成立的列直接回傳) 後 exec；
+#                     staging.py 以此建立子宮內膜癌分期函式，其他癌別再以 lookup_table() 展開成查表
+#   javascript()      index.html 使用的 STAGING_RULES 物件 (寫在 HTML_BEGIN/HTML_END 標記之間)
+#   numpy_masks()     每一列條件的 NumPy 布林陣列，staging_columnar 以此整批分期
+# evaluate() 逐列直接解讀規則表，作為交叉比對的基準。
+#
+#   python rule_compiler.py --check                  # 完整輸入空間比對規則表、staging.py、NumPy 與 index.html 的 JS
+#   python rule_compiler.py --write-html             # 重新產生 index.html 中的規則區塊
+#   python rule_compiler.py --python endometrial     # 印出產生的 Python 原始碼
+#   python rule_compiler.py --js                     # 印出產生的 JS
+
+import os
+import sys
+import time
+
+import staging_rules
+from staging_rules import FLAG, Not
+
+HTML_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index.html')
+HTML_BEGIN = '// ── STAGING RULES (由 rule_compiler.py 依 staging_rules.py 產生，請勿手動修改) ──'
+HTML_END = '// ── END STAGING RULES ──'
+
+
+def input_space(ruleset):
+    """依欄位順序列舉所有合法輸入 (tuple)，順序同 itertools.product。"""
+    fields = ruleset.fields
+
+    def walk(i, case):
+        if i == len(fields):
+            yield tuple(case)
+            return
+        field = fields[i]
+        values = field.values
+        if field.depends:
+            values = values[case[_index(ruleset, field.depends)]]
+        for value in values:
+            case.append(value)
+            yield from walk(i + 1, case)
+            case.pop()
+
+    return walk(0, [])
+
+
+def _index(ruleset, name):
+    return [f.name for f in ruleset.fields].index(name)
+
+
+def _matches(conditions, values):
+    for name, cond in conditions.items():
+        value = values[name]
+        if isinstance(cond, Not):
+            if value in cond.values:
+                return False
+        elif isinstance(cond, tuple):
+            if value not in cond:
+                return False
+        elif isinstance(cond, bool):
+            if bool(value) != cond:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+def _first(rows, values, default):
+    for conditions, result in rows:
+        if _matches(conditions, values):
+            return result
+    return default
+
+
+def evaluate(ruleset, case):
+    """直接解讀規則表：case 為依欄位順序的 tuple，回傳 (stage, tnm tuple)。"""
+    values = dict(zip((f.name for f in ruleset.fields), case))
+    for derived in ruleset.derived:
+        values[derived.name] = _first(derived.rows, values, derived.default)
+    return _first(ruleset.rows, values, ruleset.default), tuple(values[name] for name in ruleset.tnm)
+
+
+def _validate(ruleset):
+    names = [f.name for f in ruleset.fields]
+    known = set(names)
+    for derived in ruleset.derived:
+        if derived.name in known:
+            raise ValueError(f"{ruleset.cancer}: 衍生欄位與輸入欄位同名: {derived.name!r}")
+        known.add(derived.name)
+    flags = {f.name for f in ruleset.fields if f.values == FLAG}
+    for conditions, _ in [row for d in ruleset.derived for row in d.rows] + list(ruleset.rows):
+        for name, cond in conditions.items():
+            if name not in known:
+                raise ValueError(f"{ruleset.cancer}: 條件使用未知的欄位: {name!r}")
+            if (name in flags) != isinstance(cond, bool):
+                raise ValueError(f"{ruleset.cancer}: 欄位 {name!r} 的條件不合法: {cond!r}")
+    return flags
+
+
+# --- Python ---
+
+def _term_py(name, cond):
+    if isinstance(cond, bool):
+        return name if cond else f"not {name}"
+    if isinstance(cond, Not):
+        values = cond.values
+        return f"{name} != {values[0]!r}" if len(values) == 1 else f"{name} not in {values!r}"
+    if isinstance(cond, tuple):
+        return f"{name} == {cond[0]!r}" if len(cond) == 1 else f"{name} in {cond!r}"
+    return f"{name} == {cond!r}"
+
+
+def _condition_py(conditions):
+    return ' and '.join(_term_py(name, cond) for name, cond in conditions.items()) or 'True'
+
+
+def python_source(ruleset, name=None, check=False):
+    """產生分期函式原始碼：參數依欄位順序 (有預設值者帶預設值)，回傳 _result(stage, tnm)。
+
+    check 為 True 時先以 _check(name, value, allowed) 檢查非勾選欄位 (勾選項目依真假值判斷)。
+    """
+    flags = _validate(ruleset)
+    name = name or ruleset.cancer
+    params = ', '.join(f.name if f.default is None else f"{f.name}={f.default!r}" for f in ruleset.fields)
+    lines = [f"def {name}({params}):"]
+    if check:
+        for f in ruleset.fields:
+            if f.name in flags:
+                continue
+            allowed = f"{dict(f.values)!r}[{f.depends}]" if f.depends else repr(f.values)
+            lines.append(f"    if {f.name} not in {allowed}:")
+            lines.append(f"        _check({f.name!r}, {f.name}, {allowed})")
+    for derived in ruleset.derived:
+        keyword = 'if'
+        for conditions, value in derived.rows:
+            lines.append(f"    {keyword} {_condition_py(conditions)}:")
+            lines.append(f"        {derived.name} = {value!r}")
+            keyword = 'elif'
+        lines.append('    else:')
+        lines.append(f"        {derived.name} = {derived.default!r}")
+    lines.append(f"    tnm = ({', '.join(ruleset.tnm)}{',' if len(ruleset.tnm) == 1 else ''})")
+    for conditions, stage in ruleset.rows:
+        lines.append(f"    if {_condition_py(conditions)}:")
+        lines.append(f"        return _result({stage!r}, tnm)")
+    lines.append(f"    return _result({ruleset.default!r}, tnm)")
+    return '\n'.join(lines) + '\n'
+
+
+def _pair(stage, tnm):
+    return stage, tnm
+
+
+def compile_python(ruleset, result=_pair, check=None, name=None):
+    """編譯成 Python 函式；result(stage, tnm) 建立回傳值，check 不為 None 時檢查輸入。"""
+    name = name or ruleset.cancer
+    source = python_source(ruleset, name, check is not None)
+    namespace = {'_result': result, '_check': check}
+    exec(compile(source, f"<staging_rules.{ruleset.cancer}>", 'exec'), namespace)
+    return namespace[name]
+
+
+def lookup_table(ruleset, fn):
+    """以 fn 算出完整輸入空間的查表 {輸入 tuple: 結果}；有組合沒有任何規則成立且無 default 時丟出 ValueError。"""
+    table = {}
+    for case in input_space(ruleset):
+        res = fn(*case)
+        if res[0] is None:
+            raise ValueError(f"{ruleset.cancer} 規則未涵蓋: {case!r}")
+        table[case] = res
+    return table
+
+
+def rule_label(conditions):
+    """規則列的簡短名稱，例如 "pole_mut & T=T1a/T1b/T2 & N=N0"；沒有條件時為 "*"。"""
+    terms = []
+    for name, cond in conditions.items():
+        if isinstance(cond, bool):
+            terms.append(name if cond else f"!{name}")
+        elif isinstance(cond, Not):
+            terms.append(f"{name}!={'/'.join(cond.values)}")
+        elif isinstance(cond, tuple):
+            terms.append(f"{name}={'/'.join(cond)}")
+        else:
+            terms.append(f"{name}={cond}")
+    return ' & '.join(terms) or '*'
+
+
+# --- NumPy ---
+
+def numpy_levels(ruleset):
+    """欄位式計算的值域 {欄位: tuple}：輸入欄位同 Field.values，衍生欄位為其所有可能值 (排序)。"""
+    for f in ruleset.fields:
+        if f.depends:
+            raise ValueError(f"{ruleset.cancer}: 欄位式計算不支援相依值域的欄位: {f.name!r}")
+    levels = {f.name: f.values for f in ruleset.fields}
+    for derived in ruleset.derived:
+        levels[derived.name] = tuple(sorted({derived.default} | {value for _, value in derived.rows}))
+    return levels
+
+
+def _mask_np(np, column, levels, cond):
+    if isinstance(cond, bool):
+        return column if cond else ~column
+    if isinstance(cond, Not):
+        return ~np.isin(column, [levels.index(v) for v in cond.values])
+    if isinstance(cond, tuple):
+        return np.isin(column, [levels.index(v) for v in cond])
+    return column == levels.index(cond)
+
+
+def _row_masks(np, rows, columns, levels, shape):
+    masks = []
+    for conditions, _ in rows:
+        mask = np.ones(shape, dtype=bool)
+        for name, cond in conditions.items():
+            mask &= _mask_np(np, columns[name], levels[name], cond)
+        masks.append(mask)
+    return masks
+
+
+def numpy_masks(ruleset, columns):
+    """依規則表產生整批的條件陣列。
+
+    columns 為 {輸入欄位: 陣列}：勾選欄位為 bool，其他欄位為 numpy_levels() 值域的整數索引，
+    形狀須可 broadcast。回傳 (衍生欄位 {名稱: 索引陣列}, 各規則列的布林陣列 list)，
+    規則列順序同 ruleset.rows，第一個成立者決定分期。
+    """
+    import numpy as np
+
+    _validate(ruleset)
+    levels = numpy_levels(ruleset)
+    columns = dict(columns)
+    shape = np.broadcast(*columns.values()).shape
+    derived = {}
+    for d in ruleset.derived:
+        masks = _row_masks(np, d.rows, columns, levels, shape)
+        index = [levels[d.name].index(value) for _, value in d.rows]
+        column = np.select(masks, index, default=levels[d.name].index(d.default)).astype(np.int8)
+        columns[d.name] = derived[d.name] = column
+    return derived, _row_masks(np, ruleset.rows, columns, levels, shape)
+
+
+def numpy_stage(ruleset, columns):
+    """整批分期，回傳 (規則列索引陣列, 衍生欄位 dict)；索引為 len(ruleset.rows) 表示沒有任何列成立。"""
+    import numpy as np
+
+    derived, masks = numpy_masks(ruleset, columns)
+    rule = np.select(masks, np.arange(len(masks), dtype=np.int16), default=len(masks)).astype(np.int16)
+    return rule, derived
+
+
+def numpy_input_space(ruleset):
+    """完整輸入空間的欄位陣列 {欄位: 陣列}，列順序同 input_space()。"""
+    import numpy as np
+
+    fields = ruleset.fields
+    numpy_levels(ruleset)  # 檢查沒有相依值域
+    grid = np.indices([len(f.values) for f in fields], dtype=np.int8).reshape(len(fields), -1)
+    return {f.name: grid[i].astype(bool) if f.values == FLAG else grid[i] for i, f in enumerate(fields)}
+
+
+# --- JavaScript ---
+
+def _js(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if value is None:
+        return 'null'
+    return "'" + str(value).replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+
+def _term_js(ref, cond):
+    if isinstance(cond, bool):
+        return ref if cond else f"!{ref}"
+    if isinstance(cond, Not):
+        values = cond.values
+        if len(values) == 1:
+            return f"{ref} !== {_js(values[0])}"
+        return f"![{','.join(map(_js, values))}].includes({ref})"
+    if isinstance(cond, tuple):
+        if len(cond) == 1:
+            return f"{ref} === {_js(cond[0])}"
+        return f"[{','.join(map(_js, cond))}].includes({ref})"
+    return f"{ref} === {_js(cond)}"
+
+
+def _condition_js(conditions, fields):
+    terms = [_term_js(f"c.{name}" if name in fields else name, cond) for name, cond in conditions.items()]
+    return ' && '.join(terms) or 'true'
+
+
+def javascript_function(ruleset):
+    _validate(ruleset)
+    fields = {f.name for f in ruleset.fields}
+    lines = [f"  {ruleset.cancer}(c) {{"]
+    for derived in ruleset.derived:
+        lines.append(f"    let {derived.name} = {_js(derived.default)};")
+        keyword = 'if'
+        for conditions, value in derived.rows:
+            lines.append(f"    {keyword} ({_condition_js(conditions, fields)}) {derived.name} = {_js(value)};")
+            keyword = 'else if'
+    tnm = (f"c.{name}" if name in fields else name for name in ruleset.tnm)
+    lines.append(f"    const tnm = [{', '.join(tnm)}];")
+    for conditions, stage in ruleset.rows:
+        lines.append(f"    if ({_condition_js(conditions, fields)}) return {{stage: {_js(stage)}, tnm, matched: true}};")
+    lines.append(f"    return {{stage: {_js(ruleset.default)}, tnm, matched: false}};")
+    lines.append('  },')
+    return '\n'.join(lines)
+
+
+def javascript(rulesets=None):
+    """index.html 的規則區塊 (含開始與結束標記)。"""
+    rulesets = rulesets or staging_rules.RULESETS
+    body = '\n'.join(javascript_function(r) for r in rulesets.values())
+    return (f"{HTML_BEGIN}\n"
+            f"// 輸入為 {{欄位: 值}}，回傳 {{stage, tnm, matched}}；matched 為 false 表示沒有任何規則成立\n"
+            f"const STAGING_RULES = {{\n{body}\n}};\n"
+            f"{HTML_END}")
+
+
+def _block_span(html):
+    start = html.find(HTML_BEGIN)
+    end = html.find(HTML_END)
+    if start < 0 or end < start:
+        raise ValueError("index.html 中找不到規則區塊的開始/結束標記")
+    return start, end + len(HTML_END)
+
+
+def html_block(path=HTML_PATH):
+    with open(path, encoding='utf-8') as f:
+        html = f.read()
+    start, end = _block_span(html)
+    return html[start:end]
+
+
+def write_html(path=HTML_PATH):
+    """以目前的規則重新產生 index.html 的規則區塊，回傳是否有變更。"""
+    with open(path, encoding='utf-8') as f:
+        html = f.read()
+    start, end = _block_span(html)
+    block = javascript()
+    if html[start:end] == block:
+        return False
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(html[:start] + block + html[end:])
+    return True
+
+
+# --- 交叉比對 ---
+
+_JS_HARNESS = """
+const SPACE = %s;
+const out = [];
+for (const [cancer, fields] of SPACE) {
+  const walk = (i, c) => {
+    if (i === fields.length) { const r = STAGING_RULES[cancer](c); out.push(JSON.stringify([r.stage, r.tnm])); return; }
+    const [name, values, depends] = fields[i];
+    for (const v of (depends ? values[c[depends]] : values)) { c[name] = v; walk(i + 1, c); }
+  };
+  walk(0, {});
+}
+process.stdout.write(out.join('\\n') + '\\n');
+"""
+
+
+def run_javascript(block, rulesets, node='node'):
+    """以 node 執行 JS 規則區塊，依 input_space() 的順序回傳各癌別的 [(stage, tnm tuple), ...]。"""
+    # staging.py 匯入本模組 (app 啟動路徑)，只有比對時才需要的模組在此匯入
+    import itertools
+    import json
+    import subprocess
+
+    space = [[r.cancer, [[f.name, f.values, f.depends] for f in r.fields]] for r in rulesets]
+    script = block + '\n' + _JS_HARNESS % json.dumps(space)
+    out = subprocess.run([node, '-'], input=script, capture_output=True, text=True, check=True).stdout
+    rows = iter(json.loads(line) for line in out.splitlines())
+    results = {}
+    for r in rulesets:
+        count = sum(1 for _ in input_space(r))
+        results[r.cancer] = [(stage, tuple(tnm)) for stage, tnm in itertools.islice(rows, count)]
+    return results
+
+
+def _numpy_results(ruleset):
+    # 依 input_space() 的順序回傳 [(stage, tnm tuple), ...]；有相依值域的癌別為 None
+    if any(f.depends for f in ruleset.fields):
+        return None
+    columns = numpy_input_space(ruleset)
+    rule, derived = numpy_stage(ruleset, columns)
+    levels = numpy_levels(ruleset)
+    stages = [stage for _, stage in ruleset.rows] + [ruleset.default]
+    tnm = [[levels[name][i] for i in (derived[name] if name in derived else columns[name]).tolist()]
+           for name in ruleset.tnm]
+    return [(stages[r], t) for r, t in zip(rule.tolist(), zip(*tnm))]
+
+
+def cross_check(html_path=HTML_PATH, node='node', max_examples=3):
+    """在完整輸入空間上比對規則表直譯結果、staging.py 的分期函式、numpy_masks() 與 index.html 中的 JS。
+
+    回傳 {癌別: {'cases', 'python', 'numpy', 'js', 'examples'}}，python/numpy/js 為不一致的組合數；
+    找不到 node 時 js 為 None，有相依值域 (NumPy 不支援) 的癌別 numpy 為 None。
+    """
+    import staging
+
+    rulesets = list(staging_rules.RULESETS.values())
+    try:
+        js = run_javascript(html_block(html_path), rulesets, node)
+    except FileNotFoundError:
+        js = None
+    report = {}
+    for r in rulesets:
+        stager = staging.STAGERS[r.cancer]
+        cases = list(input_space(r))
+        expected = [evaluate(r, case) for case in cases]
+        vectorized = _numpy_results(r)
+        examples = []
+        py_bad = np_bad = js_bad = 0
+        for i, (case, want) in enumerate(zip(cases, expected)):
+            got = tuple(stager(*case))
+            if got != want:
+                py_bad += 1
+                if len(examples) < max_examples:
+                    examples.append(('python', case, want, got))
+            if vectorized is not None and vectorized[i] != want:
+                np_bad += 1
+                if len(examples) < max_examples:
+                    examples.append(('numpy', case, want, vectorized[i]))
+            if js is not None and js[r.cancer][i] != want:
+                js_bad += 1
+                if len(examples) < max_examples:
+                    examples.append(('js', case, want, js[r.cancer][i]))
+        report[r.cancer] = {'cases': len(cases), 'python': py_bad,
+                            'numpy': None if vectorized is None else np_bad,
+                            'js': None if js is None else js_bad, 'examples': examples}
+    return report
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="分期規則表編譯與交叉比對")
+    parser.add_argument('--check', action='store_true', help="完整輸入空間比對 Python、NumPy 與 index.html 的 JS")
+    parser.add_argument('--write-html', action='store_true', help="重新產生 index.html 的規則區塊")
+    parser.add_argument('--python', metavar='CANCER', help="印出該癌別產生的 Python 原始碼")
+    parser.add_argument('--js', action='store_true', help="印出產生的 JS")
+    parser.add_argument('--html', default=HTML_PATH)
+    parser.add_argument('--node', default='node')
+    args = parser.parse_args(argv)
+
+    if args.python:
+        if args.python not in staging_rules.RULESETS:
+            parser.error(f"未知的癌別: {args.python} (可用值: {', '.join(staging_rules.RULESETS)})")
+        print(python_source(staging_rules.RULESETS[args.python]), end='')
+    if args.js:
+        print(javascript())
+    if args.write_html:
+        print("已更新" if write_html(args.html) else "沒有變更", args.html)
+    if not args.check:
+        return 0
+
+    status = 0
+    if html_block(args.html) != javascript():
+        print(f"{args.html} 的規則區塊與 staging_rules.py 不一致，請執行 --write-html")
+        status = 1
+    start = time.perf_counter()
+    report = cross_check(args.html, args.node)
+    for cancer, r in report.items():
+        vectorized = 'NumPy 不適用' if r['numpy'] is None else f"NumPy 不一致 {r['numpy']}"
+        js = '未比對 (找不到 node)' if r['js'] is None else f"JS 不一致 {r['js']}"
+        print(f"{cancer:<12}{r['cases']:>8} 組  Python 不一致 {r['python']}  {vectorized}  {js}")
+        for side, case, want, got in r['examples']:
+            print(f"    {side} {case}: 規則表 {want}，實際 {got}")
+        if r['python'] or r['numpy'] or r['js']:
+            status = 1
+    print(f"耗時 {time.perf_counter() - start:.1f} 秒；" + ("全部一致" if status == 0 else "有不一致"))
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,202 @@
+# 登錄資料批次分期命令列工具
+#
+# 以 generator 分批 (chunk) 讀取 CSV 或 JSONL，交給 process pool 分期後依原順序串流寫出，
+# 同時在 stderr 回報每批的處理量。記憶體用量只與 chunk 大小及 worker 數有關。
+#
+#   python stage_cli.py cases.csv -o staged.csv --cancer cervical
+#   python stage_cli.py registry.jsonl -o staged.jsonl          # 每列以 cancer 欄位決定癌別
+#
+# 欄位名稱即 staging.stage_<癌別>() 的參數名稱 (例如 t, n, m, lvsi, pelvic_ln)，
+# 其餘欄位原樣輸出；結果寫入 stage, tnm, score, risk, error 欄位。
+# 空白欄位使用參數預設值，但 staging.REQUIRED_FIELDS 的必要欄位空白時寫入 error 而不分期；
+# 不是 JSON 物件的 JSONL 列原文寫入 input 欄位並標記 error。
+
+import argparse
+import csv
+import inspect
+import json
+import os
+import sys
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import staging
+
+RESULT_COLUMNS = ('stage', 'tnm', 'score', 'risk', 'error')
+
+# 無法解析的 JSONL 列 (原文與錯誤訊息)，交給 stage_row 寫成錯誤列
+InvalidLine = namedtuple('InvalidLine', ['text', 'error'])
+
+_TRUE = {'1', 'true', 't', 'yes', 'y', '是', 'x', 'v'}
+_FALSE = {'0', 'false', 'f', 'no', 'n', '否'}
+
+# 各癌別參數名稱 -> 預設值 (用來決定 CSV 字串要轉成 bool 或 int)
+_PARAMS = {cancer: {name: p.default for name, p in inspect.signature(fn).parameters.items()}
+           for cancer, fn in staging.STAGERS.items()}
+
+
+def _convert(name, value, default):
+    if isinstance(default, bool):
+        if isinstance(value, bool):
+            return value
+        text = str(value).strip().lower()
+        if text in _TRUE:
+            return True
+        if text in _FALSE:
+            return False
+        raise ValueError(f"{name} 不是布林值: {value!r}")
+    if isinstance(default, int) and not isinstance(value, int):
+        return int(value)
+    return value
+
+
+def stage_row(row, cancer=None, cancer_column='cancer'):
+    """分期單一列 (dict)，回傳加上結果欄位的新 dict；錯誤寫入 error 欄位而不中斷整批。"""
+    out = dict.fromkeys(RESULT_COLUMNS, '')
+    try:
+        if isinstance(row, InvalidLine):
+            out['input'] = row.text
+            raise ValueError(f"不是合法的 JSON: {row.error}")
+        if not isinstance(row, dict):
+            out['input'] = json.dumps(row, ensure_ascii=False)
+            raise ValueError("每列必須為 JSON 物件")
+        out = dict(row, **out)
+        kind = cancer or row.get(cancer_column)
+        fn = staging.get_stager(kind)
+        params = _PARAMS[kind]
+        kwargs = {name: _convert(name, value, params[name])
+                  for name, value in row.items()
+                  if name in params and value not in ('', None)}
+        missing = staging.missing_fields(kind, kwargs)
+        if missing:
+            raise ValueError(f"缺少必要欄位: {', '.join(missing)}")
+        res = fn(**kwargs)
+    except (TypeError, ValueError) as e:
+        out['error'] = str(e)
+        return out
+    for key, value in res._asdict().items():
+        out[key] = ' '.join(value) if key == 'tnm' else value
+    return out
+
+
+def stage_chunk(rows, cancer=None, cancer_column='cancer'):
+    start = time.perf_counter()
+    staged = [stage_row(row, cancer, cancer_column) for row in rows]
+    return staged, time.perf_counter() - start
+
+
+def _detect_format(path, fmt):
+    if fmt:
+        return fmt
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_rows(stream, fmt):
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield InvalidLine(line.rstrip('\n'), str(e))
+
+
+def chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def imap_bounded(executor, fn, iterable, window):
+    """依序回傳 executor.submit(fn, item) 的結果，同時最多 window 個未完成的工作。"""
+    pending = deque()
+    for item in iterable:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class _Writer:
+    def __init__(self, stream, fmt):
+        self.stream = stream
+        self.fmt = fmt
+        self.csv = None
+
+    def write(self, rows):
+        if self.fmt == 'jsonl':
+            for row in rows:
+                self.stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+            return
+        if self.csv is None and rows:
+            fields = [k for k in rows[0] if k not in RESULT_COLUMNS] + list(RESULT_COLUMNS)
+            self.csv = csv.DictWriter(self.stream, fieldnames=fields, restval='', extrasaction='ignore')
+            self.csv.writeheader()
+        self.csv.writerows(rows)
+
+
+def run(src, dst, in_fmt, out_fmt, cancer=None, cancer_column='cancer', chunk_size=5000,
+        workers=None, log=sys.stderr):
+    """串流處理 src -> dst，回傳 (總列數, 錯誤列數)。"""
+    workers = workers or os.cpu_count() or 1
+    writer = _Writer(dst, out_fmt)
+    work = partial(stage_chunk, cancer=cancer, cancer_column=cancer_column)
+    chunks = chunked(read_rows(src, in_fmt), chunk_size)
+    total = errors = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for i, (staged, elapsed) in enumerate(imap_bounded(pool, work, chunks, workers * 2)):
+            writer.write(staged)
+            total += len(staged)
+            errors += sum(1 for row in staged if row['error'])
+            if log:
+                print(f"chunk {i}: {len(staged)} 列，{elapsed * 1000:.1f} ms "
+                      f"({len(staged) / max(elapsed, 1e-9):,.0f} 列/秒)", file=log)
+    if log:
+        wall = time.perf_counter() - start
+        print(f"完成：{total} 列 ({errors} 列錯誤)，{wall:.2f} s "
+              f"({total / max(wall, 1e-9):,.0f} 列/秒，{workers} workers)", file=log)
+    return total, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批次分期 CSV/JSONL 登錄資料")
+    parser.add_argument('input', help="輸入檔 (CSV 或 JSONL)，'-' 為 stdin")
+    parser.add_argument('-o', '--output', default='-', help="輸出檔，預設為 stdout")
+    parser.add_argument('--cancer', choices=sorted(staging.STAGERS),
+                        help="所有列皆使用此癌別；未指定時依 --cancer-column 欄位決定")
+    parser.add_argument('--cancer-column', default='cancer')
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help="輸入格式 (預設依副檔名)")
+    parser.add_argument('--output-format', choices=('csv', 'jsonl'), help="輸出格式 (預設同輸入)")
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--workers', type=int, help="process 數 (預設為 CPU 數)")
+    parser.add_argument('-q', '--quiet', action='store_true', help="不輸出處理量")
+    args = parser.parse_args(argv)
+
+    in_fmt = _detect_format(args.input, args.format)
+    out_fmt = args.output_format or (in_fmt if args.output == '-' else _detect_format(args.output, None))
+    src = sys.stdin if args.input == '-' else open(args.input, newline='', encoding='utf-8')
+    dst = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+    try:
+        _, errors = run(src, dst, in_fmt, out_fmt, args.cancer, args.cancer_column,
+                        args.chunk_size, args.workers, None if args.quiet else sys.stderr)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
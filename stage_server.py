@@ -0,0 +1,180 @@
+# 無介面的分期 HTTP 服務 (標準函式庫，供 EHR 系統串接)
+#
+#   python stage_server.py --port 8600
+#
+# 端點 (JSON 輸入/輸出，欄位名稱同 staging.stage_<癌別>() 參數)：
+#   GET  /health
+#   GET  /cancers                     可用癌別與參數
+#   POST /stage/<癌別>                 單一病例，例如 {"t": "T1b2", "n": "N0", "m": "M0"}
+#   POST /stage/<癌別>/batch           {"cases": [{...}, ...]}，逐筆回傳結果或 error
+#   POST /stage/gtn_risk               GTN WHO 預後評分
+#
+# 回應：{"stage": ..., "tnm": [...]}；GTN 評分為 {"score": ..., "risk": ...}；
+# 輸入錯誤回傳 400 {"error": ...}。欄位型別須與表單相同：代碼為字串、勾選項目為
+# true/false、GTN 評分為整數 ("false"、1 代替 true 等一律視為錯誤)。
+
+import argparse
+import inspect
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import staging
+import staging_rules
+
+MAX_BODY = 10 * 1024 * 1024
+
+# 各癌別參數的 JSON 型別：勾選項目為 bool，GTN 評分為 int，其餘代碼為 str
+FIELD_TYPES = {
+    **{cancer: {f.name: bool if f.values == staging_rules.FLAG else str for f in ruleset.fields}
+       for cancer, ruleset in staging_rules.RULESETS.items()},
+    'gtn_risk': dict.fromkeys(staging.GTN_SCORE_ITEMS, int),
+}
+_TYPE_NAMES = {bool: '布林值 (true/false)', int: '整數', str: '字串'}
+
+
+class _BadRequest(Exception):
+    pass
+
+
+def _check_types(types, case):
+    for name, value in case.items():
+        expected = types.get(name)
+        if expected is None:
+            continue  # 未知參數由呼叫時的 TypeError 回報
+        # bool 是 int 的子類別，評分欄位要另外排除 true/false
+        if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+            raise _BadRequest(f"{name} 必須為{_TYPE_NAMES[expected]}: {value!r}")
+
+
+def _stage_one(fn, case, types=None):
+    if not isinstance(case, dict):
+        raise _BadRequest("病例必須為 JSON 物件")
+    _check_types(types or {}, case)
+    try:
+        return fn(**case)._asdict()
+    except TypeError as e:
+        raise _BadRequest(f"參數錯誤: {e}") from None
+    except ValueError as e:
+        raise _BadRequest(str(e)) from None
+
+
+def _stage_batch(fn, cases, types=None):
+    results = []
+    for case in cases:
+        try:
+            results.append(_stage_one(fn, case, types))
+        except _BadRequest as e:
+            results.append({'error': str(e)})
+    return results
+
+
+def _cancers():
+    return {cancer: list(inspect.signature(fn).parameters) for cancer, fn in staging.STAGERS.items()}
+
+
+class StagingHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'GynStaging/1.0'
+    # 標頭與內容分次寫出，關閉 Nagle 以免與 delayed ACK 互相等待 (~40 ms)
+    disable_nagle_algorithm = True
+    quiet = True
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def _send(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _content_length(self):
+        # body 無法完整讀掉時 (長度不合法或過大) 回應後關閉連線，避免 keep-alive 連線錯位
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            raise _BadRequest("Content-Length 不合法")
+        if length > MAX_BODY:
+            self.close_connection = True
+            raise _BadRequest("請求內容過大")
+        return length
+
+    def _read_json(self):
+        length = self._content_length()
+        try:
+            return json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            raise _BadRequest("請求內容不是合法的 JSON") from None
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, {'status': 'ok'})
+        elif self.path == '/cancers':
+            self._send(200, _cancers())
+        else:
+            self._send(404, {'error': f"找不到路徑: {self.path}"})
+
+    def do_POST(self):
+        parts = self.path.strip('/').split('/')
+        if len(parts) not in (2, 3) or parts[0] != 'stage' or (len(parts) == 3 and parts[2] != 'batch'):
+            # 仍需讀掉 body，避免 keep-alive 連線錯位
+            try:
+                self.rfile.read(self._content_length())
+            except _BadRequest:
+                pass
+            self._send(404, {'error': f"找不到路徑: {self.path}"})
+            return
+        try:
+            body = self._read_json()
+            fn = staging.STAGERS.get(parts[1])
+            types = FIELD_TYPES.get(parts[1])
+            if fn is None:
+                self._send(404, {'error': f"未知的癌別: {parts[1]!r}"})
+            elif len(parts) == 3:
+                cases = body.get('cases') if isinstance(body, dict) else body
+                if not isinstance(cases, list):
+                    raise _BadRequest("batch 請求需為 {\"cases\": [...]} 或陣列")
+                self._send(200, {'results': _stage_batch(fn, cases, types)})
+            else:
+                self._send(200, _stage_one(fn, body, types))
+        except _BadRequest as e:
+            self._send(400, {'error': str(e)})
+
+
+class StagingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def make_server(host='127.0.0.1', port=8600, quiet=True):
+    handler = type('Handler', (StagingHandler,), {'quiet': quiet})
+    return StagingServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="婦癌分期 HTTP 服務")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('-v', '--verbose', action='store_true', help="輸出每筆請求紀錄")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, quiet=not args.verbose)
+    print(f"分期服務啟動於 http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
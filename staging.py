@@ -0,0 +1,220 @@
+# 婦癌分期規則引擎 (不依賴 Streamlit)
+#
+# 每個癌別一個函式，輸入為代碼 (例如 'T1a'、'micro')，回傳 StageResult。
+# stage 欄位保留 app.py 原本顯示的分期字串；tnm 為 AJCC T/N/M 代碼 tuple。
+# stage_many() 供登錄資料批次分期使用。
+#
+# 分期規則定義在 staging_rules.py (與 index.html 共用)，由 rule_compiler 編譯：
+# 子宮內膜癌為攤平的 if 鏈；其他癌別的輸入皆為有限的 T/N/M 代碼組合，於匯入時預先展開成
+# dict (key 為代碼 tuple)，查詢時只需一次 dict 取值；不合法的輸入才進入檢查。
+
+from collections import namedtuple
+
+import rule_compiler
+import staging_rules
+from staging_rules import (CERVICAL_M, CERVICAL_N, CERVICAL_T, ENDOMETRIAL_FLAGS, ENDOMETRIAL_HISTOLOGY,
+                           ENDOMETRIAL_LN_SIZE, ENDOMETRIAL_LVSI, ENDOMETRIAL_MYOMETRIAL, ENDOMETRIAL_UNCLASSIFIED,
+                           GTN_M, GTN_T, MELANOMA_M, MELANOMA_N, MELANOMA_T, OVARIAN_M, OVARIAN_N, OVARIAN_T,
+                           SARCOMA_M, SARCOMA_N, SARCOMA_T, SARCOMA_TYPES, VAGINAL_M, VAGINAL_N, VAGINAL_T,
+                           VULVAR_M, VULVAR_N, VULVAR_T)
+
+StageResult = namedtuple('StageResult', ['stage', 'tnm'])
+GTNScore = namedtuple('GTNScore', ['score', 'risk'])
+
+CANCER_TYPES = ('endometrial', 'ovarian', 'cervical', 'sarcoma',
+                'melanoma', 'vaginal', 'gtn', 'vulvar')
+
+
+def _check(name, value, allowed):
+    if value not in allowed:
+        raise ValueError(f"{name} 不合法: {value!r} (可用值: {', '.join(map(str, allowed))})")
+
+
+def _compile(cancer):
+    ruleset = staging_rules.RULESETS[cancer]
+    return rule_compiler.lookup_table(ruleset, rule_compiler.compile_python(ruleset, StageResult))
+
+
+def _lookup(table, key, names, axes):
+    res = table.get(key)
+    if res is None:
+        for name, value, allowed in zip(names, key, axes):
+            _check(name, value, allowed)
+    return res
+
+
+# --- 1. 子宮內膜癌 ---
+stage_endometrial = rule_compiler.compile_python(staging_rules.ENDOMETRIAL, StageResult, _check,
+                                                 name='stage_endometrial')
+stage_endometrial.__doc__ = """FIGO 2023 子宮內膜癌分期。stage 為 'IAmPOLEmut'、'3C1i' 等；
+    空字串表示原規則未給出結果，ENDOMETRIAL_UNCLASSIFIED 表示未涵蓋之組合。"""
+
+
+# --- 2. 卵巢癌 ---
+_OVARIAN_TABLE = _compile('ovarian')
+
+
+def stage_ovarian(t, n='N0', m='M0'):
+    return _lookup(_OVARIAN_TABLE, (t, n, m), ('t', 'n', 'm'), (OVARIAN_T, OVARIAN_N, OVARIAN_M))
+
+
+# --- 3. 子宮頸癌 ---
+_CERVICAL_TABLE = _compile('cervical')
+
+
+def stage_cervical(t, n='N0', m='M0'):
+    return _lookup(_CERVICAL_TABLE, (t, n, m), ('t', 'n', 'm'), (CERVICAL_T, CERVICAL_N, CERVICAL_M))
+
+
+# --- 4. 子宮惡性肉瘤 ---
+_SARCOMA_TABLE = _compile('sarcoma')
+
+
+def stage_sarcoma(sarcoma_type, t, n='N0', m='M0'):
+    """sarcoma_type: 'LMS' (Leiomyosarcoma)、'ESS' (Endometrial Stromal Sarcoma)、
+    'MAS' (Mullerian Adenosarcoma)。stage 為 FIGO 分期 ('IA'、'IVB' …)。"""
+    res = _SARCOMA_TABLE.get((sarcoma_type, t, n, m))
+    if res is None:
+        _check('sarcoma_type', sarcoma_type, SARCOMA_TYPES)
+        _check('t', t, SARCOMA_T[sarcoma_type])
+        _check('n', n, SARCOMA_N)
+        _check('m', m, SARCOMA_M)
+    return res
+
+
+# --- 5. 外陰黑色素瘤 (AJCC) ---
+_MELANOMA_TABLE = _compile('melanoma')
+
+
+def stage_melanoma(t, n='N0', m='M0'):
+    """stage 為 AJCC 預後分期 (黑色素瘤無 FIGO 分期)。"""
+    return _lookup(_MELANOMA_TABLE, (t, n, m), ('t', 'n', 'm'), (MELANOMA_T, MELANOMA_N, MELANOMA_M))
+
+
+# --- 6. 陰道癌 ---
+_VAGINAL_TABLE = _compile('vaginal')
+
+
+def stage_vaginal(t, n='N0', m='M0'):
+    return _lookup(_VAGINAL_TABLE, (t, n, m), ('t', 'n', 'm'), (VAGINAL_T, VAGINAL_N, VAGINAL_M))
+
+
+# --- 7. GTN ---
+# WHO 預後評分各項可用分數
+GTN_SCORE_ITEMS = {
+    'age': (0, 1),
+    'antecedent_pregnancy': (0, 1, 2),
+    'interval': (0, 1, 2, 4),
+    'hcg': (0, 1, 2, 4),
+    'size': (0, 1, 2),
+    'site': (0, 1, 2, 4),
+    'metastases': (0, 1, 2, 4),
+    'chemo_failure': (0, 2, 4),
+}
+
+
+_GTN_TABLE = _compile('gtn')
+
+
+def stage_gtn(t, m='M0'):
+    return _lookup(_GTN_TABLE, (t, m), ('t', 'm'), (GTN_T, GTN_M))
+
+
+def gtn_risk_score(age=0, antecedent_pregnancy=0, interval=0, hcg=0, size=0, site=0,
+                   metastases=0, chemo_failure=0):
+    """WHO/FIGO 預後評分，< 7 為低風險。"""
+    items = {'age': age, 'antecedent_pregnancy': antecedent_pregnancy, 'interval': interval,
+             'hcg': hcg, 'size': size, 'site': site, 'metastases': metastases,
+             'chemo_failure': chemo_failure}
+    for name, value in items.items():
+        _check(name, value, GTN_SCORE_ITEMS[name])
+    score = sum(items.values())
+    return GTNScore(score, '低風險' if score < 7 else '高風險')
+
+
+# --- 8. 外陰癌 ---
+_VULVAR_TABLE = _compile('vulvar')
+
+
+def stage_vulvar(t, n='N0', m='M0'):
+    return _lookup(_VULVAR_TABLE, (t, n, m), ('t', 'n', 'm'), (VULVAR_T, VULVAR_N, VULVAR_M))
+
+
+# --- 預先展開的查表 ---
+LOOKUP_TABLES = {
+    'ovarian': _OVARIAN_TABLE,
+    'cervical': _CERVICAL_TABLE,
+    'sarcoma': _SARCOMA_TABLE,
+    'melanoma': _MELANOMA_TABLE,
+    'vaginal': _VAGINAL_TABLE,
+    'gtn': _GTN_TABLE,
+    'vulvar': _VULVAR_TABLE,
+}
+# 各規則在無對應分期時的回傳值
+UNCLASSIFIED_STAGES = frozenset({
+    'Cannot classify', '未分類', '未知分期', '資料不足或不符合分期標準',
+    '請確認輸入資料是否完整或正確', ENDOMETRIAL_UNCLASSIFIED,
+})
+
+
+def unclassified_cells():
+    """列出查表中所有無法分期的組合：{癌別: [代碼 tuple, ...]}。"""
+    return {cancer: [key for key, res in table.items() if res.stage in UNCLASSIFIED_STAGES]
+            for cancer, table in LOOKUP_TABLES.items()}
+
+
+# --- 批次介面 ---
+STAGERS = {
+    'endometrial': stage_endometrial,
+    'ovarian': stage_ovarian,
+    'cervical': stage_cervical,
+    'sarcoma': stage_sarcoma,
+    'melanoma': stage_melanoma,
+    'vaginal': stage_vaginal,
+    'gtn': stage_gtn,
+    'gtn_risk': gtn_risk_score,
+    'vulvar': stage_vulvar,
+}
+
+
+# 未提供時不能以參數預設值 (最輕的選項) 代替的欄位。M 在病理報告與登錄資料中常未記載，維持 M0；
+# 子宮內膜癌有淋巴結轉移時另需 lymph_node_size (見 missing_fields)
+REQUIRED_FIELDS = {
+    'endometrial': ('histology', 'myometrial_invasion', 'pelvic_ln', 'pa_ln'),
+    'ovarian': ('t', 'n'),
+    'cervical': ('t', 'n'),
+    'sarcoma': ('sarcoma_type', 't', 'n'),
+    'melanoma': ('t', 'n'),
+    'vaginal': ('t', 'n'),
+    'gtn': ('t',),
+    'gtn_risk': tuple(GTN_SCORE_ITEMS),
+    'vulvar': ('t', 'n'),
+}
+
+
+def missing_fields(cancer, inputs):
+    """inputs (關鍵字參數 dict) 缺少的必要欄位清單。"""
+    required = REQUIRED_FIELDS[cancer]
+    if cancer == 'endometrial' and (inputs.get('pelvic_ln') or inputs.get('pa_ln')):
+        required += ('lymph_node_size',)
+    return [name for name in required if name not in inputs]
+
+
+def get_stager(cancer):
+    try:
+        return STAGERS[cancer]
+    except KeyError:
+        raise ValueError(f"未知的癌別: {cancer!r} (可用值: {', '.join(STAGERS)})") from None
+
+
+def stage_many(cancer, cases):
+    """批次分期：cases 為關鍵字參數 dict 的 iterable，依序回傳結果 list。"""
+    fn = get_stager(cancer)
+    return [fn(**case) for case in cases]
+
+
+if __name__ == '__main__':
+    for cancer, cells in unclassified_cells().items():
+        print(f"{cancer}: {len(LOOKUP_TABLES[cancer])} 組合，{len(cells)} 組無法分期")
+        for key in cells:
+            print(f"  {' '.join(key)} -> {LOOKUP_TABLES[cancer][key].stage}")
@@ -0,0 +1,131 @@
+# 子宮內膜癌分期的欄位式 (NumPy 向量化) 版本
+#
+# 每個輸入為一個陣列 (一列一個病例)，以陣列運算一次算出整批的 T/N/M 與 FIGO 分期。
+# 條件陣列由 rule_compiler.numpy_masks() 依 staging_rules.ENDOMETRIAL 產生，與 staging.py、index.html
+# 共用同一份規則表。
+#
+#   python staging_columnar.py            # 全組合比對純量版本
+#   python staging_columnar.py -n 100000  # 隨機抽樣比對
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import rule_compiler
+import staging
+import staging_rules
+
+_RULESET = staging_rules.ENDOMETRIAL
+_LEVELS = rule_compiler.numpy_levels(_RULESET)
+ENDOMETRIAL_T, ENDOMETRIAL_N, ENDOMETRIAL_M = (_LEVELS[name] for name in _RULESET.tnm)
+
+# (規則名稱, FIGO 分期)，由 staging_rules.ENDOMETRIAL 產生，順序即判定優先順序；最後一列為都不成立時的 default
+ENDOMETRIAL_RULES = tuple((rule_compiler.rule_label(conditions), stage) for conditions, stage in _RULESET.rows) \
+    + (('default', _RULESET.default),)
+ENDOMETRIAL_RULE_NAMES = tuple(name for name, _ in ENDOMETRIAL_RULES)
+_STAGES = np.array([stage for _, stage in ENDOMETRIAL_RULES], dtype=object)
+
+
+def _categorical(name, values, levels):
+    """字串或整數索引陣列 -> levels 的整數索引陣列。"""
+    arr = np.asarray(values)
+    if arr.dtype.kind in 'iu':
+        if arr.size and (arr.min() < 0 or arr.max() >= len(levels)):
+            raise ValueError(f"{name} 索引超出範圍 0..{len(levels) - 1}")
+        return arr.astype(np.int8)
+    codes = np.full(arr.shape, -1, dtype=np.int8)
+    for i, level in enumerate(levels):
+        codes[arr == level] = i
+    if (codes < 0).any():
+        bad = arr[codes < 0].flat[0]
+        raise ValueError(f"{name} 不合法: {bad!r} (可用值: {', '.join(levels)})")
+    return codes
+
+
+def endometrial_columns(histology, myometrial_invasion, lvsi, lymph_node_size, **flags):
+    """整批計算子宮內膜癌分期。
+
+    類別欄位可為代碼字串陣列 (如 'lt50') 或對應 staging.ENDOMETRIAL_* 的整數索引；
+    flags 為 staging.ENDOMETRIAL_FLAGS 中的布林陣列，未提供者視為 False。
+    回傳 dict：T/N/M/rule 為整數索引陣列 (對應 ENDOMETRIAL_T/N/M/RULES)，stage 為分期字串陣列。
+    """
+    unknown = set(flags) - set(staging.ENDOMETRIAL_FLAGS)
+    if unknown:
+        raise TypeError(f"未知的欄位: {', '.join(sorted(unknown))}")
+
+    columns = {
+        'histology': _categorical('histology', histology, staging.ENDOMETRIAL_HISTOLOGY),
+        'myometrial_invasion': _categorical('myometrial_invasion', myometrial_invasion,
+                                            staging.ENDOMETRIAL_MYOMETRIAL),
+        'lvsi': _categorical('lvsi', lvsi, staging.ENDOMETRIAL_LVSI),
+        'lymph_node_size': _categorical('lymph_node_size', lymph_node_size, staging.ENDOMETRIAL_LN_SIZE),
+    }
+    for name in staging.ENDOMETRIAL_FLAGS:
+        columns[name] = np.asarray(flags.get(name, False), dtype=bool)
+
+    rule, derived = rule_compiler.numpy_stage(_RULESET, columns)
+    T, N, M = (derived[name] for name in _RULESET.tnm)
+    return {'T': T, 'N': N, 'M': M, 'rule': rule, 'stage': _STAGES[rule]}
+
+
+def endometrial_input_space():
+    """全輸入空間 (2×3×3×3×2^13 組) 的欄位陣列，列順序同 itertools.product。"""
+    return rule_compiler.numpy_input_space(_RULESET)
+
+
+def _random_columns(n, seed):
+    rng = np.random.default_rng(seed)
+    columns = {
+        'histology': rng.integers(0, 2, n), 'myometrial_invasion': rng.integers(0, 3, n),
+        'lvsi': rng.integers(0, 3, n), 'lymph_node_size': rng.integers(0, 3, n),
+    }
+    for name in staging.ENDOMETRIAL_FLAGS:
+        columns[name] = rng.random(n) < 0.2
+    return columns
+
+
+def check_endometrial_equivalence(columns=None):
+    """逐列以 staging.stage_endometrial() 重算並比對，回傳不一致的列索引 list。"""
+    if columns is None:
+        columns = endometrial_input_space()
+    out = endometrial_columns(**columns)
+    levels = {'histology': staging.ENDOMETRIAL_HISTOLOGY,
+              'myometrial_invasion': staging.ENDOMETRIAL_MYOMETRIAL,
+              'lvsi': staging.ENDOMETRIAL_LVSI, 'lymph_node_size': staging.ENDOMETRIAL_LN_SIZE}
+    names = list(columns)
+    mismatches = []
+    for i, row in enumerate(zip(*(columns[k].tolist() for k in names))):
+        case = {k: (levels[k][v] if k in levels else v) for k, v in zip(names, row)}
+        expected = staging.stage_endometrial(**case)
+        got = (out['stage'][i], (ENDOMETRIAL_T[out['T'][i]], ENDOMETRIAL_N[out['N'][i]],
+                                 ENDOMETRIAL_M[out['M'][i]]))
+        if got != tuple(expected):
+            mismatches.append(i)
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="比對向量化與純量子宮內膜癌分期結果")
+    parser.add_argument('-n', type=int, help="隨機抽樣列數 (預設為全輸入空間)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    columns = endometrial_input_space() if args.n is None else _random_columns(args.n, args.seed)
+    rows = len(columns['histology'])
+    start = time.perf_counter()
+    endometrial_columns(**columns)
+    elapsed = time.perf_counter() - start
+    print(f"向量化：{rows} 列，{elapsed * 1000:.1f} ms ({rows / elapsed:,.0f} 列/秒)")
+
+    mismatches = check_endometrial_equivalence(columns)
+    if mismatches:
+        print(f"不一致：{len(mismatches)} 列，例如第 {mismatches[0]} 列")
+        return 1
+    print("與純量版本完全一致")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
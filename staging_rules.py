@@ -0,0 +1,259 @@
+# 婦癌分期規則 (宣告式資料，app.py 與 index.html 共用的唯一定義)
+#
+# 每個癌別一個 Ruleset：
+#   fields   輸入欄位與可用值 (依分期函式的參數順序)；可用值為 FLAG 者為勾選項目
+#   derived  依序計算的衍生欄位 (例如子宮內膜癌由各項侵犯推得的 T/N/M)，格式同 rows
+#   rows     (條件, 分期) 依優先順序排列，第一個成立的列決定分期；都不成立時為 default
+#   tnm      結果中 AJCC T/N/M 代碼取自哪些欄位
+#
+# 條件為 {欄位: 值} 的 AND：值為字串時須相等、tuple 時須為其中之一、Not(tuple) 時不得為其中之一，
+# 勾選項目為 True/False。前面的列已排除的情況，後面的列不再重複寫出。
+#
+# 修改規則後執行 python rule_compiler.py --write-html 更新 index.html，
+# 並以 python rule_compiler.py --check 比對 Python 與 JS 在完整輸入空間上的結果。
+
+from collections import namedtuple
+
+Field = namedtuple('Field', ['name', 'values', 'default', 'depends'], defaults=(None, None))
+Ruleset = namedtuple('Ruleset', ['cancer', 'fields', 'derived', 'rows', 'default', 'tnm'])
+Derived = namedtuple('Derived', ['name', 'rows', 'default'])
+Not = namedtuple('Not', ['values'])
+
+FLAG = (False, True)
+
+
+def _by(name, mapping):
+    """{值: 分期} -> 每個值一列。"""
+    return tuple(({name: value}, stage) for value, stage in mapping.items())
+
+
+# --- 1. 子宮內膜癌 (FIGO 2023) ---
+ENDOMETRIAL_HISTOLOGY = ('non_aggressive', 'aggressive')
+ENDOMETRIAL_MYOMETRIAL = ('none', 'lt50', 'ge50')
+ENDOMETRIAL_LVSI = ('none', 'focal', 'extensive')
+ENDOMETRIAL_LN_SIZE = ('none', 'micro', 'macro')
+ENDOMETRIAL_FLAGS = ('cervical_stroma', 'ovarian_tubal', 'ovarian_limited', 'serosa',
+                     'vaginal_parametrial', 'pelvic_peritoneum', 'upper_abd_peritoneum',
+                     'bladder_intestinal', 'distant_meta', 'pelvic_ln', 'pa_ln',
+                     'pole_mut', 'p53_abn')
+ENDOMETRIAL_UNCLASSIFIED = '需進一步評估 (資料組合未涵蓋於標準路徑)'
+_EARLY = {'T': ('T1a', 'T1b', 'T2'), 'N': 'N0', 'M': 'M0'}
+
+ENDOMETRIAL = Ruleset(
+    'endometrial',
+    (Field('histology', ENDOMETRIAL_HISTOLOGY, 'non_aggressive'),
+     Field('myometrial_invasion', ENDOMETRIAL_MYOMETRIAL, 'none'),
+     Field('lvsi', ENDOMETRIAL_LVSI, 'none'),
+     Field('lymph_node_size', ENDOMETRIAL_LN_SIZE, 'none'))
+    + tuple(Field(name, FLAG, False) for name in ENDOMETRIAL_FLAGS),
+    (Derived('T', (
+        ({'bladder_intestinal': True}, 'T4'),
+        ({'vaginal_parametrial': True}, 'T3b'),
+        ({'pelvic_peritoneum': True}, 'T3b'),
+        ({'serosa': True}, 'T3a'),
+        ({'ovarian_tubal': True}, 'T3a'),
+        ({'ovarian_limited': True}, 'T3a'),
+        ({'cervical_stroma': True}, 'T2'),
+        ({'myometrial_invasion': 'ge50'}, 'T1b'),
+    ), 'T1a'),
+     Derived('N', (
+         ({'pa_ln': True, 'lymph_node_size': 'micro'}, 'N2mi'),
+         ({'pa_ln': True}, 'N2a'),
+         ({'pelvic_ln': True, 'lymph_node_size': 'micro'}, 'N1mi'),
+         ({'pelvic_ln': True}, 'N1a'),
+     ), 'N0'),
+     Derived('M', (({'distant_meta': True}, 'M1'),), 'M0')),
+    (
+        ({'pole_mut': True, **_EARLY}, 'IAmPOLEmut'),
+        ({'p53_abn': True, **_EARLY}, 'IICmp53abn'),
+        ({'distant_meta': True}, '4C'),
+        ({'upper_abd_peritoneum': True}, '4B'),
+        ({'T': 'T4'}, '4A'),
+        ({'N': 'N2mi'}, '3C2i'),
+        ({'N': 'N2a'}, '3C2ii'),
+        ({'N': 'N1mi'}, '3C1i'),
+        ({'N': 'N1a'}, '3C1ii'),
+        ({'serosa': True}, '3A2'),
+        # 以上已排除漿膜、淋巴結、膀胱/腸、骨盆以上腹膜與遠處轉移
+        ({'ovarian_limited': True, 'myometrial_invasion': ('none', 'lt50'), 'lvsi': Not(('extensive',)),
+          'vaginal_parametrial': False, 'pelvic_peritoneum': False}, '1A3'),
+        ({'ovarian_tubal': True}, '3A1'),
+        ({'ovarian_limited': True}, '3A1'),
+        ({'vaginal_parametrial': True, 'pelvic_peritoneum': False}, '3B1'),
+        ({'pelvic_peritoneum': True}, '3B2'),
+        ({'histology': 'aggressive', 'myometrial_invasion': Not(('none',))}, '2C'),
+        ({'cervical_stroma': True, 'histology': 'non_aggressive'}, '2A'),
+        ({'cervical_stroma': True}, ''),  # 兇險型且無肌層侵犯：原規則未給出結果
+        ({'lvsi': 'extensive', 'histology': 'non_aggressive'}, '2B'),
+        ({'histology': 'non_aggressive', 'myometrial_invasion': 'ge50'}, '1B'),
+        ({'histology': 'non_aggressive', 'myometrial_invasion': 'lt50'}, '1A2'),
+        ({'histology': 'non_aggressive', 'myometrial_invasion': 'none'}, '1A1'),
+        ({'histology': 'aggressive', 'myometrial_invasion': 'none'}, '1C'),
+    ),
+    ENDOMETRIAL_UNCLASSIFIED,
+    ('T', 'N', 'M'),
+)
+
+# --- 2. 卵巢癌 ---
+OVARIAN_T = ('T1a', 'T1b', 'T1c1', 'T1c2', 'T1c3', 'T2a', 'T2b', 'T3a', 'T3b', 'T3c')
+OVARIAN_N = ('N0', 'N1a', 'N1b')
+OVARIAN_M = ('M0', 'M1a', 'M1b')
+
+OVARIAN = Ruleset(
+    'ovarian',
+    (Field('t', OVARIAN_T), Field('n', OVARIAN_N, 'N0'), Field('m', OVARIAN_M, 'M0')),
+    (),
+    (
+        ({'m': 'M1a'}, 'Stage IVA'),
+        ({'m': 'M1b'}, 'Stage IVB'),
+        ({'n': 'N1a'}, 'Stage IIIA1i'),
+        ({'n': 'N1b'}, 'Stage IIIA1ii'),
+    ) + _by('t', {
+        'T3a': 'Stage IIIA2', 'T3b': 'Stage IIIB', 'T3c': 'Stage IIIC',
+        'T2a': 'Stage IIA', 'T2b': 'Stage IIB', 'T1a': 'Stage IA', 'T1b': 'Stage IB',
+        'T1c1': 'Stage IC1', 'T1c2': 'Stage IC2', 'T1c3': 'Stage IC3',
+    }),
+    None,
+    ('t', 'n', 'm'),
+)
+
+# --- 3. 子宮頸癌 ---
+CERVICAL_T = ('T1a1', 'T1a2', 'T1b1', 'T1b2', 'T1b3', 'T2a1', 'T2a2', 'T2b',
+              'T3a', 'T3b', 'T3c1', 'T3c2', 'T4')
+CERVICAL_N = ('N0', 'N0(i+)', 'N1')
+CERVICAL_M = ('M0', 'M1')
+
+CERVICAL = Ruleset(
+    'cervical',
+    (Field('t', CERVICAL_T), Field('n', CERVICAL_N, 'N0'), Field('m', CERVICAL_M, 'M0')),
+    (),
+    (
+        ({'t': 'T4', 'm': 'M0'}, 'Stage IVA'),
+        ({'t': 'T4'}, 'Stage IVB'),
+        ({'m': 'M1'}, 'Stage IVB'),
+        ({'n': ('N1', 'N0(i+)')}, 'Stage IIIC'),
+    ) + _by('t', {
+        'T1a1': 'Stage IA1', 'T1a2': 'Stage IA2', 'T1b1': 'Stage IB1',
+        'T1b2': 'Stage IB2', 'T1b3': 'Stage IB3', 'T2a1': 'Stage IIA1',
+        'T2a2': 'Stage IIA2', 'T2b': 'Stage IIB', 'T3a': 'Stage IIIA',
+        'T3b': 'Stage IIIB', 'T3c1': 'Stage IIIC1', 'T3c2': 'Stage IIIC2',
+    }),
+    'Cannot classify',
+    ('t', 'n', 'm'),
+)
+
+# --- 4. 子宮惡性肉瘤 ---
+SARCOMA_TYPES = ('LMS', 'ESS', 'MAS')
+SARCOMA_T = {
+    'LMS': ('T1a', 'T1b', 'T2a', 'T2b', 'T3a', 'T3b', 'T4'),
+    'ESS': ('T1a', 'T1b', 'T2a', 'T2b', 'T3a', 'T3b', 'T4'),
+    'MAS': ('T1a', 'T1b', 'T1c', 'T2a', 'T2b', 'T3a', 'T3b', 'T4'),
+}
+SARCOMA_N = ('N0', 'N1')
+SARCOMA_M = ('M0', 'M1')
+
+SARCOMA = Ruleset(
+    'sarcoma',
+    (Field('sarcoma_type', SARCOMA_TYPES), Field('t', SARCOMA_T, None, 'sarcoma_type'),
+     Field('n', SARCOMA_N, 'N0'), Field('m', SARCOMA_M, 'M0')),
+    (),
+    (
+        ({'m': 'M1'}, 'IVB'),
+        ({'n': 'N1'}, 'IIIC'),
+    ) + _by('t', {  # T1c 只有 Mullerian adenosarcoma 有
+        'T1a': 'IA', 'T1b': 'IB', 'T1c': 'IC', 'T2a': 'IIA', 'T2b': 'IIB',
+        'T3a': 'IIIA', 'T3b': 'IIIB', 'T4': 'IVA',
+    }),
+    None,
+    ('t', 'n', 'm'),
+)
+
+# --- 5. 外陰黑色素瘤 (AJCC 預後分期) ---
+MELANOMA_T = ('Tis', 'T1a', 'T1b', 'T2a', 'T2b', 'T3a', 'T3b', 'T4a', 'T4b')
+MELANOMA_N = ('N0', 'N1a', 'N1b', 'N1c', 'N2a', 'N2b', 'N2c', 'N3a', 'N3b', 'N3c')
+MELANOMA_M = ('M0', 'M1a(0)', 'M1a(1)', 'M1b(0)', 'M1b(1)', 'M1c(0)', 'M1c(1)', 'M1d(0)', 'M1d(1)')
+_LOCAL = {'n': 'N0', 'm': 'M0'}
+
+MELANOMA = Ruleset(
+    'melanoma',
+    (Field('t', MELANOMA_T), Field('n', MELANOMA_N, 'N0'), Field('m', MELANOMA_M, 'M0')),
+    (),
+    (
+        ({'t': 'Tis', **_LOCAL}, 'Stage 0'),
+        ({'t': 'T1a', **_LOCAL}, 'Stage IA'),
+        ({'t': ('T1b', 'T2a'), **_LOCAL}, 'Stage IB'),
+        ({'t': ('T2b', 'T3a'), **_LOCAL}, 'Stage IIA'),
+        ({'t': ('T3b', 'T4a'), **_LOCAL}, 'Stage IIB'),
+        ({'t': 'T4b', **_LOCAL}, 'Stage IIC'),
+        ({'n': Not(('N0',)), 'm': 'M0'}, 'Stage III'),
+        ({'m': Not(('M0',))}, 'Stage IV'),
+    ),
+    '未分類',
+    ('t', 'n', 'm'),
+)
+
+# --- 6. 陰道癌 ---
+VAGINAL_T = ('T1a', 'T1b', 'T2a', 'T2b', 'T3', 'T4')
+VAGINAL_N = ('N0', 'N1')
+VAGINAL_M = ('M0', 'M1')
+
+VAGINAL = Ruleset(
+    'vaginal',
+    (Field('t', VAGINAL_T), Field('n', VAGINAL_N, 'N0'), Field('m', VAGINAL_M, 'M0')),
+    (),
+    (
+        ({'m': 'M1'}, 'FIGO Stage IVB'),
+        ({'t': 'T4'}, 'FIGO Stage IVA'),
+        ({'n': 'N1'}, 'FIGO Stage III'),
+        ({'t': 'T3'}, 'FIGO Stage III'),
+        ({'t': ('T2a', 'T2b')}, 'FIGO Stage II'),
+        ({'t': ('T1a', 'T1b')}, 'FIGO Stage I'),
+    ),
+    '資料不足或不符合分期標準',
+    ('t', 'n', 'm'),
+)
+
+# --- 7. GTN ---
+GTN_T = ('T1', 'T2')
+GTN_M = ('M0', 'M1a', 'M1b')
+
+GTN = Ruleset(
+    'gtn',
+    (Field('t', GTN_T), Field('m', GTN_M, 'M0')),
+    (),
+    (
+        ({'m': 'M0', 't': 'T1'}, 'FIGO stage I'),
+        ({'m': 'M0'}, 'FIGO stage II'),
+        ({'m': 'M1a'}, 'FIGO stage III'),
+    ),
+    'FIGO stage IV',
+    ('t', 'm'),
+)
+
+# --- 8. 外陰癌 ---
+VULVAR_T = ('Tis', 'T1a', 'T1b', 'T2', 'T3')
+VULVAR_N = ('N0', 'N1a', 'N1b', 'N2a', 'N2b', 'N2c', 'N3')
+VULVAR_M = ('M0', 'M1')
+_INVASIVE = ('T1a', 'T1b', 'T2')
+
+VULVAR = Ruleset(
+    'vulvar',
+    (Field('t', VULVAR_T), Field('n', VULVAR_N, 'N0'), Field('m', VULVAR_M, 'M0')),
+    (),
+    (
+        ({'t': 'Tis', 'n': 'N0', 'm': 'M0'}, 'Stage 0'),
+        ({'t': 'T1a', 'n': 'N0', 'm': 'M0'}, 'Stage IA'),
+        ({'t': 'T1b', 'n': 'N0', 'm': 'M0'}, 'Stage IB'),
+        ({'t': 'T2', 'n': 'N0', 'm': 'M0'}, 'Stage II'),
+        ({'t': _INVASIVE, 'n': ('N1a', 'N1b'), 'm': 'M0'}, 'Stage IIIA'),
+        ({'t': _INVASIVE, 'n': ('N2a', 'N2b'), 'm': 'M0'}, 'Stage IIIB'),
+        ({'t': _INVASIVE, 'n': 'N2c', 'm': 'M0'}, 'Stage IIIC'),
+        ({'t': _INVASIVE, 'n': 'N3', 'm': 'M0'}, 'Stage IVA'),
+        ({'t': 'T3', 'm': 'M0'}, 'Stage IVA'),
+        ({'m': 'M1'}, 'Stage IVB'),
+    ),
+    '未知分期',
+    ('t', 'n', 'm'),
+)
+
+RULESETS = {r.cancer: r for r in (ENDOMETRIAL, OVARIAN, CERVICAL, SARCOMA, MELANOMA, VAGINAL, GTN, VULVAR)}
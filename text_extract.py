@@ -0,0 +1,386 @@
+# 病理報告文字的本機快速抽取 (不呼叫模型)
+#
+# 以預先編譯的正規表示式，從 LIS 匯出的報告文字 (英文 synoptic 或常見中文寫法)
+# 抽出分期欄位，欄位名稱與代碼與 ai_extract.FIELDS 相同；
+# 報告沒有明確寫到的欄位列為 unresolved，交給模型補齊。
+#
+#   python text_extract.py report.txt --cancer endometrial
+#   python text_extract.py --check        # 執行 REGRESSION_CASES
+
+import argparse
+import re
+import sys
+import time
+from collections import namedtuple
+
+import staging
+
+TextExtraction = namedtuple('TextExtraction', ['cancer', 'inputs', 'unresolved', 'evidence', 'info', 'elapsed'])
+
+_FLAGS = re.IGNORECASE
+
+# 「項目：有/無」型式的陰性、陽性字詞；陰性放前面，讓 "not identified" 先於 "identified" 命中。
+# 英文字詞前後加 \b，避免 "uninvolved" 裡的 "involved" 被當成陽性
+_NEG = (r'\b(?:not\s+identified|not\s+involved|not\s+present|not\s+seen|uninvolved|unremarkable|absent|negative|'
+        r'free\s+of\s+tumou?r|none|no|wild[\s-]*type)\b|未見|無|陰性|未侵犯')
+_POS = r'\b(?:present|identified|positive|involved|invaded|yes)\b|有|陽性|侵犯'
+
+# 描述前後的否定語 (同一行、同一子句內)，例如 "No high-grade component identified"
+_NEGATED_BEFORE = re.compile(r'(?:\b(?:no|not|without|negative\s+for|absence\s+of|free\s+of)\b|無|未見|沒有|非)'
+                             r'[^\n.;:：]{0,30}$', re.IGNORECASE)
+_NEGATED_AFTER = re.compile(r'[^\n.;,]{0,20}?(?:\bnot\s+(?:identified|present|seen)\b|\babsent\b|\bnegative\b|'
+                            r'\bexcluded\b|\bruled\s+out\b|未見|無|排除)',
+                            re.IGNORECASE)
+
+
+def _negated(text, m):
+    line_start = text.rfind('\n', 0, m.start()) + 1
+    return bool(_NEGATED_BEFORE.search(text, line_start, m.start()) or _NEGATED_AFTER.match(text, m.end()))
+
+
+def _search_affirmed(pattern, text):
+    """第一個未被否定的 pattern 命中；都被否定時為 None。"""
+    return next((m for m in pattern.finditer(text) if not _negated(text, m)), None)
+
+
+def _status(label):
+    return re.compile(rf'(?:{label})[^\n:：]*[:：]?[^\n]{{0,30}}?(?:(?P<neg>{_NEG})|(?P<pos>{_POS}))', _FLAGS)
+
+
+_CANCER_WORDS = [
+    ('sarcoma', re.compile(r'sarcoma|肉瘤', _FLAGS)),
+    ('gtn', re.compile(r'gestational\s+trophoblastic|choriocarcinoma|\bGTN\b|滋養層|絨毛膜癌', _FLAGS)),
+    ('endometrial', re.compile(r'endometri|子宮內膜', _FLAGS)),
+    ('cervical', re.compile(r'cervi(?:x|cal)\s+(?:cancer|carcinoma)|子宮頸癌', _FLAGS)),
+    ('ovarian', re.compile(r'ovar(?:y|ian)\s+(?:cancer|carcinoma)|卵巢癌', _FLAGS)),
+    ('vaginal', re.compile(r'vagina(?:l)?\s+(?:cancer|carcinoma)|陰道癌', _FLAGS)),
+    ('vulvar', re.compile(r'vulva(?:r)?\s+(?:cancer|carcinoma)|外陰癌', _FLAGS)),
+]
+
+# --- 子宮內膜癌 ---
+# serous / clear cell 須接組織學名詞，"serous fluid" (腹水、沖洗液) 不算
+_AGGRESSIVE = re.compile(
+    r'\b(?:serous|clear[\s-]+cell)[ \t-]+(?:(?:papillary|endometrial|intraepithelial)[ \t]+)?'
+    r'(?:carcinoma|adenocarcinoma|component|differentiation)|'
+    r'\b(?:undifferentiated|carcinosarcoma|mixed\s+m[uü]llerian|high[\s-]*grade)|'
+    r'\b(?:FIGO\s+)?grade\s*(?:3|III)\b|\bG3\b|漿液性(?:乳突)?(?:腺)?癌|亮細胞(?:腺)?癌|未分化|癌肉瘤|高惡性度', _FLAGS)
+_LOW_GRADE = re.compile(r'endometrioid[^\n]{0,40}?(?:\bgrade[ \t]*(?:1|2|I{1,2})\b|\bG[12]\b|\blow[\s-]*grade)|'
+                        r'(?:\bgrade[ \t]*(?:1|2|I{1,2})\b|\bG[12]\b|\blow[\s-]*grade)[^\n]{0,40}?endometrioid|'
+                        r'類子宮內膜[^\n]{0,20}?(?:G[12]|低惡性度)', _FLAGS)
+
+# 數值與單位、分子與分母都限制在同一行 ([^\n]、[ \t])，不會跨到下一個項目
+_MYO_DEPTH = re.compile(r'(?:depth[ \t]+of[ \t]+)?(?:myometrial[ \t]+)?invasion[^\n\d]{0,30}?(\d+(?:\.\d+)?)[ \t]*mm'
+                        r'[^\n\d]{0,40}?(?:myometrial[ \t]+)?thickness[^\n\d]{0,20}?(\d+(?:\.\d+)?)[ \t]*mm|'
+                        r'(\d+(?:\.\d+)?)[ \t]*mm[ \t]*/[ \t]*(\d+(?:\.\d+)?)[ \t]*mm', _FLAGS)
+_MYO_PERCENT = re.compile(r'(?:myometri\w*|肌層)[^\n\d]{0,40}?(\d+(?:\.\d+)?)[ \t]*%', _FLAGS)
+_MYO_NONE = re.compile(r'\bno\s+myometrial\s+invasion|myometrial\s+invasion\s*[:：]?\s*(?:not\s+identified|absent|none)|'
+                       r'(?:confined|limited)\s+to\s+(?:the\s+)?endometrium|無肌層侵犯|未侵犯肌層', _FLAGS)
+_MYO_GE50 = re.compile(r'(?:≥|>=|>|\bgreater[ \t]+than|\bmore[ \t]+than|\bat[ \t]+least)[ \t]*(?:one[ \t-]*half|50[ \t]*%)|'
+                       r'\bouter[ \t]+half|肌層[^\n]{0,10}?(?:≥|>=|大於|超過)[ \t]*(?:1/2|50[ \t]*%|一半)', _FLAGS)
+_MYO_LT50 = re.compile(r'(?:<|\bless[ \t]+than)[ \t]*(?:one[ \t-]*half|50[ \t]*%)|\binner[ \t]+half|'
+                       r'肌層[^\n]{0,10}?(?:<|小於|未達)[ \t]*(?:1/2|50[ \t]*%|一半)', _FLAGS)
+
+_LVSI_LABEL = r'LVSI|lympho[\s-]*vascular(?:\s+space)?\s+invasion|淋巴血管(?:腔)?侵犯|血管或淋巴管侵犯'
+_LVSI = re.compile(rf'(?:{_LVSI_LABEL})[^\n]{{0,40}}?(?:(?P<neg>{_NEG})|(?P<ext>\b(?:extensive|substantial)\b|'
+                   r'(?:≥|>=)[ \t]*5[ \t]*vessels|廣泛|大量)|(?P<focal>\bfocal\b|局部|輕微)|'
+                   r'(?P<pos>\b(?:present|identified|positive)\b|有|陽性))',
+                   _FLAGS)
+
+_NODE_COUNT = {
+    'pelvic_ln': re.compile(r'\bpelvic[ \t]+(?:lymph[ \t]+)?nodes?[^\n\d]{0,40}?(\d+)[ \t]*(?:/|\bof\b)[ \t]*(\d+)|'
+                            r'(\d+)[ \t]*(?:/|\bof\b)[ \t]*(\d+)[ \t]+pelvic\b|'
+                            r'骨盆(?:腔)?淋巴結[^\n\d]{0,20}?(\d+)[ \t]*/[ \t]*(\d+)', _FLAGS),
+    'pa_ln': re.compile(r'\bpara[ \t-]*aortic[ \t]+(?:lymph[ \t]+)?nodes?[^\n\d]{0,40}?(\d+)[ \t]*(?:/|\bof\b)[ \t]*(\d+)|'
+                        r'(\d+)[ \t]*(?:/|\bof\b)[ \t]*(\d+)[ \t]+para[ \t-]*aortic\b|'
+                        r'主動脈旁淋巴結[^\n\d]{0,20}?(\d+)[ \t]*/[ \t]*(\d+)', _FLAGS),
+}
+
+
+def _tally(label):
+    # 「12 examined, 0 involved」或「none of 12 nodes involved」：陽性數寫在受檢數之後或以文字表示
+    return re.compile(rf'(?:{label})[^\n\d]{{0,40}}?(?:'
+                      r'\d+[ \t]+(?:(?:lymph[ \t]+)?nodes?[ \t]+)?(?:examined|retrieved|removed|identified)[ \t]*[,;]?'
+                      r'[ \t]*(?:with[ \t]+)?(?P<pos_a>\d+|none|no)[ \t]+(?:nodes?[ \t]+)?(?:involved|positive|metastatic)\b|'
+                      r'\b(?P<pos_b>\d+|none|no)[ \t]+(?:out[ \t]+)?of[ \t]+\d+[ \t]+(?:(?:lymph[ \t]+)?nodes?[ \t]+)?'
+                      r'(?:(?:are|were|is)[ \t]+)?(?:involved|positive|metastatic)\b)', _FLAGS)
+
+
+_NODE_LABEL = {
+    'pelvic_ln': r'\bpelvic[ \t]+(?:lymph[ \t]+)?nodes?',
+    'pa_ln': r'\bpara[ \t-]*aortic[ \t]+(?:lymph[ \t]+)?nodes?',
+}
+_NODE_TALLY = {name: _tally(label) for name, label in _NODE_LABEL.items()}
+_NODE_STATUS = {
+    'pelvic_ln': _status(r'pelvic\s+(?:lymph\s+)?nodes?(?:\s+metastas[ie]s)?|骨盆(?:腔)?淋巴結'),
+    'pa_ln': _status(r'para[\s-]*aortic\s+(?:lymph\s+)?nodes?(?:\s+metastas[ie]s)?|主動脈旁淋巴結'),
+}
+_NODE_SIZE = re.compile(r'(?:metastatic\s+)?(?:deposit|focus|metastasis)'
+                        r'[^\n\d]{0,30}?(\d+(?:\.\d+)?)[ \t]*(mm|cm)|轉移(?:灶)?(?:大小)?[^\n\d]{0,10}?(\d+(?:\.\d+)?)[ \t]*(mm|cm)',
+                        _FLAGS)
+_NODE_SIZE_WORD = re.compile(r'(?P<itc>isolated\s+tumou?r\s+cells|\bITCs?\b)|(?P<micro>micro[\s-]*metasta)|'
+                             r'(?P<macro>macro[\s-]*metasta)|(?P<micro_zh>微轉移)|(?P<macro_zh>巨轉移)', _FLAGS)
+
+_ENDOMETRIAL_STATUS = {
+    'cervical_stroma': _status(r'cervical\s+stroma\w*(?:\s+(?:invasion|involvement))?|宮頸間質(?:侵犯)?'),
+    'ovarian_tubal': _status(r'adnexa\w*|(?:ovary|ovaries|ovarian|fallopian\s+tubes?)(?:\s+involvement)?|卵巢|輸卵管'),
+    'serosa': _status(r'(?:uterine\s+)?serosa\w*(?:\s+involvement)?|漿膜(?:侵犯)?'),
+    'vaginal_parametrial': _status(r'vagina\w*|parametri\w*|陰道|子宮旁'),
+    'pelvic_peritoneum': _status(r'pelvic\s+peritone\w*|骨盆腹膜'),
+    'upper_abd_peritoneum': _status(r'omentum|omental|abdominal\s+peritone\w*|網膜|上腹部?腹膜'),
+    'bladder_intestinal': _status(r'(?:bladder|bowel|rectal|intestinal)\s+mucosa|膀胱|腸黏膜'),
+    'distant_meta': _status(r'distant\s+metastas[ie]s|遠處轉移'),
+}
+_POLE = re.compile(r'\bPOLE\b[^\n]{0,40}?(?:(?P<neg>\b(?:wild[\s-]*type|no\s+(?:pathogenic\s+)?mutation|not\s+detected|'
+                   r'negative)\b|未偵測|陰性)|(?P<pos>\b(?:mutat\w*|pathogenic|detected|positive)\b|突變|陽性))', _FLAGS)
+_P53 = re.compile(r'\bp53\b[^\n]{0,40}?(?:(?P<pos>\b(?:abnormal|aberrant|mutant|mutation[\s-]*type|over[\s-]*expression|'
+                  r'null|complete\s+loss)\b|異常)|(?P<neg>\b(?:wild[\s-]*type|normal|wt)\b|正常))', _FLAGS)
+
+_TUMOR_SIZE = re.compile(r'(?:tumou?r\s+size|greatest\s+dimension|腫瘤大小)[^\n\d]{0,30}?(\d+(?:\.\d+)?)[ \t]*(cm|mm)',
+                         _FLAGS)
+
+# --- 其他癌別：病理 TNM 代碼與肉瘤類型 ---
+_SARCOMA_TYPE = [
+    ('LMS', re.compile(r'leiomyosarcoma|平滑肌肉瘤', _FLAGS)),
+    ('ESS', re.compile(r'endometrial\s+stromal\s+sarcoma|內膜間質肉瘤', _FLAGS)),
+    ('MAS', re.compile(r'adenosarcoma|腺肉瘤', _FLAGS)),
+]
+_TNM_DOMAINS = {
+    'ovarian': (staging.OVARIAN_T, staging.OVARIAN_N, staging.OVARIAN_M),
+    'cervical': (staging.CERVICAL_T, staging.CERVICAL_N, staging.CERVICAL_M),
+    'sarcoma': (tuple(sorted({t for ts in staging.SARCOMA_T.values() for t in ts})),
+                staging.SARCOMA_N, staging.SARCOMA_M),
+    'vulvar': (staging.VULVAR_T, staging.VULVAR_N, staging.VULVAR_M),
+    'vaginal': (staging.VAGINAL_T, staging.VAGINAL_N, staging.VAGINAL_M),
+    'gtn': (staging.GTN_T, (), staging.GTN_M),
+}
+
+
+def _code_pattern(codes):
+    # 長的代碼優先 (T1a1 先於 T1a)，前面可有 p/c/y/yp 前綴
+    alternatives = '|'.join(re.escape(c) for c in sorted(codes, key=len, reverse=True))
+    return re.compile(rf'(?<![A-Za-z])(?:y?[pc])?({alternatives})(?![0-9a-z])')
+
+
+_TNM = {cancer: tuple((name, _code_pattern(codes)) for name, codes in zip('tnm', domains) if codes)
+        for cancer, domains in _TNM_DOMAINS.items()}
+
+FIELDS = {
+    'endometrial': ('histology', 'myometrial_invasion', 'lvsi', 'lymph_node_size') + staging.ENDOMETRIAL_FLAGS,
+    **{cancer: tuple(name for name, _ in patterns) for cancer, patterns in _TNM.items()},
+}
+FIELDS['sarcoma'] = ('sarcoma_type',) + FIELDS['sarcoma']
+
+
+# 回歸案例：(報告文字, 癌別, {欄位: 預期值})；預期值 None 表示該欄位不得由本機抽出
+REGRESSION_CASES = (
+    ("Myometrial invasion: less than 50%", 'endometrial', {'myometrial_invasion': 'lt50'}),
+    ("Myometrial invasion: greater than 50%", 'endometrial', {'myometrial_invasion': 'ge50'}),
+    ("Myometrial invasion: 70%", 'endometrial', {'myometrial_invasion': 'ge50'}),
+    ("Adnexa: uninvolved", 'endometrial', {'ovarian_tubal': False}),
+    ("Adnexa: involved", 'endometrial', {'ovarian_tubal': True}),
+    ("No high-grade component identified", 'endometrial', {'histology': None}),
+    ("High-grade component: not identified", 'endometrial', {'histology': None}),
+    ("Histologic type: Serous carcinoma", 'endometrial', {'histology': 'aggressive'}),
+    ("Pelvic lymph nodes: 2/10\nPara-aortic lymph nodes: 0/3", 'endometrial', {'pelvic_ln': True, 'pa_ln': False}),
+    ("Pelvic lymph nodes: 0/10\nPara-aortic lymph nodes: 1/3", 'endometrial', {'pelvic_ln': False, 'pa_ln': True}),
+    ("Myometrial invasion: less than 50%\nAdnexa: uninvolved\nNo high-grade component identified\n"
+     "Pelvic lymph nodes: 2/10\nPara-aortic lymph nodes: 0/3\n", 'endometrial',
+     {'histology': None, 'myometrial_invasion': 'lt50', 'ovarian_tubal': False, 'pelvic_ln': True, 'pa_ln': False}),
+    ("Endometrioid adenocarcinoma, FIGO grade 1. Pelvic lymph nodes: 12 examined, 0 involved.", 'endometrial',
+     {'histology': 'non_aggressive', 'pelvic_ln': False}),
+    ("Pelvic lymph nodes: 12 examined, 2 involved", 'endometrial', {'pelvic_ln': True}),
+    ("Pelvic lymph nodes: none of 12 nodes involved", 'endometrial', {'pelvic_ln': False}),
+    ("Endometrioid adenocarcinoma, FIGO grade 1.\nPeritoneal washings: serous fluid, no malignant cells.",
+     'endometrial', {'histology': 'non_aggressive'}),
+    ("Endometrioid adenocarcinoma, FIGO grade 1. Serous carcinoma is excluded.", 'endometrial',
+     {'histology': 'non_aggressive'}),
+    ("Histologic type: Clear cell carcinoma", 'endometrial', {'histology': 'aggressive'}),
+    ("p53: abnormal (null pattern)", 'endometrial', {'p53_abn': True}),
+    ("p53: normal (wild-type pattern)", 'endometrial', {'p53_abn': False}),
+)
+
+
+def check(cases=REGRESSION_CASES):
+    """執行回歸案例，回傳不符的 [(報告文字, 欄位, 預期值, 實際值)]。"""
+    mismatches = []
+    for text, cancer, expected in cases:
+        inputs = extract(text, cancer).inputs
+        for name, value in expected.items():
+            if inputs.get(name) != value:
+                mismatches.append((text, name, value, inputs.get(name)))
+    return mismatches
+
+
+def guess_cancer(text):
+    """依關鍵字猜測癌別；找不到時回傳 None。"""
+    for cancer, pattern in _CANCER_WORDS:
+        if pattern.search(text):
+            return cancer
+    return None
+
+
+def _mm(value, unit):
+    return float(value) * (10 if unit.lower() == 'cm' else 1)
+
+
+def _first_group(m):
+    return next(g for g in m.groups() if g is not None)
+
+
+def _endometrial(text, inputs, evidence):
+    def found(name, value, m):
+        inputs[name] = value
+        evidence[name] = m.group(0).strip()
+
+    m = _search_affirmed(_AGGRESSIVE, text)
+    if m:
+        found('histology', 'aggressive', m)
+    else:
+        m = _search_affirmed(_LOW_GRADE, text)
+        if m:
+            found('histology', 'non_aggressive', m)
+
+    m = _MYO_NONE.search(text)
+    if m:
+        found('myometrial_invasion', 'none', m)
+    else:
+        m = _MYO_DEPTH.search(text)
+        if m:
+            depth, thickness = [float(g) for g in m.groups() if g is not None]
+            if depth == 0:
+                found('myometrial_invasion', 'none', m)
+            elif thickness:
+                found('myometrial_invasion', 'ge50' if depth / thickness >= 0.5 else 'lt50', m)
+        if 'myometrial_invasion' not in inputs:
+            # 「小於/大於 50%」先於單純的百分比，避免 "less than 50%" 被讀成 50%
+            hits = [(m.start(), value, m) for pattern, value in ((_MYO_GE50, 'ge50'), (_MYO_LT50, 'lt50'))
+                    for m in [pattern.search(text)] if m]
+            if hits:
+                _, value, m = min(hits, key=lambda hit: hit[0])
+                found('myometrial_invasion', value, m)
+        if 'myometrial_invasion' not in inputs:
+            m = _MYO_PERCENT.search(text)
+            if m:
+                pct = float(m.group(1))
+                found('myometrial_invasion', 'none' if pct == 0 else 'ge50' if pct >= 50 else 'lt50', m)
+
+    m = _LVSI.search(text)
+    if m and m.lastgroup != 'pos':
+        # 只寫「有」無法區分 focal 與 extensive，留給模型判斷
+        found('lvsi', {'neg': 'none', 'ext': 'extensive', 'focal': 'focal'}[m.lastgroup], m)
+
+    for name in ('pelvic_ln', 'pa_ln'):
+        # 先讀陽性/受檢數，"0 involved" 不能被狀態字詞 "involved" 當成陽性
+        m = _NODE_TALLY[name].search(text)
+        if m:
+            positive = m.group('pos_a') or m.group('pos_b')
+            found(name, positive.isdigit() and int(positive) > 0, m)
+            continue
+        m = _NODE_COUNT[name].search(text)
+        if m:
+            positive = int(_first_group(m))
+            found(name, positive > 0, m)
+            continue
+        m = _NODE_STATUS[name].search(text)
+        if m:
+            found(name, m.lastgroup == 'pos', m)
+
+    if inputs.get('pelvic_ln') is False and inputs.get('pa_ln') is False:
+        inputs['lymph_node_size'] = 'none'
+        evidence['lymph_node_size'] = '淋巴結皆為陰性'
+    else:
+        m = _NODE_SIZE.search(text)
+        if m:
+            value, unit = [g for g in m.groups() if g is not None]
+            size = _mm(value, unit)
+            found('lymph_node_size', 'macro' if size > 2 else 'micro' if size >= 0.2 else 'none', m)
+        else:
+            m = _search_affirmed(_NODE_SIZE_WORD, text)
+            if m:
+                found('lymph_node_size', {'itc': 'none', 'micro': 'micro', 'micro_zh': 'micro',
+                                          'macro': 'macro', 'macro_zh': 'macro'}[m.lastgroup], m)
+
+    for name, pattern in _ENDOMETRIAL_STATUS.items():
+        m = pattern.search(text)
+        if m:
+            found(name, m.lastgroup == 'pos', m)
+    if inputs.get('ovarian_tubal') is False:
+        # 未侵犯附屬器時「卵巢侷限」不影響分期
+        inputs['ovarian_limited'] = False
+        evidence['ovarian_limited'] = '卵巢或輸卵管未侵犯'
+
+    for name, pattern in (('pole_mut', _POLE), ('p53_abn', _P53)):
+        m = pattern.search(text)
+        if m:
+            found(name, m.lastgroup == 'pos', m)
+
+
+def _tnm(cancer, text, inputs, evidence):
+    if cancer == 'sarcoma':
+        for code, pattern in _SARCOMA_TYPE:
+            m = pattern.search(text)
+            if m:
+                inputs['sarcoma_type'] = code
+                evidence['sarcoma_type'] = m.group(0)
+                break
+    for name, pattern in _TNM[cancer]:
+        m = pattern.search(text)
+        if m:
+            inputs[name] = m.group(1)
+            evidence[name] = m.group(0)
+
+
+def extract(text, cancer=None):
+    """抽取 text 中的分期欄位，回傳 TextExtraction；cancer 為 None 時依關鍵字猜測。
+
+    inputs 只含有明確依據的欄位 (evidence 為對應的原文片段)，其餘列於 unresolved；
+    無法判斷癌別時 cancer 為 None 且 inputs 為空。
+    """
+    start = time.perf_counter()
+    if cancer is None:
+        cancer = guess_cancer(text)
+    elif cancer not in FIELDS:
+        raise ValueError(f"cancer 不合法: {cancer!r} (可用值: {', '.join(FIELDS)})")
+    inputs, evidence, info = {}, {}, {}
+    m = _TUMOR_SIZE.search(text)
+    if m:
+        info['tumor_size_cm'] = _mm(m.group(1), m.group(2)) / 10
+    if cancer == 'endometrial':
+        _endometrial(text, inputs, evidence)
+    elif cancer is not None:
+        _tnm(cancer, text, inputs, evidence)
+    unresolved = [name for name in FIELDS.get(cancer, ()) if name not in inputs]
+    return TextExtraction(cancer, inputs, unresolved, evidence, info, time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="從病理報告文字抽取分期欄位 (不呼叫模型)")
+    parser.add_argument('path', nargs='?', help="報告文字檔 (預設讀 stdin)")
+    parser.add_argument('--cancer', choices=sorted(FIELDS))
+    parser.add_argument('--check', action='store_true', help="執行回歸案例")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        mismatches = check()
+        for text, name, expected, actual in mismatches:
+            print(f"不符：{text!r} {name} 預期 {expected!r}，實際 {actual!r}")
+        print(f"{len(REGRESSION_CASES)} 個案例，{len(mismatches)} 個欄位不符")
+        return 1 if mismatches else 0
+
+    if args.path:
+        with open(args.path, encoding='utf-8') as f:
+            text = f.read()
+    else:
+        text = sys.stdin.read()
+    r = extract(text, args.cancer)
+    print(f"癌別：{r.cancer}  ({r.elapsed * 1000:.2f} ms)")
+    for name, value in r.inputs.items():
+        print(f"  {name:<22} {value!s:<16} ← {r.evidence[name]}")
+    for name, value in r.info.items():
+        print(f"  {name:<22} {value}")
+    if r.unresolved:
+        print(f"未解析：{', '.join(r.unresolved)}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+# 單一欄位變化 (what-if) 分析
+#
+# 以目前輸入為基準，逐一把每個欄位換成其他可用值 (其他欄位不變)，所有變體以
+# staging.stage_many 一次批次分期，找出哪些單一改變會改變分期結果。
+# 子宮內膜癌 17 個欄位約 20 種變體，整批不到 0.1 ms，每次重新執行都可即時算出。
+#
+#   python what_if.py endometrial histology=aggressive myometrial_invasion=lt50
+
+from collections import namedtuple
+
+import staging
+
+# result 為該變體的分期結果；changed 表示與基準結果不同 (GTN 評分只比較風險分類)
+Variant = namedtuple('Variant', ['field', 'value', 'result', 'changed'])
+
+DOMAINS = {
+    'endometrial': dict({'histology': staging.ENDOMETRIAL_HISTOLOGY,
+                         'myometrial_invasion': staging.ENDOMETRIAL_MYOMETRIAL,
+                         'lvsi': staging.ENDOMETRIAL_LVSI,
+                         'lymph_node_size': staging.ENDOMETRIAL_LN_SIZE},
+                        **{name: (False, True) for name in staging.ENDOMETRIAL_FLAGS}),
+    'ovarian': {'t': staging.OVARIAN_T, 'n': staging.OVARIAN_N, 'm': staging.OVARIAN_M},
+    'cervical': {'t': staging.CERVICAL_T, 'n': staging.CERVICAL_N, 'm': staging.CERVICAL_M},
+    # 肉瘤的 T 可用值依類型而定，見 field_values()
+    'sarcoma': {'sarcoma_type': staging.SARCOMA_TYPES, 't': None, 'n': staging.SARCOMA_N, 'm': staging.SARCOMA_M},
+    'melanoma': {'t': staging.MELANOMA_T, 'n': staging.MELANOMA_N, 'm': staging.MELANOMA_M},
+    'vaginal': {'t': staging.VAGINAL_T, 'n': staging.VAGINAL_N, 'm': staging.VAGINAL_M},
+    'gtn': {'t': staging.GTN_T, 'm': staging.GTN_M},
+    'gtn_risk': staging.GTN_SCORE_ITEMS,
+    'vulvar': {'t': staging.VULVAR_T, 'n': staging.VULVAR_N, 'm': staging.VULVAR_M},
+}
+
+
+def field_values(cancer, name, inputs):
+    """欄位 name 在目前輸入下的所有可用值。"""
+    if cancer == 'sarcoma' and name == 't':
+        return staging.SARCOMA_T[inputs['sarcoma_type']]
+    return DOMAINS[cancer][name]
+
+
+def variants(cancer, inputs):
+    """回傳 [(欄位, 新值, 完整輸入 dict)]：每次只改一個欄位，其餘沿用 inputs。
+
+    inputs 未提供的欄位視為分期函式的預設值，不做變化。
+    肉瘤改變類型時沿用原本的 T，若新類型沒有該 T 則略過。
+    """
+    if cancer not in DOMAINS:
+        raise ValueError(f"未知的癌別: {cancer!r} (可用值: {', '.join(DOMAINS)})")
+    out = []
+    for name in DOMAINS[cancer]:
+        if name not in inputs:
+            continue
+        for value in field_values(cancer, name, inputs):
+            if value == inputs[name]:
+                continue
+            case = dict(inputs, **{name: value})
+            if cancer == 'sarcoma' and name == 'sarcoma_type' and case['t'] not in staging.SARCOMA_T[value]:
+                continue
+            out.append((name, value, case))
+    return out
+
+
+def _outcome(cancer, result):
+    return result.risk if cancer == 'gtn_risk' else result
+
+
+def sensitivity(cancer, inputs):
+    """回傳 (基準結果, Variant 清單)；基準與所有變體在同一次批次中分期。
+
+    inputs 為分期函式的關鍵字參數 (代碼)，值不合法時丟出 ValueError。
+    """
+    candidates = variants(cancer, inputs)
+    results = staging.stage_many(cancer, [inputs] + [case for _, _, case in candidates])
+    base = results[0]
+    return base, [Variant(name, value, result, _outcome(cancer, result) != _outcome(cancer, base))
+                  for (name, value, _), result in zip(candidates, results[1:])]
+
+
+def _parse_value(text):
+    if text in ('True', 'False'):
+        return text == 'True'
+    return int(text) if text.isdigit() else text
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="單一欄位變化對分期結果的影響")
+    parser.add_argument('cancer', choices=sorted(DOMAINS))
+    parser.add_argument('fields', nargs='*', metavar='name=value', help="分期函式的欄位代碼，例如 t=T1b n=N0")
+    args = parser.parse_args(argv)
+
+    inputs = {}
+    for item in args.fields:
+        name, _, value = item.partition('=')
+        inputs[name] = _parse_value(value)
+    if args.cancer == 'endometrial':
+        # 子宮內膜癌的欄位都有預設值，未指定者也列入變化
+        inputs = dict({name: values[0] for name, values in DOMAINS['endometrial'].items()}, **inputs)
+    base, found = sensitivity(args.cancer, inputs)
+    print(f"基準：{base}")
+    for v in found:
+        if v.changed:
+            print(f"  {v.field} = {v.value!r:<14} -> {v.result}")
+    print(f"共 {len(found)} 種單一變化，{sum(v.changed for v in found)} 種改變結果")
+
+
+if __name__ == '__main__':
+    main()